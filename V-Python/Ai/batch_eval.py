@@ -0,0 +1,264 @@
+import chess
+import numpy as np
+
+from Ai.eval import PIECE_SQUARE_TABLES, PIECE_VALUES
+
+# Columns of the matrix returned by analyze_boards. Every feature is a white minus
+# black difference, negated when the position is scored for black.
+BATCH_FEATURES = [
+    'material_balance',     # Piece values (pawn 1, minor 3, rook 5, queen 9)
+    'piece_square',         # Piece-square table bonuses, in pawns
+    'doubled_pawns',        # Pawns beyond the first on each file
+    'isolated_pawns',       # Pawns with no friendly pawn on an adjacent file
+    'passed_pawns',         # Pawns with no enemy pawn ahead on their own or adjacent files
+    'control_of_center',    # Attacks on d4, e4, d5 and e5, counted per piece
+    'piece_mobility',       # Attacked squares not occupied by a friendly piece, counted per piece
+    'space_control',        # Squares attacked in the opponent's half of the board
+    'king_attack',          # Attacks on the squares around the enemy king, counted per piece
+    'pawn_shield',          # Friendly pawns next to the king
+    'hanging_pieces',       # Pieces attacked by the opponent and not defended
+    'bishop_pair'           # Whether the side has at least two bishops
+]
+
+DEFAULT_CHUNK_SIZE = 4096
+
+# Plane index of each (piece type, color): white pawn..king, then black pawn..king
+PLANES = {(piece_type, color): (0 if color == chess.WHITE else 6) + piece_type - 1
+          for color in chess.COLORS for piece_type in chess.PIECE_TYPES}
+
+_BB_EMPTY = np.uint64(0)
+_BB_ALL = np.uint64(chess.BB_ALL)
+_BB_NOT_FILE_A = np.uint64(chess.BB_ALL & ~chess.BB_FILE_A)
+_BB_NOT_FILE_H = np.uint64(chess.BB_ALL & ~chess.BB_FILE_H)
+_BB_CENTER = np.uint64(chess.BB_D4 | chess.BB_E4 | chess.BB_D5 | chess.BB_E5)
+
+# Half of the board belonging to the opponent of each color
+_BB_OPPONENT_HALF = {
+    chess.WHITE: np.uint64(chess.BB_RANK_5 | chess.BB_RANK_6 | chess.BB_RANK_7 | chess.BB_RANK_8),
+    chess.BLACK: np.uint64(chess.BB_RANK_1 | chess.BB_RANK_2 | chess.BB_RANK_3 | chess.BB_RANK_4)
+}
+
+# Sliding directions as (index step, squares that can be entered without wrapping around the board)
+_ORTHOGONAL_DIRECTIONS = [(8, _BB_ALL), (-8, _BB_ALL), (1, _BB_NOT_FILE_A), (-1, _BB_NOT_FILE_H)]
+_DIAGONAL_DIRECTIONS = [(9, _BB_NOT_FILE_A), (7, _BB_NOT_FILE_H), (-7, _BB_NOT_FILE_A), (-9, _BB_NOT_FILE_H)]
+
+_BB_SQUARES = np.array(chess.BB_SQUARES, dtype=np.uint64)
+_BB_KNIGHT_ATTACKS = np.array(chess.BB_KNIGHT_ATTACKS, dtype=np.uint64)
+_BB_KING_ATTACKS = np.array(chess.BB_KING_ATTACKS, dtype=np.uint64)
+_BB_KING_ZONES = _BB_KING_ATTACKS | _BB_SQUARES
+_BB_PAWN_ATTACKS = {color: np.array(chess.BB_PAWN_ATTACKS[color], dtype=np.uint64) for color in chess.COLORS}
+
+def _passed_pawn_spans(color):
+    """
+    Squares ahead of a pawn of the given color on its own and adjacent files.
+    """
+    spans = []
+    for square in chess.SQUARES:
+        file = chess.square_file(square)
+        rank = chess.square_rank(square)
+        span = 0
+        for target in chess.SQUARES:
+            ahead = chess.square_rank(target) > rank if color == chess.WHITE else chess.square_rank(target) < rank
+            if ahead and abs(chess.square_file(target) - file) <= 1:
+                span |= chess.BB_SQUARES[target]
+        spans.append(span)
+    return np.array(spans, dtype=np.uint64)
+
+_BB_PASSED_PAWN_SPANS = {color: _passed_pawn_spans(color) for color in chess.COLORS}
+
+# Piece-square tables in pawns, indexed [plane, square]
+_PIECE_SQUARE_VALUES = np.zeros((12, 64), dtype=np.float32)
+for (piece_type, color), plane in PLANES.items():
+    for square in chess.SQUARES:
+        table_square = square if color == chess.WHITE else chess.square_mirror(square)
+        _PIECE_SQUARE_VALUES[plane, square] = PIECE_SQUARE_TABLES[piece_type][table_square] / 100
+
+_PLANE_VALUES = np.array([PIECE_VALUES[piece_type] for piece_type in chess.PIECE_TYPES] * 2, dtype=np.float32)
+
+def _shift(bitboards, step):
+    """
+    Shift bitboards by step squares (towards h8 for positive steps).
+    """
+    if step > 0:
+        return (bitboards << np.uint64(step)) & _BB_ALL
+    return bitboards >> np.uint64(-step)
+
+def popcount(bitboards):
+    """
+    Count the set bits of each element of a uint64 array (SWAR bit counting).
+    """
+    x = bitboards - ((bitboards >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((x * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int64)
+
+def _sliding_attacks(sliders, empty, directions):
+    """
+    Attacks of sliding pieces along the given directions (Kogge-Stone occluded fill).
+
+    Parameters:
+    sliders (np.ndarray): uint64 bitboards of the sliding pieces.
+    empty (np.ndarray): uint64 bitboards of the empty squares, broadcastable to sliders.
+    directions (list): (step, mask) pairs, see _ORTHOGONAL_DIRECTIONS.
+
+    Returns:
+    np.ndarray: uint64 bitboards of the attacked squares.
+    """
+    attacks = np.zeros_like(sliders)
+    for step, mask in directions:
+        generator = sliders
+        propagator = empty & mask
+        generator = generator | (propagator & _shift(generator, step))
+        propagator = propagator & _shift(propagator, step)
+        generator = generator | (propagator & _shift(generator, 2 * step))
+        propagator = propagator & _shift(propagator, 2 * step)
+        generator = generator | (propagator & _shift(generator, 4 * step))
+        attacks |= _shift(generator, step) & mask
+    return attacks
+
+def pack_boards(boards):
+    """
+    Pack positions into piece bitboards and piece planes.
+
+    Parameters:
+    boards (list): chess.Board positions.
+
+    Returns:
+    np.ndarray: uint64 bitboards of shape (N, 12), one per plane (see PLANES).
+    np.ndarray: uint8 piece planes of shape (N, 12, 64).
+    """
+    bitboards = np.array([[board.pieces_mask(piece_type, color) for color in [chess.WHITE, chess.BLACK]
+                           for piece_type in chess.PIECE_TYPES] for board in boards], dtype=np.uint64).reshape(-1, 12)
+    planes = np.unpackbits(bitboards.astype('<u8').view(np.uint8), bitorder='little').reshape(-1, 12, 64)
+    return bitboards, planes
+
+def piece_attacks(bitboards, planes):
+    """
+    Attack bitboard of the piece on every square of every position.
+
+    Parameters:
+    bitboards (np.ndarray): uint64 bitboards of shape (N, 12), as returned by pack_boards.
+    planes (np.ndarray): uint8 piece planes of shape (N, 12, 64), as returned by pack_boards.
+
+    Returns:
+    np.ndarray: uint64 attack bitboards of shape (N, 64), 0 for empty squares.
+    """
+    occupied = np.bitwise_or.reduce(bitboards, axis=1)
+    empty = (~occupied & _BB_ALL)[:, None]
+    squares = np.broadcast_to(_BB_SQUARES, (len(bitboards), 64))
+
+    def on(piece_type, color=None):
+        if color is None:
+            return (planes[:, PLANES[piece_type, chess.WHITE]] | planes[:, PLANES[piece_type, chess.BLACK]]).astype(bool)
+        return planes[:, PLANES[piece_type, color]].astype(bool)
+
+    rook_like = on(chess.ROOK) | on(chess.QUEEN)
+    bishop_like = on(chess.BISHOP) | on(chess.QUEEN)
+    attacks = np.zeros((len(bitboards), 64), dtype=np.uint64)
+    attacks |= np.where(rook_like, _sliding_attacks(np.where(rook_like, squares, _BB_EMPTY), empty, _ORTHOGONAL_DIRECTIONS), _BB_EMPTY)
+    attacks |= np.where(bishop_like, _sliding_attacks(np.where(bishop_like, squares, _BB_EMPTY), empty, _DIAGONAL_DIRECTIONS), _BB_EMPTY)
+    attacks |= np.where(on(chess.KNIGHT), _BB_KNIGHT_ATTACKS, _BB_EMPTY)
+    attacks |= np.where(on(chess.KING), _BB_KING_ATTACKS, _BB_EMPTY)
+    for color in chess.COLORS:
+        attacks |= np.where(on(chess.PAWN, color), _BB_PAWN_ATTACKS[color], _BB_EMPTY)
+    return attacks
+
+def _side_features(bitboards, planes, attacks, color):
+    """
+    Features of one side, as an (N, 12) array in BATCH_FEATURES order.
+    """
+    base = PLANES[chess.PAWN, color]
+    enemy_base = PLANES[chess.PAWN, not color]
+    own = np.bitwise_or.reduce(bitboards[:, base:base + 6], axis=1)
+    own_squares = planes[:, base:base + 6].any(axis=1)
+    enemy_squares = planes[:, enemy_base:enemy_base + 6].any(axis=1)
+    own_attacks = np.where(own_squares, attacks, _BB_EMPTY)
+    enemy_attacks = np.where(enemy_squares, attacks, _BB_EMPTY)
+    own_attacked = np.bitwise_or.reduce(own_attacks, axis=1)
+    enemy_attacked = np.bitwise_or.reduce(enemy_attacks, axis=1)
+
+    pawns = planes[:, base].astype(bool)
+    enemy_pawns = bitboards[:, enemy_base]
+    pawns_per_file = planes[:, base].reshape(-1, 8, 8).sum(axis=1, dtype=np.int64)
+    pawn_files = pawns_per_file > 0
+    neighbour_files = np.zeros_like(pawn_files)
+    neighbour_files[:, 1:] |= pawn_files[:, :-1]
+    neighbour_files[:, :-1] |= pawn_files[:, 1:]
+
+    king_square = planes[:, PLANES[chess.KING, color]].argmax(axis=1)
+    enemy_king_square = planes[:, PLANES[chess.KING, not color]].argmax(axis=1)
+
+    features = np.zeros((len(bitboards), len(BATCH_FEATURES)), dtype=np.float32)
+    features[:, 0] = planes[:, base:base + 6].sum(axis=2) @ _PLANE_VALUES[:6]
+    features[:, 1] = (planes[:, base:base + 6] * _PIECE_SQUARE_VALUES[base:base + 6]).sum(axis=(1, 2))
+    features[:, 2] = np.maximum(pawns_per_file - 1, 0).sum(axis=1)
+    features[:, 3] = (pawns_per_file * ~neighbour_files).sum(axis=1)
+    features[:, 4] = (pawns & ((_BB_PASSED_PAWN_SPANS[color] & enemy_pawns[:, None]) == 0)).sum(axis=1)
+    features[:, 5] = popcount(own_attacks & _BB_CENTER).sum(axis=1)
+    features[:, 6] = popcount(own_attacks & ~own[:, None]).sum(axis=1)
+    features[:, 7] = popcount(own_attacked & _BB_OPPONENT_HALF[color])
+    features[:, 8] = popcount(own_attacks & _BB_KING_ZONES[enemy_king_square][:, None]).sum(axis=1)
+    features[:, 9] = popcount(bitboards[:, base] & _BB_KING_ATTACKS[king_square])
+    features[:, 10] = popcount(own & enemy_attacked & ~own_attacked)
+    features[:, 11] = planes[:, PLANES[chess.BISHOP, color]].sum(axis=1) >= 2
+    return features
+
+def analyze_packed(bitboards, planes, colors):
+    """
+    Compute BATCH_FEATURES for packed positions.
+
+    Parameters:
+    bitboards (np.ndarray): uint64 bitboards of shape (N, 12), as returned by pack_boards.
+    planes (np.ndarray): uint8 piece planes of shape (N, 12, 64), as returned by pack_boards.
+    colors (np.ndarray): Bool array of shape (N,), the color each position is scored for.
+
+    Returns:
+    np.ndarray: float32 matrix of shape (N, 12).
+    """
+    attacks = piece_attacks(bitboards, planes)
+    features = _side_features(bitboards, planes, attacks, chess.WHITE) - _side_features(bitboards, planes, attacks, chess.BLACK)
+    features[~colors] *= -1
+    return features
+
+def analyze_boards(boards, color=chess.WHITE, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Evaluate many positions at once with vectorized NumPy operations.
+
+    This is a lighter, batch counterpart of analyze_board: the features are
+    material, piece-square, pawn-structure, center-control, mobility and king
+    features (see BATCH_FEATURES), not the same twelve metrics.
+
+    Parameters:
+    boards (list): chess.Board positions.
+    color (bool or list): The color the positions are scored for, either one color for
+        every position or one color per position.
+    chunk_size (int): Number of positions evaluated together, to bound memory use.
+
+    Returns:
+    np.ndarray: float32 matrix of shape (N, 12), with columns in BATCH_FEATURES order.
+    """
+    boards = list(boards)
+    colors = np.broadcast_to(np.asarray(color, dtype=bool), (len(boards),))
+    results = [np.zeros((0, len(BATCH_FEATURES)), dtype=np.float32)]
+    for start in range(0, len(boards), chunk_size):
+        bitboards, planes = pack_boards(boards[start:start + chunk_size])
+        results.append(analyze_packed(bitboards, planes, colors[start:start + chunk_size]))
+    return np.concatenate(results)
+
+def analyze_game(board, color=chess.WHITE):
+    """
+    Evaluate every position of a game, from the starting position to the current one.
+
+    Parameters:
+    board (chess.Board): The final board, with the game's moves in its move stack.
+    color (bool): The color the positions are scored for.
+
+    Returns:
+    np.ndarray: float32 matrix of shape (number of moves + 1, 12).
+    """
+    replay = board.root()
+    positions = [replay.copy(stack=False)]
+    for move in board.move_stack:
+        replay.push(move)
+        positions.append(replay.copy(stack=False))
+    return analyze_boards(positions, color)
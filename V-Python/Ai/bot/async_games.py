@@ -0,0 +1,209 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import chess
+import chess.engine
+import numpy as np
+
+from Ai.bot.chess_bot import decode_move, encode_move, engine_path, evaluation_cache
+from Ai.bot.engine_pool import DEFAULT_ENGINE_OPTIONS
+
+DEFAULT_ENGINES = 4
+DEFAULT_ENGINE_LIMIT = chess.engine.Limit(time=0.1)
+
+class AsyncGameRunner:
+    """
+    Plays many games of the policy network against Stockfish at once, in one event loop.
+
+    Each game is a coroutine. Network moves are sent to an InferenceServer,
+    which batches the positions of all waiting games into one model call. In
+    a worker process, an InferenceClient can take the place of the server: its
+    requests are then sent one at a time, from a thread beside the event loop,
+    and batched with those of the other processes.
+    Engine moves are searched by a pool of engine processes driven through
+    python-chess's asyncio API. A game holds an engine only for the length of
+    one search, so a few engines serve many games, and no thread blocks
+    waiting for an engine reply.
+
+        with InferenceServer(model) as server:
+            runner = AsyncGameRunner(server, engines=4)
+            games = runner.run([chess.WHITE, chess.BLACK] * 16)
+            print(runner.stats())
+
+    Attributes:
+    inference (InferenceServer): Batched executor of the policy network, or an InferenceClient of one.
+    engine_path (str): Path of the engine executable.
+    engines (int): Number of engine processes.
+    limit (chess.engine.Limit): Search limit of the engine moves.
+    options (dict): UCI options configured on every engine that supports them.
+    """
+
+    def __init__(self, inference, engine_path=engine_path, engines=DEFAULT_ENGINES, limit=DEFAULT_ENGINE_LIMIT,
+                 options=None):
+        if engines < 1:
+            raise ValueError(f"engines must be at least 1, got {engines}")
+        self.inference = inference
+        self.engine_path = engine_path
+        self.engines = engines
+        self.limit = limit
+        self.options = DEFAULT_ENGINE_OPTIONS if options is None else options
+        self._games = []
+        self._wall_time = 0.0
+        self._client_thread = None
+
+    async def _start_engine(self):
+        transport, engine = await chess.engine.popen_uci(self.engine_path)
+        options = {name: value for name, value in self.options.items() if name in engine.options}
+        try:
+            if options:
+                await engine.configure(options)
+        except BaseException:
+            await self._quit_engines([engine])
+            raise
+        return engine
+
+    @staticmethod
+    async def _quit_engines(engines):
+        for engine in engines:
+            try:
+                await engine.quit()
+            except (chess.engine.EngineError, chess.engine.EngineTerminatedError):
+                pass
+
+    async def _network_move(self, board, inputs):
+        if hasattr(self.inference, 'submit'):
+            prediction = await asyncio.wrap_future(self.inference.submit(inputs))
+        else:
+            # A client waits for its reply, and takes one request at a time
+            prediction = await asyncio.get_running_loop().run_in_executor(self._client_thread, self.inference.predict,
+                                                                          inputs)
+        return decode_move(prediction[0], board)
+
+    async def _engine_move(self, board, engines, game_id):
+        engine = await engines.get()
+        try:
+            # The game token sends ucinewgame when the engine moves to another game
+            result = await engine.play(board, self.limit, game=game_id)
+        finally:
+            engines.put_nowait(engine)
+        return result.move
+
+    async def _play_game(self, game_id, color, engines, slots, analysis):
+        async with slots:
+            board = chess.Board()
+            states, actions = [], []
+            network_time = 0.0
+            engine_time = 0.0
+            start = time.perf_counter()
+
+            while not board.is_game_over():
+                move_start = time.perf_counter()
+                if board.turn == color:
+                    # The training state is the network input, in the encoding of the model
+                    inputs = self.inference.encode_boards([board])
+                    states.append(inputs[0])
+                    move = await self._network_move(board, inputs)
+                    actions.append(encode_move(move))
+                    network_time += time.perf_counter() - move_start
+                else:
+                    move = await self._engine_move(board, engines, game_id)
+                    engine_time += time.perf_counter() - move_start
+                board.push(move)
+
+            duration = time.perf_counter() - start
+            # analyze_board takes milliseconds, too long to run in the event loop
+            metrics = await asyncio.get_running_loop().run_in_executor(analysis, evaluation_cache.analyze, board, color)
+            game = {
+                'game_id': game_id,
+                'color': color,
+                'states': np.array(states, dtype=np.float32),
+                'actions': np.array(actions, dtype=np.int16),
+                'result': board.result(),
+                'moves': [move.uci() for move in board.move_stack],
+                'metrics': dict(metrics),
+                'stats': {
+                    'plies': len(board.move_stack),
+                    'seconds': duration,
+                    'plies_per_second': len(board.move_stack) / duration if duration else 0.0,
+                    'network_seconds': network_time,
+                    'engine_seconds': engine_time
+                }
+            }
+            self._games.append(game)
+            return game
+
+    async def play(self, colors, concurrency=None):
+        """
+        Play one game for each color given, concurrently.
+
+        Parameters:
+        colors (list): The color the network plays in each game (chess.WHITE or chess.BLACK).
+        concurrency (int): Maximum number of games in progress at once, all of them by default.
+
+        Returns:
+        list: A dict per game, in order of completion, as from SelfPlayPool.play, with
+        per-game 'stats': plies, seconds, plies_per_second, and the seconds spent
+        waiting for network and for engine moves.
+        """
+        colors = list(colors)
+        slots = asyncio.Semaphore(concurrency or max(len(colors), 1))
+        engines = asyncio.Queue()
+        started = await asyncio.gather(*[self._start_engine() for _ in range(self.engines)], return_exceptions=True)
+        errors = [engine for engine in started if isinstance(engine, BaseException)]
+        started = [engine for engine in started if not isinstance(engine, BaseException)]
+        if errors:
+            await self._quit_engines(started)
+            raise errors[0]
+        for engine in started:
+            engines.put_nowait(engine)
+
+        # One thread for the game metrics, as the evaluation cache is not thread-safe
+        analysis = ThreadPoolExecutor(max_workers=1)
+        self._client_thread = ThreadPoolExecutor(max_workers=1)
+        start = time.perf_counter()
+        first_game = len(self._games)
+        tasks = [asyncio.ensure_future(self._play_game(first_game + index, color, engines, slots, analysis))
+                 for index, color in enumerate(colors)]
+        try:
+            games = [await game for game in asyncio.as_completed(tasks)]
+        finally:
+            # If a game failed, stop the others before their engines are quit
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._wall_time += time.perf_counter() - start
+            analysis.shutdown()
+            self._client_thread.shutdown()
+            await self._quit_engines(started)
+        return games
+
+    def run(self, colors, concurrency=None):
+        """
+        Play the games from synchronous code, see play().
+        """
+        return asyncio.run(self.play(colors, concurrency))
+
+    def stats(self):
+        """
+        Return the throughput of all games played so far.
+
+        Returns:
+        dict: games, plies, wall_seconds (time spent in play), games_per_second,
+        plies_per_second, and mean_network_ms and mean_engine_ms per move.
+        """
+        games = len(self._games)
+        plies = sum(game['stats']['plies'] for game in self._games)
+        network_moves = sum(len(game['actions']) for game in self._games)
+        engine_moves = plies - network_moves
+        network_time = sum(game['stats']['network_seconds'] for game in self._games)
+        engine_time = sum(game['stats']['engine_seconds'] for game in self._games)
+        return {
+            'games': games,
+            'plies': plies,
+            'wall_seconds': self._wall_time,
+            'games_per_second': games / self._wall_time if self._wall_time else 0.0,
+            'plies_per_second': plies / self._wall_time if self._wall_time else 0.0,
+            'mean_network_ms': network_time * 1000 / network_moves if network_moves else 0.0,
+            'mean_engine_ms': engine_time * 1000 / engine_moves if engine_moves else 0.0
+        }
@@ -4,14 +4,15 @@ import numpy as np
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense, Conv2D, Flatten, Reshape, Add, Attention, LSTM, Dropout
-from tensorflow.keras.optimizers import Adam
-import os
-import keras_tuner as kt
+import atexit
 import sys
-import random
+import time
 
 sys.path.append(r"C:\Users\girsh\Desktop\Personal\Web\Active\Chess_Bot\V-Python")
-from Ai.eval import analyze_board
+from Ai.eval_cache import EvaluationCache
+from Ai.bot.engine_pool import EnginePool
+from Ai.bot.encoding import PLANES_SHAPE, boards_encoder, boards_to_input, encode_move, legal_move_indices
+from Ai.bot.game_dataset import GameDataset
 
 # Define the path to the Stockfish engine
 engine_path = r"C:\Users\girsh\Desktop\Personal\Web\Active\stockfish\stockfish-windows-x86-64-avx2.exe"
@@ -19,66 +20,190 @@ engine_path = r"C:\Users\girsh\Desktop\Personal\Web\Active\stockfish\stockfish-w
 model_path = 'Ai/bot/chess_model.h5'
 # Define the folder to save game data
 game_data_folder = 'game_data'
+# Played games, appended to the shards of game_data_folder
+game_dataset = GameDataset(game_data_folder)
+atexit.register(game_dataset.close)
+# Stockfish processes kept running between games, started on first use
+engine_pool = EnginePool(engine_path)
+atexit.register(engine_pool.close)
+# Evaluation metrics shared by every game, so recurring positions are analyzed once
+evaluation_cache = EvaluationCache(max_size=100000)
+# Samples per forward pass when training the policy
+training_batch_size = 256
+
+def legal_move_mask(board):
+    """
+    Return a boolean mask of the policy entries of the legal moves.
+    """
+    mask = np.zeros(64 * 64, dtype=bool)
+    mask[legal_move_indices(board)[1]] = True
+    return mask
+
+def _move_probabilities(scores, temperature):
+    # Legal move probabilities, sharpened or flattened by the temperature
+    scores = np.maximum(scores.astype(np.float64), 0) ** (1 / temperature)
+    total = scores.sum()
+    if total <= 0 or not np.isfinite(total):
+        return np.full(len(scores), 1 / len(scores))
+    return scores / total
+
+def decode_move(prediction, board, temperature=0.0, rng=None):
+    """
+    Select a legal move from the policy output.
+
+    Parameters:
+    prediction (np.ndarray): Policy output of 64 * 64 move probabilities.
+    board (chess.Board): The position the prediction was made for.
+    temperature (float): 0 plays the most probable legal move; otherwise a move is
+        sampled with probabilities proportional to prediction ** (1 / temperature).
+    rng (np.random.Generator): Random generator used for sampling.
+
+    Returns:
+    chess.Move: The selected move, or None if there are no legal moves.
+    """
+    moves, indices = legal_move_indices(board)
+    if not moves:
+        return None
+    scores = prediction[indices]
+    if temperature <= 0:
+        return moves[int(np.argmax(scores))]
+    rng = rng or np.random.default_rng()
+    return moves[rng.choice(len(moves), p=_move_probabilities(scores, temperature))]
+
+def top_k_moves(prediction, board, k):
+    """
+    Return the k most probable legal moves of the policy output, best first.
+
+    Returns:
+    list: (move, probability) pairs; probabilities are renormalized over the legal moves.
+    """
+    moves, indices = legal_move_indices(board)
+    if not moves:
+        return []
+    probabilities = _move_probabilities(prediction[indices], 1.0)
+    best = np.argsort(-probabilities, kind='stable')[:k]
+    return [(moves[i], float(probabilities[i])) for i in best]
+
+class PolicyInference:
+    """
+    Low-overhead inference of the policy network, for one position at a time or small batches.
+
+    model.predict sets up a data adapter and callbacks on every call, which costs
+    tens of milliseconds for a single position. Here the model is wrapped once in
+    a tf.function with a fixed input signature (any batch of the model's input
+    shape), traced by a warm-up call, and inputs are encoded into a preallocated
+    buffer. Models taking PLANES_SHAPE inputs get boards_to_planes encodings,
+    others the 64-value boards_to_input.
+
+    Attributes:
+    model (tf.keras.Model): The policy network.
+    input_shape (tuple): Shape of one model input.
+    encode_boards (callable): Encoder of the model inputs, boards_to_planes or boards_to_input.
+    timings (dict): Seconds spent encoding boards, running the model and decoding moves.
+    moves (int): Number of moves selected with select_move.
+    """
+
+    def __init__(self, model, max_batch_size=1):
+        self.model = model
+        self.timings = {'encode': 0.0, 'inference': 0.0, 'decode': 0.0}
+        self.moves = 0
+        self.input_shape = tuple(model.input_shape[1:])
+        self.encode_boards = boards_encoder(self.input_shape)
+        self._buffer = np.zeros((max_batch_size,) + self.input_shape, dtype=np.float32)
+        self._predict = tf.function(
+            lambda inputs: model(inputs, training=False),
+            input_signature=[tf.TensorSpec(shape=(None,) + self.input_shape, dtype=tf.float32)]
+        )
+        # Trace the graph now rather than on the first move
+        self._predict(self._buffer[:1])
+
+    def predict(self, input_vectors):
+        """
+        Run the policy network on a batch of input vectors.
+
+        Parameters:
+        input_vectors (np.ndarray): Inputs of shape (batch,) + input_shape.
+
+        Returns:
+        np.ndarray: Move probabilities of shape (batch, 64 * 64).
+        """
+        return self._predict(np.asarray(input_vectors, dtype=np.float32)).numpy()
+
+    def predict_boards(self, boards):
+        """
+        Return the move probabilities of each board, shape (len(boards), 64 * 64).
+        """
+        if len(boards) > len(self._buffer):
+            self._buffer = np.zeros((len(boards),) + self.input_shape, dtype=np.float32)
+        inputs = self.encode_boards(boards, self._buffer[:len(boards)])
+        return self._predict(inputs).numpy()
+
+    def select_move(self, board, inputs=None):
+        """
+        Return the network's move in a position, recording the time of each step.
+
+        Parameters:
+        board (chess.Board): The position.
+        inputs (np.ndarray): The position already encoded with encode_boards, one model input, optional.
+        """
+        start = time.perf_counter()
+        if inputs is None:
+            inputs = self.encode_boards([board], self._buffer[:1])
+        else:
+            inputs = np.asarray(inputs, dtype=np.float32)[np.newaxis]
+        encoded = time.perf_counter()
+        prediction = self._predict(inputs).numpy()[0]
+        predicted = time.perf_counter()
+        move = decode_move(prediction, board)
+        decoded = time.perf_counter()
+
+        self.timings['encode'] += encoded - start
+        self.timings['inference'] += predicted - encoded
+        self.timings['decode'] += decoded - predicted
+        self.moves += 1
+        return move
+
+    def latency(self):
+        """
+        Return the average milliseconds per move spent in each step, and in total.
+        """
+        if not self.moves:
+            return {step: 0.0 for step in list(self.timings) + ['total']}
+        latency = {step: seconds * 1000 / self.moves for step, seconds in self.timings.items()}
+        latency['total'] = sum(latency.values())
+        return latency
 
-def get_next_game_num(folder):
-    files = os.listdir(folder)
-    if not files:
-        return 0
-    game_nums = [int(file.split('_')[1].split('.')[0]) for file in files if file.startswith('game_')]
-    return max(game_nums) + 1
-
-def save_game_data(game_data, game_num, result, folder=game_data_folder):
-    os.makedirs(folder, exist_ok=True)
-    file_name = os.path.join(folder, f'game_{game_num:04d}.npz')
-    input_vectors, move_vectors = zip(*game_data)
-    np.savez(file_name, input_vectors=input_vectors, move_vectors=move_vectors, result=result)
-
-def board_to_input(board):
-    input_vector = np.zeros(64)
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
-        if piece:
-            input_vector[square] = piece_value(piece)
-    return input_vector
-
-def piece_value(piece):
-    piece_type = piece.piece_type
-    color = 1 if piece.color == chess.WHITE else -1
-    values = {
-        chess.PAWN: 1,
-        chess.KNIGHT: 3,
-        chess.BISHOP: 3,
-        chess.ROOK: 5,
-        chess.QUEEN: 9,
-        chess.KING: 0
-    }
-    return values[piece_type] * color
-
-def encode_move(move):
-    from_square = move.from_square
-    to_square = move.to_square
-    move_vector = np.zeros(64 * 64)
-    move_vector[from_square * 64 + to_square] = 1
-    return move_vector
-
-def decode_move(prediction, board):
-    legal_moves = list(board.legal_moves)
-    move_scores = {move: prediction[encode_move(move).argmax()] for move in legal_moves}
-    best_move = max(legal_moves, key=lambda move: move_scores[move])
-    return best_move
+# Inference of each model, shared by its bots so the graph is traced once per
+# model rather than once per bot. An entry keeps its model alive, so ids are not reused.
+_policy_inferences = {}
 
 class ChessBot:
-    def __init__(self, model):
+    def __init__(self, model, limit=None):
+        # model is a Keras policy network, or an engine with a play(board, limit)
+        # method: a chess.engine.SimpleEngine or an Ai.search.SearchEngine
         self.model = model
         self.is_ai_model = isinstance(model, tf.keras.Model)
+        self.limit = limit or chess.engine.Limit(time=0.1)
+        self.inference = None
+        if self.is_ai_model:
+            if id(model) not in _policy_inferences:
+                _policy_inferences[id(model)] = PolicyInference(model)
+            self.inference = _policy_inferences[id(model)]
+        # Encoder of the training states, the one the network behind the bot takes
+        if self.is_ai_model:
+            self.encode_boards = self.inference.encode_boards
+        else:
+            self.encode_boards = getattr(model, 'encode_boards', boards_to_input)
 
-    def select_move(self, board):
+    def select_move(self, board, inputs=None):
+        # inputs, the board encoded with encode_boards, saves encoding it again
         if self.is_ai_model:
-            input_vector = board_to_input(board)
-            prediction = self.model.predict(np.array([input_vector]))[0]
-            move = decode_move(prediction, board)
+            move = self.inference.select_move(board, inputs)
+        elif inputs is not None and hasattr(self.model, 'predict'):
+            # A network behind an InferenceClient or InferenceServer
+            move = decode_move(self.model.predict(np.asarray(inputs)[np.newaxis])[0], board)
         else:
-            result = self.model.play(board, chess.engine.Limit(time=0.1))
+            result = self.model.play(board, self.limit)
             move = result.move
         
         return move
@@ -118,9 +243,14 @@ class BahdanauAttention(tf.keras.layers.Layer):
 
         return context_vector, attention_weights
 
-def create_policy_model():
-    inputs = tf.keras.layers.Input(shape=(64,))
-    reshaped_inputs = tf.keras.layers.Reshape((8, 8, 1))(inputs)
+def create_policy_model(planes=False):
+    # With planes, the model takes the board_to_planes encoding instead of the 64-value board_to_input
+    if planes:
+        inputs = tf.keras.layers.Input(shape=PLANES_SHAPE)
+        reshaped_inputs = inputs
+    else:
+        inputs = tf.keras.layers.Input(shape=(64,))
+        reshaped_inputs = tf.keras.layers.Reshape((8, 8, 1))(inputs)
     conv1 = tf.keras.layers.Conv2D(64, (3, 3), activation='relu', padding='same')(reshaped_inputs)
     conv2 = tf.keras.layers.Conv2D(128, (3, 3), activation='relu', padding='same')(conv1)
     conv3 = tf.keras.layers.Conv2D(128, (3, 3), activation='relu', padding='same')(conv2)
@@ -143,53 +273,158 @@ def create_policy_model():
     model = tf.keras.Model(inputs=inputs, outputs=outputs)
     return model
 
+class PolicyTrainer:
+    """
+    Batched policy-gradient training of the policy network.
+
+    The loss of a minibatch is -sum(log(p(action)) * advantage), the
+    log-probabilities being gathered from the predictions at the action
+    indices. Each minibatch takes one forward and backward pass in a
+    tf.function compiled once, for minibatches of any size. Gradients of
+    accumulation_steps minibatches are summed before being applied, so the
+    update is the same as for one pass over all of them.
+
+    Attributes:
+    model (tf.keras.Model): The policy network.
+    optimizer (tf.keras.optimizers.Optimizer): Optimizer applying the gradients.
+    batch_size (int): Samples per minibatch.
+    accumulation_steps (int): Minibatches per optimizer step; None for one step per call of train.
+    """
+
+    def __init__(self, model, optimizer, batch_size=training_batch_size, accumulation_steps=None):
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+        self.model = model
+        self.optimizer = optimizer
+        self.batch_size = batch_size
+        self.accumulation_steps = accumulation_steps
+        self._gradients = tf.function(self._minibatch_gradients, input_signature=[
+            tf.TensorSpec(shape=(None,) + tuple(model.input_shape[1:]), dtype=tf.float32),
+            tf.TensorSpec(shape=(None,), dtype=tf.int32),
+            tf.TensorSpec(shape=(None,), dtype=tf.float32)
+        ])
+
+    def _minibatch_gradients(self, states, actions, advantages):
+        with tf.GradientTape() as tape:
+            predictions = self.model(states)
+            log_probs = tf.math.log(tf.gather(predictions, actions, batch_dims=1))
+            loss = -tf.reduce_sum(log_probs * advantages)
+        gradients = tape.gradient(loss, self.model.trainable_variables,
+                                  unconnected_gradients=tf.UnconnectedGradients.ZERO)
+        return loss, gradients
+
+    def _apply(self, gradients):
+        self.optimizer.apply_gradients(zip(gradients, self.model.trainable_variables))
+
+    def train(self, states, actions, advantages):
+        """
+        Train on a set of samples.
+
+        Parameters:
+        states (np.ndarray): Model inputs, stacked along the first axis.
+        actions (np.ndarray): Policy index of the move played in each state.
+        advantages (np.ndarray): Weight of each sample's log-probability.
+
+        Returns:
+        float: The loss over all samples, before the update.
+        """
+        states = np.asarray(states, dtype=np.float32)
+        actions = np.asarray(actions, dtype=np.int32)
+        advantages = np.asarray(advantages, dtype=np.float32)
+
+        total_loss = 0.0
+        accumulated = None
+        steps = 0
+        for start in range(0, len(states), self.batch_size):
+            end = start + self.batch_size
+            loss, gradients = self._gradients(states[start:end], actions[start:end], advantages[start:end])
+            total_loss += float(loss)
+            if accumulated is None:
+                accumulated = list(gradients)
+            else:
+                accumulated = [total + gradient for total, gradient in zip(accumulated, gradients)]
+            steps += 1
+            if self.accumulation_steps is not None and steps == self.accumulation_steps:
+                self._apply(accumulated)
+                accumulated = None
+                steps = 0
+        if accumulated is not None:
+            self._apply(accumulated)
+        return total_loss
+
+# Trainers by model and optimizer, so each compiles its training step once. A
+# trainer keeps its model and optimizer alive, so the ids are not reused.
+_policy_trainers = {}
+
 def train_policy_model(model, states, actions, rewards, metrics_list, optimizer):
-    with tf.GradientTape() as tape:
-        loss = 0
-        for state, action, reward, metrics in zip(states, actions, rewards, metrics_list):
-            state = np.array([state])
-            action = np.array([action])
-            prediction = model(state)
-            log_prob = tf.math.log(tf.reduce_sum(prediction * action))
-            # Ensure metrics is a scalar value before addition
-            scalar_metrics = sum(metrics.values()) / len(metrics)
-            loss -= log_prob * (reward + scalar_metrics)
-    grads = tape.gradient(loss, model.trainable_variables)
-    optimizer.apply_gradients(zip(grads, model.trainable_variables))
-
-def play_game(model, color):
+    samples = list(zip(states, actions, rewards, metrics_list))
+    if not samples:
+        return
+    states, actions, rewards, metrics_list = zip(*samples)
+    # Ensure metrics is a scalar value before addition
+    advantages = [reward + sum(metrics.values()) / len(metrics) for reward, metrics in zip(rewards, metrics_list)]
+
+    key = (id(model), id(optimizer))
+    if key not in _policy_trainers:
+        _policy_trainers[key] = PolicyTrainer(model, optimizer)
+    _policy_trainers[key].train(np.array(states), np.array(actions), np.array(advantages))
+
+def play_engine_game(bot, engine, color, verbose=True):
+    """
+    Play a game of the bot against an engine.
+
+    Parameters:
+    bot (ChessBot): The bot, playing color.
+    engine (chess.engine.SimpleEngine): The opponent, or a PooledEngine from an EnginePool.
+    color (bool): The color of the bot (chess.WHITE or chess.BLACK).
+    verbose (bool): Print the board after every move.
+
+    Returns:
+    tuple: The model inputs of the positions the bot moved in, encoded with
+    bot.encode_boards, its moves encoded with encode_move, and the final board.
+    """
     board = chess.Board()
-    engine = chess.engine.SimpleEngine.popen_uci(engine_path)
-    
-    all_states, all_actions, all_rewards, all_metrics = [], [], [], []
-    
+    states, actions = [], []
+
     while not board.is_game_over():
         if (board.turn == chess.WHITE and color == chess.WHITE) or (board.turn == chess.BLACK and color == chess.BLACK):
-            input_vector = board_to_input(board)
-            move = ChessBot(model).select_move(board)
+            input_vector = bot.encode_boards([board])[0]
+            move = bot.select_move(board, input_vector)
             board.push(move)
-            action_vector = encode_move(move)
-            all_states.append(input_vector)
-            all_actions.append(action_vector)
-            print(board)
+            states.append(input_vector)
+            actions.append(encode_move(move))
+            if verbose:
+                print(board)
         else:
             result = engine.play(board, chess.engine.Limit(time=0.1))
             board.push(result.move)
-            print()
-            print(board)
+            if verbose:
+                print()
+                print(board)
+
+    return states, actions, board
+
+def play_game(model, color, optimizer):
+    # Bots of the same model share its compiled inference function, traced on the first game
+    bot = ChessBot(model)
+    
+    all_states, all_actions, all_rewards, all_metrics = [], [], [], []
+    with engine_pool.engine() as engine:
+        states, actions, board = play_engine_game(bot, engine, color)
+    all_states.extend(states)
+    all_actions.extend(actions)
     
     result = board.result()
     reward = result_to_value(result)
     rewards = [reward] * len(all_states)
-    metrics = analyze_board(board, color)
+    metrics = evaluation_cache.analyze(board, color)
     all_metrics.append(metrics)  # Collect metrics for this game
 
     # Calculate additional evaluation metrics
     train_policy_model(model, all_states, all_actions, rewards, all_metrics, optimizer)
-    engine.quit()
 
     # Save the game data
-    save_game_data(list(zip(all_states, all_actions)), get_next_game_num(game_data_folder), result)
+    game_dataset.append(board, color, {'metrics': metrics})
     
     return all_states, all_actions, rewards, all_metrics  # Return all variables collected during the game
 
@@ -251,61 +486,7 @@ def hypermodel_builder(hp):
         optimizer=tf.keras.optimizers.Adam(
             learning_rate=hp.Choice('learning_rate', values=[1e-4, 1e-3, 1e-2])
         ),
-        loss='categorical_crossentropy'
+        loss='sparse_categorical_crossentropy'
     )
 
     return model
-
-
-
-
-
-# Hyperparameter tuning with Keras Tuner
-tuner = kt.Hyperband(
-    hypermodel_builder,
-    objective='val_loss',
-    max_epochs=10,
-    factor=3,
-    directory='hyperband',
-    project_name='chess_ai'
-)
-
-# Main training loop
-# Load or create the model using the best hyperparameters
-tuner.search_space_summary()
-tuner.search(
-    x=np.zeros((1, 64)),  # Dummy data for search
-    y=np.zeros((1, 64 * 64)),  # Dummy data for search
-    epochs=5,
-    validation_data=(np.zeros((1, 64)), np.zeros((1, 64 * 64)))
-)
-best_hps = tuner.get_best_hyperparameters(num_trials=1)[0]
-model = tuner.hypermodel.build(best_hps)
-
-optimizer = Adam(learning_rate=best_hps.get('learning_rate'))
-
-# Accumulate data from all games across all epochs
-all_states, all_actions, all_rewards, all_metrics = [], [], [], []
-
-for epoch in range(10):  # Train for 10 epochs
-    for _ in range(10):  # Play 10 games per epoch
-        color = random.choice([chess.WHITE, chess.BLACK])  # Randomly choose color for each game
-        states, actions, rewards, metrics = play_game(model, color)
-        all_states.extend(states)
-        all_actions.extend(actions)
-        all_rewards.extend(rewards)
-        all_metrics.extend(metrics)
-
-    # Print or save additional evaluation metrics if needed
-    # For example:
-    avg_material_balance = np.mean([metrics['material_balance'] for metrics in all_metrics])
-    avg_piece_mobility = np.mean([metrics['piece_mobility'] for metrics in all_metrics])
-    avg_piece_coordination = np.mean([metrics['piece_coordination'] for metrics in all_metrics])
-    print(f"Epoch {epoch+1}: Average Material Balance: {avg_material_balance}, Average Piece Mobility: {avg_piece_mobility}, Average Piece Coordination: {avg_piece_coordination}")
-
-    # Train the model on collected data after each epoch
-    train_policy_model(model, all_states, all_actions, all_rewards, all_metrics, optimizer)
-
-# Save the trained model
-model.save(model_path)
-print("Training completed.")
\ No newline at end of file
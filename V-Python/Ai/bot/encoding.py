@@ -0,0 +1,209 @@
+import chess
+import numpy as np
+
+# Input value of each piece type, positive for white and negative for black
+PIECE_INPUT_VALUES = {
+    chess.PAWN: 1,
+    chess.KNIGHT: 3,
+    chess.BISHOP: 3,
+    chess.ROOK: 5,
+    chess.QUEEN: 9,
+    chess.KING: 0
+}
+
+# Piece planes: white pawns, knights, bishops, rooks, queens, king, then the same for black
+PIECE_PLANES = [(color, piece_type) for color in [chess.WHITE, chess.BLACK] for piece_type in chess.PIECE_TYPES]
+_PIECE_PLANE_VALUES = np.array([PIECE_INPUT_VALUES[piece_type] * (1 if color == chess.WHITE else -1)
+                                for color, piece_type in PIECE_PLANES], dtype=np.float64)
+
+# Planes of board_to_planes after the piece planes: side to move, castling rights,
+# en passant square and repetition
+SIDE_TO_MOVE_PLANE = 12
+CASTLING_PLANES = [13, 14, 15, 16]  # white kingside, white queenside, black kingside, black queenside
+EN_PASSANT_PLANE = 17
+REPETITION_PLANE = 18
+PLANE_COUNT = 19
+PLANES_SHAPE = (8, 8, PLANE_COUNT)
+
+def piece_value(piece):
+    """
+    Return the input value of a piece: PIECE_INPUT_VALUES, negated for black.
+    """
+    value = PIECE_INPUT_VALUES[piece.piece_type]
+    return value if piece.color == chess.WHITE else -value
+
+def _piece_bitboards(board, bitboards):
+    # Fill the 12 piece bitboards of a board, in PIECE_PLANES order
+    pieces = [board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings]
+    white = board.occupied_co[chess.WHITE]
+    black = board.occupied_co[chess.BLACK]
+    for index, mask in enumerate(pieces):
+        bitboards[index] = mask & white
+        bitboards[index + 6] = mask & black
+
+def _unpack(bitboards):
+    """
+    Unpack an array of bitboards into one 0/1 value per square, indexed by square.
+
+    Parameters:
+    bitboards (np.ndarray): uint64 array of any shape.
+
+    Returns:
+    np.ndarray: uint8 array of shape bitboards.shape + (64,).
+    """
+    as_bytes = bitboards.astype('<u8').view(np.uint8).reshape(bitboards.shape + (8,))
+    return np.unpackbits(as_bytes, axis=-1, bitorder='little')
+
+def boards_to_bitboards(boards):
+    """
+    Return the piece bitboards of boards, the compact form of boards_to_input.
+
+    Parameters:
+    boards (list): chess.Board objects.
+
+    Returns:
+    np.ndarray: uint64 array of shape (len(boards), 12), one bitboard per PIECE_PLANES entry.
+    """
+    bitboards = np.zeros((len(boards), len(PIECE_PLANES)), dtype=np.uint64)
+    for row, board in zip(bitboards, boards):
+        _piece_bitboards(board, row)
+    return bitboards
+
+def bitboards_to_input(bitboards, out=None):
+    """
+    Encode piece bitboards from boards_to_bitboards as 64-value inputs, see boards_to_input.
+
+    Parameters:
+    bitboards (np.ndarray): uint64 array of shape (n, 12).
+    out (np.ndarray): Preallocated array of shape (n, 64) to fill, optional.
+
+    Returns:
+    np.ndarray: The inputs, of shape (n, 64).
+    """
+    inputs = _PIECE_PLANE_VALUES @ _unpack(np.asarray(bitboards, dtype=np.uint64))
+    if out is None:
+        return inputs
+    out[...] = inputs
+    return out
+
+def boards_to_input(boards, out=None):
+    """
+    Encode boards as 64-value inputs: the piece_value of the piece on each square, 0 if empty.
+
+    Parameters:
+    boards (list): chess.Board objects.
+    out (np.ndarray): Preallocated array of shape (len(boards), 64) to fill, optional.
+
+    Returns:
+    np.ndarray: The inputs, of shape (len(boards), 64).
+    """
+    inputs = bitboards_to_input(boards_to_bitboards(boards))
+    if out is None:
+        return inputs
+    out[...] = inputs
+    return out
+
+def board_to_input(board, out=None):
+    """
+    Encode a board as a 64-value input, see boards_to_input.
+
+    Parameters:
+    board (chess.Board): The chess board.
+    out (np.ndarray): Preallocated array of 64 values to fill, optional.
+
+    Returns:
+    np.ndarray: The input vector.
+    """
+    inputs = boards_to_input([board])[0]
+    if out is None:
+        return inputs
+    out[...] = inputs
+    return out
+
+def boards_to_planes(boards, out=None):
+    """
+    Encode boards as stacks of 8x8 planes, channels last.
+
+    Planes 0-11 mark the squares of each piece type (PIECE_PLANES). The others
+    are filled with the same value on every square: side to move (1 for white),
+    the four castling rights, and whether the position has occurred before.
+    The en passant plane marks the en passant square, if an en passant capture
+    is legal.
+
+    Parameters:
+    boards (list): chess.Board objects.
+    out (np.ndarray): Preallocated array of shape (len(boards),) + PLANES_SHAPE to fill, optional.
+
+    Returns:
+    np.ndarray: float32 planes of shape (len(boards), 8, 8, PLANE_COUNT).
+    """
+    bitboards = np.zeros((len(boards), EN_PASSANT_PLANE + 1), dtype=np.uint64)
+    flags = np.zeros((len(boards), PLANE_COUNT), dtype=np.uint8)
+    for index, board in enumerate(boards):
+        row = bitboards[index]
+        _piece_bitboards(board, row)
+        if board.has_legal_en_passant():
+            row[EN_PASSANT_PLANE] = chess.BB_SQUARES[board.ep_square]
+        flags[index, SIDE_TO_MOVE_PLANE] = board.turn == chess.WHITE
+        flags[index, CASTLING_PLANES] = [board.has_kingside_castling_rights(chess.WHITE),
+                                         board.has_queenside_castling_rights(chess.WHITE),
+                                         board.has_kingside_castling_rights(chess.BLACK),
+                                         board.has_queenside_castling_rights(chess.BLACK)]
+        flags[index, REPETITION_PLANE] = board.is_repetition(2)
+
+    planes = np.zeros((len(boards), PLANE_COUNT, 64), dtype=np.uint8)
+    planes[:, :EN_PASSANT_PLANE + 1] = _unpack(bitboards)
+    planes |= flags[:, :, np.newaxis]
+
+    if out is None:
+        out = np.empty((len(boards),) + PLANES_SHAPE, dtype=np.float32)
+    out[...] = planes.transpose(0, 2, 1).reshape((len(boards),) + PLANES_SHAPE)
+    return out
+
+def boards_encoder(input_shape):
+    """
+    Return the batch encoder of a model's inputs: boards_to_planes for PLANES_SHAPE, boards_to_input otherwise.
+
+    Parameters:
+    input_shape (tuple): Shape of one model input, without the batch dimension.
+
+    Returns:
+    callable: boards_to_planes or boards_to_input.
+    """
+    return boards_to_planes if tuple(input_shape) == PLANES_SHAPE else boards_to_input
+
+def board_to_planes(board, out=None):
+    """
+    Encode a board as a stack of 8x8 planes, see boards_to_planes.
+
+    Returns:
+    np.ndarray: float32 planes of shape PLANES_SHAPE.
+    """
+    planes = boards_to_planes([board])[0]
+    if out is None:
+        return planes
+    out[...] = planes
+    return out
+
+def move_index(move):
+    # Index of a move in the 64 * 64 policy output
+    return move.from_square * 64 + move.to_square
+
+def encode_move(move):
+    # Training target of a move: its policy index, as int16 rather than a 4096-value one-hot vector
+    return np.int16(move_index(move))
+
+def legal_move_indices(board):
+    """
+    Return the legal moves the policy can choose from and their policy indices.
+
+    The policy has one entry per from and to square, so all promotions of a pawn
+    on the same square share an entry. That entry is read as the queen
+    promotion; underpromotions are left out.
+
+    Returns:
+    tuple: List of moves, and np.ndarray of their indices in the policy output.
+    """
+    moves = [move for move in board.legal_moves if move.promotion is None or move.promotion == chess.QUEEN]
+    indices = np.fromiter((move.from_square * 64 + move.to_square for move in moves), dtype=np.int64, count=len(moves))
+    return moves, indices
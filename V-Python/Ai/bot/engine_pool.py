@@ -0,0 +1,174 @@
+import contextlib
+import queue
+import threading
+
+import chess.engine
+
+# UCI options set once on every engine of a pool, when the engine supports them
+DEFAULT_ENGINE_OPTIONS = {'Threads': 1, 'Hash': 16}
+
+# Errors showing that an engine process is no longer usable
+ENGINE_ERRORS = (chess.engine.EngineError, chess.engine.EngineTerminatedError, TimeoutError, OSError)
+
+class PooledEngine:
+    """
+    An engine checked out of an EnginePool for one game.
+
+    play and analyse tell the engine that they belong to a single game, so
+    it receives ucinewgame before the first search of each checkout. Other
+    engine methods are available through the engine attribute; the engine
+    belongs to the pool and must not be quit.
+
+    Attributes:
+    engine (chess.engine.SimpleEngine): The engine process.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.game = object()
+
+    def play(self, board, limit, **kwargs):
+        kwargs.setdefault('game', self.game)
+        return self.engine.play(board, limit, **kwargs)
+
+    def analyse(self, board, limit, **kwargs):
+        kwargs.setdefault('game', self.game)
+        return self.engine.analyse(board, limit, **kwargs)
+
+class EnginePool:
+    """
+    Warm UCI engine processes, reused from game to game.
+
+    Engines are started on demand, up to size, configured once with options,
+    and handed out by the engine() context manager, one game at a time:
+
+        with engine_pool.engine() as engine:
+            result = engine.play(board, chess.engine.Limit(time=0.1))
+
+    An engine is pinged before it is handed out and replaced if it does not
+    answer. An engine that fails during a game is discarded when the game
+    ends, and another is started the next time one is needed.
+
+    Attributes:
+    engine_path (str): Path of the engine executable.
+    size (int): Maximum number of engine processes.
+    options (dict): UCI options configured on every engine.
+    timeout (float): Seconds to wait for a free engine, None to wait as long as needed.
+    restarts (int): Number of engines replaced after failing.
+    """
+
+    def __init__(self, engine_path, size=1, options=None, timeout=None):
+        if size < 1:
+            raise ValueError(f"size must be at least 1, got {size}")
+        self.engine_path = engine_path
+        self.size = size
+        self.options = DEFAULT_ENGINE_OPTIONS if options is None else options
+        self.timeout = timeout
+        self.restarts = 0
+        self._idle = queue.LifoQueue()
+        self._started = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _start(self):
+        engine = chess.engine.SimpleEngine.popen_uci(self.engine_path)
+        options = {name: value for name, value in self.options.items() if name in engine.options}
+        if options:
+            engine.configure(options)
+        return engine
+
+    @staticmethod
+    def _healthy(engine):
+        try:
+            engine.ping()
+            return True
+        except ENGINE_ERRORS:
+            return False
+
+    @staticmethod
+    def _quit(engine):
+        try:
+            engine.quit()
+        except ENGINE_ERRORS:
+            pass
+
+    def _acquire(self):
+        if self._closed:
+            raise ValueError("EnginePool is closed")
+        try:
+            engine = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                start = self._started < self.size
+                if start:
+                    self._started += 1
+            if start:
+                try:
+                    return self._start()
+                except BaseException:
+                    with self._lock:
+                        self._started -= 1
+                    raise
+            try:
+                engine = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise TimeoutError(f"No engine became free within {self.timeout} seconds")
+
+        if not self._healthy(engine):
+            self._quit(engine)
+            self.restarts += 1
+            try:
+                engine = self._start()
+            except BaseException:
+                with self._lock:
+                    self._started -= 1
+                raise
+        return engine
+
+    def _release(self, engine, failed):
+        if failed or self._closed:
+            self._quit(engine)
+            with self._lock:
+                self._started -= 1
+            if failed:
+                self.restarts += 1
+        else:
+            self._idle.put(engine)
+
+    @contextlib.contextmanager
+    def engine(self):
+        """
+        Check out an engine for one game, waiting for one to be free if all are in use.
+
+        Returns:
+        PooledEngine: The engine, returned to the pool when the with block ends.
+        """
+        engine = self._acquire()
+        failed = False
+        try:
+            yield PooledEngine(engine)
+        except ENGINE_ERRORS:
+            failed = True
+            raise
+        finally:
+            self._release(engine, failed)
+
+    def close(self):
+        """
+        Quit the idle engines. Engines still checked out are quit when they are returned.
+        """
+        self._closed = True
+        while True:
+            try:
+                engine = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(engine)
+            with self._lock:
+                self._started -= 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
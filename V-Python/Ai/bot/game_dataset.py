@@ -0,0 +1,347 @@
+import json
+import os
+
+import chess
+import numpy as np
+
+from Ai.bot.encoding import PIECE_PLANES, bitboards_to_input, boards_to_bitboards, boards_to_input, move_index
+
+DEFAULT_GAMES_PER_SHARD = 1024
+MANIFEST_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+
+# Stored result codes, indices into RESULTS, and the value of each result for white
+RESULTS = ['1-0', '0-1', '1/2-1/2', '*']
+RESULT_VALUES = np.array([1.0, -1.0, 0.0, 0.0], dtype=np.float32)
+
+# One fixed-size record per game in the .games file of its shard
+GAME_RECORD = np.dtype([
+    ('offset', '<i8'),  # Index of the game's first position in the shard
+    ('length', '<i4'),  # Number of positions stored, the moves of the bot
+    ('plies', '<i4'),  # Number of moves of both sides
+    ('color', 'u1'),  # Color the positions were stored for, 1 for white
+    ('result', 'u1'),  # Index in RESULTS
+    ('metadata_offset', '<i8'),  # Byte offset of the game's line in the .meta file
+    ('metadata_length', '<i4')
+])
+
+# File of each shard array, its dtype and the values it holds per row
+SHARD_FILES = {
+    'bitboards': ('.bitboards', np.dtype('<u8'), len(PIECE_PLANES)),
+    'actions': ('.actions', np.dtype('<i2'), 1),
+    'games': ('.games', GAME_RECORD, 1)
+}
+METADATA_SUFFIX = '.meta'
+
+def board_from_moves(moves, board=None):
+    """
+    Replay moves in UCI notation, as in the 'moves' of a self-play game.
+
+    Parameters:
+    moves (list): UCI strings.
+    board (chess.Board): Starting position, the standard one by default.
+
+    Returns:
+    chess.Board: The final position, with the moves in its move stack.
+    """
+    board = chess.Board() if board is None else board.copy()
+    for move in moves:
+        board.push_uci(move)
+    return board
+
+def _stored_boards(fen, moves, color):
+    # Replay a game from its start position and UCI moves, keeping the positions
+    # append stores, with their move stacks so encoders can see repetitions
+    board = chess.Board(fen)
+    boards = []
+    for move in moves:
+        if board.turn == color:
+            boards.append(board.copy())
+        board.push_uci(move)
+    return boards
+
+def _json_value(value):
+    # numpy scalars in the game metrics
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot store {type(value).__name__} in game metadata")
+
+class GameDataset:
+    """
+    Append-only store of training games, many games per shard.
+
+    A dataset is a folder holding manifest.json and, for every shard, four
+    files the games are appended to:
+
+    - .bitboards: the 12 piece bitboards (uint64) of every stored position
+    - .actions: the move played from each position, as an int16 policy index
+    - .games: a GAME_RECORD per game, giving its positions, length, color and result
+    - .meta: a JSON line per game with its UCI moves, its start position if
+      it is not the standard one, and any other metadata
+
+    The manifest lists the shards and their sizes, so opening the dataset or
+    appending a game never lists the folder. It is rewritten, atomically, after
+    each game; data written past the sizes it records, by a writer that
+    stopped in the middle of a game, is ignored and overwritten by the next
+    append. Once a shard holds games_per_shard games, a new one is started.
+
+        dataset = GameDataset('game_data')
+        dataset.append(board, chess.WHITE, {'metrics': metrics})
+        data = dataset.arrays()
+
+    Only one process may append to a dataset at a time. Readers see the games
+    recorded in the manifest when the dataset was opened or last appended to.
+
+    Attributes:
+    folder (str): The dataset folder.
+    games_per_shard (int): Games stored in a shard before a new one is started.
+    """
+
+    def __init__(self, folder, games_per_shard=DEFAULT_GAMES_PER_SHARD):
+        if games_per_shard < 1:
+            raise ValueError(f"games_per_shard must be at least 1, got {games_per_shard}")
+        self.folder = folder
+        self._writers = None
+        manifest_path = os.path.join(folder, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as file:
+                manifest = json.load(file)
+            if manifest['format'] != FORMAT_VERSION:
+                raise ValueError(f"Unsupported game dataset format {manifest['format']} in {folder}")
+            self.games_per_shard = manifest['games_per_shard']
+            self._shards = manifest['shards']
+        else:
+            self.games_per_shard = games_per_shard
+            self._shards = []
+
+    def __len__(self):
+        return sum(shard['games'] for shard in self._shards)
+
+    @property
+    def positions(self):
+        """
+        Number of positions stored, over all games.
+        """
+        return sum(shard['positions'] for shard in self._shards)
+
+    @property
+    def shards(self):
+        """
+        Number of shards.
+        """
+        return len(self._shards)
+
+    def _path(self, shard, suffix):
+        return os.path.join(self.folder, shard['name'] + suffix)
+
+    def _write_manifest(self):
+        manifest = {
+            'format': FORMAT_VERSION,
+            'games_per_shard': self.games_per_shard,
+            'games': len(self),
+            'positions': self.positions,
+            'shards': self._shards
+        }
+        path = os.path.join(self.folder, MANIFEST_NAME)
+        with open(path + '.tmp', 'w') as file:
+            json.dump(manifest, file)
+        os.replace(path + '.tmp', path)
+
+    def _open_writers(self, shard):
+        # Keep the files of the shard being filled open between games, cut
+        # back to the sizes in the manifest in case a game was left half written
+        self._close_writers()
+        self._writers = {}
+        for name, (suffix, dtype, width) in SHARD_FILES.items():
+            rows = shard['games'] if name == 'games' else shard['positions']
+            self._writers[name] = open(self._path(shard, suffix), 'ab')
+            self._writers[name].truncate(rows * width * dtype.itemsize)
+        self._writers['meta'] = open(self._path(shard, METADATA_SUFFIX), 'ab')
+        self._writers['meta'].truncate(shard['metadata_bytes'])
+        self._writers_shard = shard['name']
+
+    def _close_writers(self):
+        if self._writers is not None:
+            for file in self._writers.values():
+                file.close()
+            self._writers = None
+
+    def append(self, board, color, metadata=None):
+        """
+        Store a finished game.
+
+        Parameters:
+        board (chess.Board): Final position of the game, with all its moves in the move stack.
+        color (bool): The color whose positions and moves are stored, those of the bot.
+        metadata (dict): JSON-serializable values kept with the game, such as its metrics.
+
+        Returns:
+        int: Index of the game in the dataset.
+        """
+        boards, actions = [], []
+        replay = board.root()
+        for move in board.move_stack:
+            if replay.turn == color:
+                boards.append(replay.copy(stack=False))
+                actions.append(move_index(move))
+            replay.push(move)
+        bitboards = boards_to_bitboards(boards)
+
+        if not self._shards or self._shards[-1]['games'] >= self.games_per_shard:
+            os.makedirs(self.folder, exist_ok=True)
+            self._shards.append({
+                'name': f'shard_{len(self._shards):06d}',
+                'games': 0,
+                'positions': 0,
+                'metadata_bytes': 0
+            })
+        shard = self._shards[-1]
+        if self._writers is None or self._writers_shard != shard['name']:
+            self._open_writers(shard)
+
+        line = dict(metadata or {})
+        line['moves'] = [move.uci() for move in board.move_stack]
+        start = board.root().fen()
+        if start != chess.STARTING_FEN:
+            line['fen'] = start
+        line = (json.dumps(line, default=_json_value) + '\n').encode()
+        record = np.zeros(1, dtype=GAME_RECORD)
+        record['offset'] = shard['positions']
+        record['length'] = len(boards)
+        record['plies'] = len(board.move_stack)
+        record['color'] = color == chess.WHITE
+        record['result'] = RESULTS.index(board.result())
+        record['metadata_offset'] = shard['metadata_bytes']
+        record['metadata_length'] = len(line)
+
+        self._writers['bitboards'].write(bitboards.astype('<u8').tobytes())
+        self._writers['actions'].write(np.array(actions, dtype='<i2').tobytes())
+        self._writers['meta'].write(line)
+        self._writers['games'].write(record.tobytes())
+        for file in self._writers.values():
+            file.flush()
+
+        shard['games'] += 1
+        shard['positions'] += len(boards)
+        shard['metadata_bytes'] += len(line)
+        self._write_manifest()
+        return len(self) - 1
+
+    def _read(self, shard, name):
+        suffix, dtype, width = SHARD_FILES[name]
+        rows = shard['games'] if name == 'games' else shard['positions']
+        shape = (rows, width) if width > 1 else (rows,)
+        if rows == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self._path(shard, suffix), dtype=dtype, mode='r', shape=shape)
+
+    def shard(self, index):
+        """
+        Return the arrays of one shard, memory-mapped.
+
+        Returns:
+        dict: 'bitboards' (positions, 12) uint64, 'actions' (positions,) int16 and
+        'games', the GAME_RECORD of each game in the shard.
+        """
+        shard = self._shards[index]
+        return {name: self._read(shard, name) for name in SHARD_FILES}
+
+    def arrays(self):
+        """
+        Return the positions of all games, concatenated in order of the games.
+
+        Returns:
+        dict: 'bitboards' (positions, 12) uint64, 'actions' (positions,) int16,
+        'lengths' (positions per game), 'plies', 'colors' (True for white) and
+        'results' (indices into RESULTS) per game.
+        """
+        shards = [self.shard(index) for index in range(len(self._shards))]
+        games = np.concatenate([shard['games'] for shard in shards]) if shards else np.empty(0, dtype=GAME_RECORD)
+        return {
+            'bitboards': np.concatenate([shard['bitboards'] for shard in shards]) if shards
+            else np.empty((0, len(PIECE_PLANES)), dtype=np.uint64),
+            'actions': np.concatenate([shard['actions'] for shard in shards]) if shards else np.empty(0, dtype=np.int16),
+            'lengths': games['length'],
+            'plies': games['plies'],
+            'colors': games['color'].astype(bool),
+            'results': games['result']
+        }
+
+    def training_data(self, encode_boards=boards_to_input):
+        """
+        Return all positions as training samples for train_policy_model.
+
+        Parameters:
+        encode_boards (callable): Encoder of the model's inputs, e.g. PolicyInference.encode_boards.
+            boards_to_input is decoded from the stored bitboards; other encoders
+            need the rest of the position, so the games are replayed from their moves.
+
+        Returns:
+        tuple: states float32 as from encode_boards, actions int16, and rewards
+        float32, the result of each position's game for white.
+        """
+        data = self.arrays()
+        if encode_boards is boards_to_input:
+            states = bitboards_to_input(data['bitboards']).astype(np.float32)
+        else:
+            games = [self.game(index, encode_boards)['states'] for index in range(len(self))]
+            states = np.concatenate(games) if games else np.empty(0, dtype=np.float32)
+        rewards = np.repeat(RESULT_VALUES[data['results']], data['lengths'])
+        return states, data['actions'], rewards
+
+    def game(self, index, encode_boards=boards_to_input):
+        """
+        Return one game.
+
+        Parameters:
+        index (int): Index of the game in the dataset.
+        encode_boards (callable): Encoder of the states, see training_data.
+
+        Returns:
+        dict: game_id, color, result, fen (start position), moves (UCI), states
+        and actions as stored by append, and the metadata given to append.
+        """
+        game_id = index + len(self) if index < 0 else index
+        if not 0 <= game_id < len(self):
+            raise IndexError("game index out of range")
+        index = game_id
+        for shard in self._shards:
+            if index < shard['games']:
+                break
+            index -= shard['games']
+
+        arrays = {name: self._read(shard, name) for name in SHARD_FILES}
+        record = arrays['games'][index]
+        positions = slice(int(record['offset']), int(record['offset']) + int(record['length']))
+        with open(self._path(shard, METADATA_SUFFIX), 'rb') as file:
+            file.seek(int(record['metadata_offset']))
+            metadata = json.loads(file.read(int(record['metadata_length'])))
+        moves = metadata.pop('moves')
+        fen = metadata.pop('fen', chess.STARTING_FEN)
+        if encode_boards is boards_to_input:
+            states = bitboards_to_input(arrays['bitboards'][positions])
+        else:
+            states = encode_boards(_stored_boards(fen, moves, bool(record['color'])))
+
+        return {
+            'game_id': game_id,
+            'color': bool(record['color']),
+            'result': RESULTS[record['result']],
+            'fen': fen,
+            'moves': moves,
+            'states': np.asarray(states, dtype=np.float32),
+            'actions': np.array(arrays['actions'][positions]),
+            'metadata': metadata
+        }
+
+    def close(self):
+        """
+        Close the files of the shard being appended to. The dataset can still be appended to.
+        """
+        self._close_writers()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
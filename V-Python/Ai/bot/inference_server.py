@@ -0,0 +1,277 @@
+import collections
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import chess.engine
+import numpy as np
+
+from Ai.bot.chess_bot import PolicyInference, decode_move
+
+# Context of the client queues, the one the self-play workers are spawned with
+mp_context = multiprocessing.get_context('spawn')
+
+DEFAULT_MAX_BATCH_SIZE = 64
+# Seconds the first request of a batch waits for others to join it
+DEFAULT_MAX_WAIT = 0.002
+# Number of recent requests and batches kept for the latency statistics
+LATENCY_SAMPLES = 10000
+
+class InferenceClient:
+    """
+    Handle for a worker process to run positions through an InferenceServer.
+
+    Clients are created by InferenceServer.client() before the worker processes
+    start, and are passed to them as process arguments. A client is used by
+    one thread at a time. It can stand in for the model in MCTS, and for an
+    engine in ChessBot:
+
+        bot = ChessBot(client)
+
+    Attributes:
+    client_id (int): Index of the client in its server.
+    encode_boards (callable): Encoder of the server model's inputs, boards_to_planes or boards_to_input.
+    """
+
+    def __init__(self, client_id, request_queue, response_queue, encode_boards):
+        self.client_id = client_id
+        self.encode_boards = encode_boards
+        self._request_queue = request_queue
+        self._response_queue = response_queue
+
+    def predict(self, inputs):
+        """
+        Return the move probabilities of a batch of model inputs, shape (len(inputs), 64 * 64).
+        """
+        self._request_queue.put((self.client_id, np.asarray(inputs, dtype=np.float32)))
+        outputs, error = self._response_queue.get()
+        if error is not None:
+            raise RuntimeError(f"Inference failed in the server:\n{error}")
+        return outputs
+
+    def __call__(self, inputs, training=False):
+        return self.predict(inputs)
+
+    def predict_boards(self, boards):
+        """
+        Return the move probabilities of each board, shape (len(boards), 64 * 64).
+        """
+        return self.predict(self.encode_boards(boards))
+
+    def play(self, board, limit=None):
+        """
+        Play the network's move, like chess.engine.SimpleEngine.play. The limit is ignored.
+        """
+        move = decode_move(self.predict_boards([board])[0], board)
+        return chess.engine.PlayResult(move, None)
+
+class InferenceServer:
+    """
+    Runs the policy network for many concurrent games in dynamic batches.
+
+    Requests from threads (submit, predict) and from worker processes
+    (through clients made by client()) go into one queue. A serving thread
+    takes the first waiting request, waits up to max_wait seconds for more
+    to arrive, and runs the rows of all of them, at most max_batch_size, in one
+    call of the model through PolicyInference. A request that would take the
+    batch past max_batch_size starts the next batch instead; one larger than
+    max_batch_size runs in a batch of its own. The results are then handed
+    back to each caller. The model is shared with the caller, so weights
+    updated by training are used by the next batch.
+
+    Use as a context manager, or call close() when done:
+
+        with InferenceServer(model) as server:
+            pool = SelfPlayPool(inference_server=server)
+
+    Attributes:
+    inference (PolicyInference): The compiled model.
+    encode_boards (callable): Encoder of the model's inputs, boards_to_planes or boards_to_input.
+    max_batch_size (int): Maximum number of positions per model call.
+    max_wait (float): Seconds to wait for a batch to fill up.
+    """
+
+    def __init__(self, model, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT):
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be at least 1, got {max_batch_size}")
+        self.inference = PolicyInference(model, max_batch_size)
+        self.encode_boards = self.inference.encode_boards
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._requests = queue.Queue()
+        # Request that did not fit in the last batch, the first of the next one
+        self._held_request = None
+        self._process_requests = None
+        self._response_queues = []
+        self._lock = threading.Lock()
+        self._batch_sizes = collections.Counter()
+        self._queue_latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self._inference_times = collections.deque(maxlen=LATENCY_SAMPLES)
+        self._requests_served = 0
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._forwarder = None
+
+    def submit(self, inputs):
+        """
+        Queue a batch of model inputs from a thread of this process.
+
+        Returns:
+        concurrent.futures.Future: Resolves to the move probabilities, shape (len(inputs), 64 * 64).
+        """
+        if self._closed:
+            raise ValueError("InferenceServer is closed")
+        future = Future()
+
+        def reply(outputs, error):
+            if error is None:
+                future.set_result(outputs)
+            else:
+                future.set_exception(RuntimeError(f"Inference failed:\n{error}"))
+
+        self._requests.put((np.asarray(inputs, dtype=np.float32), reply, time.perf_counter()))
+        return future
+
+    def predict(self, inputs):
+        """
+        Return the move probabilities of a batch of model inputs, waiting for its batch to run.
+        """
+        return self.submit(inputs).result()
+
+    def client(self):
+        """
+        Create a client for a worker process. Clients must be created before the processes start.
+        """
+        if self._process_requests is None:
+            self._process_requests = mp_context.Queue()
+            self._forwarder = threading.Thread(target=self._forward, daemon=True)
+            self._forwarder.start()
+        response_queue = mp_context.Queue()
+        self._response_queues.append(response_queue)
+        return InferenceClient(len(self._response_queues) - 1, self._process_requests, response_queue,
+                               self.encode_boards)
+
+    def _forward(self):
+        # Move requests of the worker processes to the serving queue
+        while True:
+            request = self._process_requests.get()
+            if request is None:
+                break
+            client_id, inputs = request
+            response_queue = self._response_queues[client_id]
+
+            def reply(outputs, error, response_queue=response_queue):
+                response_queue.put((outputs, error))
+
+            self._requests.put((inputs, reply, time.perf_counter()))
+
+    def _next_batch(self):
+        if self._held_request is not None:
+            first, self._held_request = self._held_request, None
+        else:
+            first = self._requests.get()
+        if first is None:
+            return None
+        batch = [first]
+        rows = len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._requests.get(timeout=remaining) if remaining > 0 else self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                self._requests.put(None)  # Serve this batch, then stop
+                break
+            if rows + len(request[0]) > self.max_batch_size:
+                self._held_request = request
+                break
+            batch.append(request)
+            rows += len(request[0])
+        return batch
+
+    def _serve(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+
+            start = time.perf_counter()
+            try:
+                outputs = self.inference.predict(np.concatenate([request[0] for request in batch]))
+                error = None
+            except Exception as exception:
+                outputs = None
+                error = repr(exception)
+            inference_time = time.perf_counter() - start
+
+            offset = 0
+            for inputs, reply, submitted in batch:
+                if error is None:
+                    reply(outputs[offset:offset + len(inputs)], None)
+                else:
+                    reply(None, error)
+                offset += len(inputs)
+
+            with self._lock:
+                self._batch_sizes[offset] += 1
+                self._requests_served += len(batch)
+                self._queue_latencies.extend(start - submitted for inputs, reply, submitted in batch)
+                self._inference_times.append(inference_time)
+
+    def stats(self):
+        """
+        Return the batching statistics.
+
+        Returns:
+        dict: 'batches', 'requests', 'positions', 'batch_size_histogram' (number of
+        model calls by positions per call), 'mean_batch_size', and for recent
+        requests and batches 'queue_latency_ms' (time from submission to the start
+        of the batch: mean, p50, p99) and 'inference_ms' (mean model call time).
+        """
+        with self._lock:
+            histogram = dict(sorted(self._batch_sizes.items()))
+            latencies = np.array(self._queue_latencies) * 1000
+            inference_times = np.array(self._inference_times) * 1000
+            requests = self._requests_served
+
+        batches = sum(histogram.values())
+        positions = sum(size * count for size, count in histogram.items())
+        return {
+            'batches': batches,
+            'requests': requests,
+            'positions': positions,
+            'batch_size_histogram': histogram,
+            'mean_batch_size': positions / batches if batches else 0.0,
+            'queue_latency_ms': {
+                'mean': float(latencies.mean()) if len(latencies) else 0.0,
+                'p50': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+                'p99': float(np.percentile(latencies, 99)) if len(latencies) else 0.0
+            },
+            'inference_ms': float(inference_times.mean()) if len(inference_times) else 0.0
+        }
+
+    def close(self):
+        """
+        Serve the requests already queued, then stop the serving threads.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._process_requests is not None:
+            self._process_requests.put(None)
+            self._forwarder.join()
+        self._requests.put(None)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
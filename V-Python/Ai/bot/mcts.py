@@ -0,0 +1,272 @@
+import math
+import time
+
+import chess
+import chess.engine
+import numpy as np
+
+from Ai.bot.encoding import board_to_input, legal_move_indices
+from Ai.incremental_eval import IncrementalEvaluator
+
+DEFAULT_SIMULATIONS = 800
+DEFAULT_BATCH_SIZE = 16
+DEFAULT_C_PUCT = 1.5
+# A leaf on the path of a pending simulation counts as this many lost visits
+DEFAULT_VIRTUAL_LOSS = 1
+# Material and piece-square balance, in pawns, valued at tanh(1) ~ 0.76 of a win
+VALUE_SCALE = 5.0
+
+def material_value(board):
+    """
+    Return the value of a position for the side to move, between -1 and 1.
+
+    The policy network has no value head, so leaves are valued with the
+    material and piece-square balance of IncrementalEvaluator.
+    """
+    return math.tanh(IncrementalEvaluator(board).score(board.turn) / VALUE_SCALE)
+
+def terminal_value(board):
+    """
+    Return the value of a finished game for the side to move, or None if the game is not over.
+    """
+    if not board.is_game_over():
+        return None
+    return -1.0 if board.is_checkmate() else 0.0
+
+class Node:
+    """
+    Node of the search tree: the position reached by a move.
+
+    Attributes:
+    prior (float): Policy network probability of the move leading here.
+    visits (int): Number of finished simulations through this node.
+    value_sum (float): Sum of their values, for the player who made the move leading here.
+    virtual_loss (int): Virtual loss of the pending simulations through this node.
+    children (dict): Child nodes by move; empty until the node is expanded.
+    expanded (bool): Whether the children have been created.
+    pending (bool): Whether the node is waiting for its network evaluation.
+    """
+
+    __slots__ = ['prior', 'visits', 'value_sum', 'virtual_loss', 'children', 'expanded', 'pending']
+
+    def __init__(self, prior):
+        self.prior = prior
+        self.visits = 0
+        self.value_sum = 0.0
+        self.virtual_loss = 0
+        self.children = {}
+        self.expanded = False
+        self.pending = False
+
+    def expand(self, moves, indices, policy):
+        """
+        Create the children for the moves of legal_move_indices, with priors taken from the policy output.
+        """
+        # Underpromotions are not children: their policy entry is the queen promotion's
+        priors = policy[indices].astype(np.float64)
+        total = priors.sum()
+        if total > 0:
+            priors /= total
+        else:
+            priors[:] = 1.0 / len(moves)
+        self.children = {move: Node(prior) for move, prior in zip(moves, priors)}
+        self.expanded = True
+
+class MCTS:
+    """
+    Monte Carlo tree search guided by the policy network.
+
+    Simulations select moves with the PUCT rule, using the network's move
+    probabilities as priors, and value leaves with value_function. They are
+    run batch_size at a time: the leaves of a batch are collected first, with
+    a virtual loss on their paths so that the simulations spread over
+    different lines, and are then evaluated together in one call of the model.
+    The subtree of the position reached is kept between moves.
+
+    play() follows chess.engine.SimpleEngine.play, with limit.nodes as the
+    number of simulations, so ChessBot can use the search directly:
+
+        bot = ChessBot(MCTS(model), chess.engine.Limit(nodes=800))
+
+    Attributes:
+    model (callable): Policy network, e.g. from create_policy_model or hypermodel_builder.
+    simulations (int): Simulations per move when the limit sets neither nodes nor time.
+    batch_size (int): Leaves evaluated per model call.
+    c_puct (float): Exploration constant of the PUCT rule.
+    virtual_loss (int): Virtual loss of pending simulations.
+    value_function (callable): Function of a board returning its value for the side to move.
+    encode (callable): Function of a board returning the model input, board_to_input or board_to_planes.
+    """
+
+    def __init__(self, model, simulations=DEFAULT_SIMULATIONS, batch_size=DEFAULT_BATCH_SIZE,
+                 c_puct=DEFAULT_C_PUCT, virtual_loss=DEFAULT_VIRTUAL_LOSS, value_function=material_value,
+                 encode=board_to_input):
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+        self.model = model
+        self.simulations = simulations
+        self.batch_size = batch_size
+        self.c_puct = c_puct
+        self.virtual_loss = virtual_loss
+        self.value_function = value_function
+        self.encode = encode
+        self.root = None
+        self._root_board = None
+
+    def encode_boards(self, boards):
+        """
+        Encode boards with encode, as a batch of model inputs.
+        """
+        return np.array([self.encode(board) for board in boards], dtype=np.float32)
+
+    def reset(self):
+        """
+        Drop the search tree.
+        """
+        self.root = None
+        self._root_board = None
+
+    def _find_root(self, board):
+        # Reuse the subtree of the previous search when the board continues its game
+        if self.root is not None:
+            previous = self._root_board.move_stack
+            moves = board.move_stack
+            if len(moves) >= len(previous) and moves[:len(previous)] == previous:
+                node = self.root
+                reached = self._root_board.copy()
+                for move in moves[len(previous):]:
+                    node = node.children.get(move)
+                    if node is None:
+                        break
+                    reached.push(move)
+                if node is not None and node.expanded and \
+                        reached._transposition_key() == board._transposition_key():
+                    return node
+        return Node(1.0)
+
+    def _select_child(self, node):
+        parent_visits = node.visits + node.virtual_loss
+        exploration = self.c_puct * math.sqrt(max(parent_visits, 1))
+        best_score = -math.inf
+        best = None
+        for move, child in node.children.items():
+            visits = child.visits + child.virtual_loss
+            value = (child.value_sum - child.virtual_loss) / visits if visits else 0.0
+            score = value + exploration * child.prior / (1 + visits)
+            if score > best_score:
+                best_score = score
+                best = (move, child)
+        return best
+
+    def _backup(self, path, value, virtual_loss):
+        # value is for the side to move at the leaf; each node stores the value
+        # for the player who moved into it
+        for node in reversed(path):
+            value = -value
+            node.visits += 1
+            node.value_sum += value
+            node.virtual_loss -= virtual_loss
+
+    def _collect_leaves(self, root, board):
+        leaves = []
+        for _ in range(self.batch_size):
+            path = [root]
+            node = root
+            root.virtual_loss += self.virtual_loss
+            pushed = 0
+            while node.expanded and node.children:
+                move, node = self._select_child(node)
+                board.push(move)
+                pushed += 1
+                node.virtual_loss += self.virtual_loss
+                path.append(node)
+
+            value = terminal_value(board)
+            if value is not None:
+                self._backup(path, value, self.virtual_loss)
+            elif node.pending:
+                # Already waiting in this batch: undo the virtual loss and stop collecting
+                for visited in path:
+                    visited.virtual_loss -= self.virtual_loss
+                for _ in range(pushed):
+                    board.pop()
+                break
+            else:
+                node.pending = True
+                leaves.append((path, legal_move_indices(board), self.encode(board), self.value_function(board)))
+
+            for _ in range(pushed):
+                board.pop()
+        return leaves
+
+    def _evaluate_leaves(self, leaves):
+        inputs = np.array([leaf[2] for leaf in leaves], dtype=np.float32)
+        policies = np.asarray(self.model(inputs, training=False))
+        for (path, (moves, indices), input_vector, value), policy in zip(leaves, policies):
+            leaf = path[-1]
+            leaf.expand(moves, indices, policy)
+            leaf.pending = False
+            self._backup(path, value, self.virtual_loss)
+
+    def search(self, board, simulations=None, deadline=None):
+        """
+        Run simulations from a position.
+
+        Parameters:
+        board (chess.Board): The position to search. It is not modified.
+        simulations (int): Number of simulations, self.simulations by default.
+        deadline (float): time.perf_counter() value to stop at, even if simulations remain.
+
+        Returns:
+        Node: The root node, its children holding the visit counts of the moves.
+        """
+        if simulations is None:
+            simulations = self.simulations
+        root = self._find_root(board)
+        board = board.copy()
+
+        target = root.visits + simulations
+        while root.visits < target:
+            if deadline is not None and time.perf_counter() >= deadline and root.expanded:
+                break
+            leaves = self._collect_leaves(root, board)
+            if leaves:
+                self._evaluate_leaves(leaves)
+            elif not root.expanded:
+                break  # The root is a finished game
+
+        self.root = root
+        self._root_board = board
+        return root
+
+    def select_move(self, board, simulations=None, deadline=None):
+        """
+        Search the position and return the most visited move, or None if the game is over.
+        """
+        root = self.search(board, simulations, deadline)
+        if not root.children:
+            return None
+        return max(root.children.items(), key=lambda item: item[1].visits)[0]
+
+    def play(self, board, limit):
+        """
+        Select a move, like chess.engine.SimpleEngine.play.
+
+        Parameters:
+        board (chess.Board): The position to play a move in. It is not modified.
+        limit (chess.engine.Limit): limit.nodes simulations and/or limit.time seconds;
+            self.simulations when neither is given.
+
+        Returns:
+        chess.engine.PlayResult: The move, with the number of simulations and the time
+        used as search information.
+        """
+        start = time.perf_counter()
+        deadline = start + limit.time if limit.time is not None else None
+        simulations = limit.nodes
+        if simulations is None:
+            simulations = math.inf if deadline is not None else self.simulations
+
+        move = self.select_move(board, simulations, deadline)
+        info = {'nodes': self.root.visits, 'time': time.perf_counter() - start}
+        return chess.engine.PlayResult(move, None, info)
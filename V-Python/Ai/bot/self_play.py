@@ -0,0 +1,198 @@
+import multiprocessing
+import os
+import queue
+import traceback
+
+import numpy as np
+import tensorflow as tf
+
+from Ai.bot.chess_bot import ChessBot, engine_path, evaluation_cache, play_engine_game
+from Ai.bot.engine_pool import EnginePool
+
+# Workers are spawned rather than forked: the parent has usually built a model
+# and started threads by then, and TensorFlow does not survive a fork
+mp_context = multiprocessing.get_context('spawn')
+
+def _latest_weights(weights_queue, weights=None):
+    # Drain the queue, keeping only the most recent weights sent
+    while True:
+        try:
+            weights = weights_queue.get_nowait()
+        except queue.Empty:
+            return weights
+
+def _self_play_worker(worker_id, model_builder, weights_queue, task_queue, result_queue, engine_path, threads,
+                      inference_client):
+    """
+    Worker process: play the games of task_queue until it receives None.
+    """
+    if inference_client is not None:
+        # The network runs in the inference server, the worker only plays
+        model = None
+        bot = ChessBot(inference_client)
+    else:
+        if threads:
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(threads)
+        model = model_builder()
+        model.set_weights(weights_queue.get())
+        bot = ChessBot(model)
+    # One engine per worker, kept for all its games and restarted if it crashes
+    engines = EnginePool(engine_path)
+
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            game_id, color = task
+
+            # Weights refreshed since the last game apply from this game on
+            weights = _latest_weights(weights_queue)
+            if weights is not None and model is not None:
+                model.set_weights(weights)
+
+            try:
+                with engines.engine() as engine:
+                    states, actions, board = play_engine_game(bot, engine, color, verbose=False)
+                result_queue.put({
+                    'game_id': game_id,
+                    'worker': worker_id,
+                    'color': color,
+                    'states': np.array(states, dtype=np.float32),
+                    'actions': np.array(actions, dtype=np.int16),
+                    'result': board.result(),
+                    'moves': [move.uci() for move in board.move_stack],
+                    'metrics': dict(evaluation_cache.analyze(board, color))
+                })
+            except Exception:
+                result_queue.put({'game_id': game_id, 'worker': worker_id, 'error': traceback.format_exc()})
+    finally:
+        engines.close()
+
+class SelfPlayPool:
+    """
+    Worker processes playing training games of the policy network against Stockfish.
+
+    Every worker builds its own copy of the model with model_builder, loads the
+    weights it was given and starts its own engine, then plays the games it is
+    sent one after another. Finished games are sent back over a queue as they
+    complete. Weights given to update_weights are picked up by each worker
+    before its next game, so games already running finish with the weights
+    they started with.
+
+        with SelfPlayPool(create_policy_model, model.get_weights()) as pool:
+            for game in pool.play([chess.WHITE, chess.BLACK] * 5):
+                ...
+            pool.update_weights(model.get_weights())
+
+    With an inference_server, the workers build no model: every game sends its
+    positions to the server, which batches them across all workers and runs
+    the server's model. model_builder and weights are then not needed, and
+    the server's model is updated directly rather than through update_weights.
+
+    model_builder is sent to the worker processes, so it must be picklable: a
+    module-level function, or a functools.partial of one. The workers are
+    spawned, so scripts using the pool need an if __name__ == '__main__' guard.
+
+    Attributes:
+    processes (int): Number of worker processes, each running one game at a time.
+    """
+
+    def __init__(self, model_builder=None, weights=None, processes=None, engine_path=engine_path, threads_per_worker=1,
+                 inference_server=None):
+        if inference_server is None and model_builder is None:
+            raise ValueError("SelfPlayPool needs a model_builder or an inference_server")
+        if inference_server is None and weights is None:
+            raise ValueError("SelfPlayPool needs the weights of the model built by model_builder")
+        self.processes = processes or os.cpu_count() or 1
+        self._task_queue = mp_context.Queue()
+        self._result_queue = mp_context.Queue()
+        self._weights_queues = []
+        self._workers = []
+        self._next_game_id = 0
+
+        for worker_id in range(self.processes):
+            weights_queue = mp_context.Queue()
+            weights_queue.put(weights)
+            inference_client = inference_server.client() if inference_server is not None else None
+            worker = mp_context.Process(
+                target=_self_play_worker,
+                args=(worker_id, model_builder, weights_queue, self._task_queue, self._result_queue,
+                      engine_path, threads_per_worker, inference_client),
+                daemon=True
+            )
+            worker.start()
+            self._weights_queues.append(weights_queue)
+            self._workers.append(worker)
+
+    def update_weights(self, weights):
+        """
+        Send new model weights (as returned by model.get_weights()) to every worker.
+        """
+        for weights_queue in self._weights_queues:
+            weights_queue.put(weights)
+
+    def play(self, colors):
+        """
+        Play one game for each color given, in parallel.
+
+        Parameters:
+        colors (list): The color the bot plays in each game (chess.WHITE or chess.BLACK).
+
+        Returns:
+        generator: A dict per game, in order of completion, with game_id, worker,
+        color, states (model inputs of the bot's positions, see play_engine_game), actions (its moves
+        as int16 policy indices), result, moves (UCI) and metrics (analyze_board
+        of the final position for the bot's color).
+        """
+        if not self._workers:
+            raise ValueError("SelfPlayPool is closed")
+        colors = list(colors)
+        for color in colors:
+            self._task_queue.put((self._next_game_id, color))
+            self._next_game_id += 1
+
+        for _ in colors:
+            game = self._get_result()
+            if 'error' in game:
+                raise RuntimeError(f"Self-play game {game['game_id']} failed in worker {game['worker']}:\n{game['error']}")
+            yield game
+
+    def _get_result(self):
+        while True:
+            try:
+                return self._result_queue.get(timeout=1)
+            except queue.Empty:
+                dead = [worker for worker in self._workers if not worker.is_alive()]
+                if dead:
+                    raise RuntimeError(f"Self-play worker exited with code {dead[0].exitcode}")
+
+    def close(self):
+        """
+        Let the workers finish the games already sent, then stop them and their engines.
+        """
+        for _ in self._workers:
+            self._task_queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def terminate(self):
+        """
+        Stop the workers immediately, dropping unfinished games.
+        """
+        for worker in self._workers:
+            worker.terminate()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
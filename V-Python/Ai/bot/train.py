@@ -0,0 +1,79 @@
+# Training script of the policy network: tunes its hyperparameters, then trains it on
+# games played against Stockfish. Run from the V-Python folder as a module of the
+# package, python -m Ai.bot.train, so chess_bot and its globals (game dataset,
+# engine pool, evaluation cache) are loaded once.
+import random
+import sys
+
+import chess
+import keras_tuner as kt
+import numpy as np
+from tensorflow.keras.optimizers import Adam
+
+sys.path.append(r"C:\Users\girsh\Desktop\Personal\Web\Active\Chess_Bot\V-Python")
+from Ai.bot.chess_bot import game_dataset, hypermodel_builder, model_path, result_to_value, train_policy_model
+from Ai.bot.game_dataset import board_from_moves
+from Ai.bot.inference_server import InferenceServer
+from Ai.bot.self_play import SelfPlayPool
+
+def main():
+    # Hyperparameter tuning with Keras Tuner
+    tuner = kt.Hyperband(
+        hypermodel_builder,
+        objective='val_loss',
+        max_epochs=10,
+        factor=3,
+        directory='hyperband',
+        project_name='chess_ai'
+    )
+
+    # Main training loop
+    # Load or create the model using the best hyperparameters
+    tuner.search_space_summary()
+    tuner.search(
+        x=np.zeros((1, 64)),  # Dummy data for search
+        y=np.zeros(1, dtype=np.int16),  # Dummy data for search
+        epochs=5,
+        validation_data=(np.zeros((1, 64)), np.zeros(1, dtype=np.int16))
+    )
+    best_hps = tuner.get_best_hyperparameters(num_trials=1)[0]
+    model = tuner.hypermodel.build(best_hps)
+
+    optimizer = Adam(learning_rate=best_hps.get('learning_rate'))
+
+    # Accumulate data from all games across all epochs
+    all_states, all_actions, all_rewards, all_metrics = [], [], [], []
+
+    # Games are played in parallel by worker processes, each with its own engine. Their
+    # positions are batched through one inference server running the model being trained.
+    with InferenceServer(model) as inference_server, SelfPlayPool(inference_server=inference_server) as self_play:
+        for epoch in range(10):  # Train for 10 epochs
+            # Play 10 games per epoch, with a random color for each game
+            colors = [random.choice([chess.WHITE, chess.BLACK]) for _ in range(10)]
+            for game in self_play.play(colors):
+                rewards = [result_to_value(game['result'])] * len(game['states'])
+                all_states.extend(game['states'])
+                all_actions.extend(game['actions'])
+                all_rewards.extend(rewards)
+                all_metrics.append(game['metrics'])  # Collect metrics for this game
+
+                # Save the game data
+                game_dataset.append(board_from_moves(game['moves']), game['color'], {'metrics': game['metrics']})
+
+            # Print or save additional evaluation metrics if needed
+            # For example:
+            avg_material_balance = np.mean([metrics['material_balance'] for metrics in all_metrics])
+            avg_piece_mobility = np.mean([metrics['piece_mobility'] for metrics in all_metrics])
+            avg_piece_coordination = np.mean([metrics['piece_coordination'] for metrics in all_metrics])
+            print(f"Epoch {epoch+1}: Average Material Balance: {avg_material_balance}, Average Piece Mobility: {avg_piece_mobility}, Average Piece Coordination: {avg_piece_coordination}")
+
+            # Train the model on collected data after each epoch; the server runs the updated model
+            train_policy_model(model, all_states, all_actions, all_rewards, all_metrics, optimizer)
+        print(f"Inference server: {inference_server.stats()}")
+
+    # Save the trained model
+    model.save(model_path)
+    print("Training completed.")
+
+if __name__ == '__main__':
+    main()
@@ -1,53 +1,615 @@
+import collections.abc
+import functools
+import os
+
 import chess
 import chess.engine
 import numpy as np
 
+from Ai.pawn_hash import PawnHashTable
+
 CENTER_SQUARES = [chess.A4, chess.B4, chess.C4, chess.D4, chess.E4, chess.F4, chess.G4, chess.H4,
                   chess.A5, chess.B5, chess.C5, chess.D5, chess.E5, chess.F5, chess.G5, chess.H5,
                   chess.A3, chess.B3, chess.C3, chess.D3, chess.E3, chess.F3, chess.G3, chess.H3,
                   chess.A6, chess.B6, chess.C6, chess.D6, chess.E6, chess.F6, chess.G6, chess.H6]
 
-def analyze_board(board, color):
-    material_balance = evaluate_material_balance(board) #Done
-    piece_mobility = evaluate_piece_mobility(board) #Done
-    piece_coordination = evaluate_piece_coordination(board) #Progress
-    pawn_structure = evaluate_pawn_structure(board) #Done
-    king_safety = evaluate_king_safety(board, color) #Done
-    control_of_center = evaluate_center_control(board) #Done
-    piece_activity = evaluate_piece_activity(board) #Done
-    space_control =  0 #evaluate_space_control(board)#Progress
-    pawn_structure_strength = calculate_pawn_structure_strength(board, color) #Done
-    piece_placement = evaluate_piece_position(board, color) #Done
-    piece_exchange = evaluate_piece_exchanges(board, color) #Done
-    tempo = calculate_initiative_and_tempo(board) #Done
-
-    if (color == chess.BLACK):
-        material_balance = - (material_balance)
-        piece_mobility = - (piece_mobility)
-        piece_coordination = - (piece_coordination)
-        pawn_structure = - (pawn_structure)
-        control_of_center = - (control_of_center)
-        piece_activity = - (piece_activity)
-        tempo = - (tempo)
-    
-    return {
-        'material_balance': material_balance,
-        'piece_mobility': piece_mobility,
-        'piece_coordination': piece_coordination,
-        'pawn_structure': pawn_structure,
-        'king_safety': king_safety,
-        'control_of_center': control_of_center,
-        'piece_activity': piece_activity,
-        'space_control': space_control,
-        'pawn_structure_strength': pawn_structure_strength,
-        'piece_placement': piece_placement,
-        'piece_exchange': piece_exchange,
-        'tempo': tempo
+# Piece values in pawns, as used by the material features
+PIECE_VALUES = {
+    chess.PAWN: 1,
+    chess.KNIGHT: 3,
+    chess.BISHOP: 3,
+    chess.ROOK: 5,
+    chess.QUEEN: 9,
+    chess.KING: 0
+}
+
+# Piece-square bonuses in centipawns from white's point of view, listed from rank 1
+# to rank 8 (index = square). Black pieces use the mirrored square.
+PIECE_SQUARE_TABLES = {
+    chess.PAWN: [
+          0,   0,   0,   0,   0,   0,   0,   0,
+          5,  10,  10, -20, -20,  10,  10,   5,
+          5,  -5, -10,   0,   0, -10,  -5,   5,
+          0,   0,   0,  20,  20,   0,   0,   0,
+          5,   5,  10,  25,  25,  10,   5,   5,
+         10,  10,  20,  30,  30,  20,  10,  10,
+         50,  50,  50,  50,  50,  50,  50,  50,
+          0,   0,   0,   0,   0,   0,   0,   0
+    ],
+    chess.KNIGHT: [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20,   0,   5,   5,   0, -20, -40,
+        -30,   5,  10,  15,  15,  10,   5, -30,
+        -30,   0,  15,  20,  20,  15,   0, -30,
+        -30,   5,  15,  20,  20,  15,   5, -30,
+        -30,   0,  10,  15,  15,  10,   0, -30,
+        -40, -20,   0,   0,   0,   0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50
+    ],
+    chess.BISHOP: [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10,   5,   0,   0,   0,   0,   5, -10,
+        -10,  10,  10,  10,  10,  10,  10, -10,
+        -10,   0,  10,  10,  10,  10,   0, -10,
+        -10,   5,   5,  10,  10,   5,   5, -10,
+        -10,   0,   5,  10,  10,   5,   0, -10,
+        -10,   0,   0,   0,   0,   0,   0, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20
+    ],
+    chess.ROOK: [
+          0,   0,   0,   5,   5,   0,   0,   0,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+          5,  10,  10,  10,  10,  10,  10,   5,
+          0,   0,   0,   0,   0,   0,   0,   0
+    ],
+    chess.QUEEN: [
+        -20, -10, -10,  -5,  -5, -10, -10, -20,
+        -10,   0,   5,   0,   0,   0,   0, -10,
+        -10,   5,   5,   5,   5,   5,   0, -10,
+          0,   0,   5,   5,   5,   5,   0,  -5,
+         -5,   0,   5,   5,   5,   5,   0,  -5,
+        -10,   0,   5,   5,   5,   5,   0, -10,
+        -10,   0,   0,   0,   0,   0,   0, -10,
+        -20, -10, -10,  -5,  -5, -10, -10, -20
+    ],
+    chess.KING: [
+         20,  30,  10,   0,   0,  10,  30,  20,
+         20,  20,   0,   0,   0,   0,  20,  20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30
+    ]
+}
+
+# Static square tables, built once at import so that the feature functions do
+# not rebuild square lists, masks or value tables on every call
+
+BB_CENTER = chess.BB_D4 | chess.BB_E4 | chess.BB_D5 | chess.BB_E5
+BB_CENTER_FLANKS = chess.BB_C4 | chess.BB_F4 | chess.BB_C5 | chess.BB_F5
+BB_CENTER_FRONTS = chess.BB_D3 | chess.BB_E3 | chess.BB_D6 | chess.BB_E6
+BB_KEY_RANKS = chess.BB_RANK_4 | chess.BB_RANK_5 | chess.BB_RANK_6
+
+# File and rank of each square, as masks
+BB_SQUARE_FILES = [chess.BB_FILES[chess.square_file(square)] for square in chess.SQUARES]
+BB_SQUARE_RANKS = [chess.BB_RANKS[chess.square_rank(square)] for square in chess.SQUARES]
+
+# Files directly left and right of each file
+BB_ADJACENT_FILES = [
+    (chess.BB_FILES[file - 1] if file > 0 else 0) | (chess.BB_FILES[file + 1] if file < 7 else 0)
+    for file in range(8)
+]
+
+# Chebyshev (king move) distance between two squares, indexed [square][other_square]
+SQUARE_DISTANCES = [[chess.square_distance(square, other) for other in chess.SQUARES] for square in chess.SQUARES]
+
+# King zone of each square: the square and every square a king step away
+BB_KING_ZONES = [chess.BB_KING_ATTACKS[square] | chess.BB_SQUARES[square] for square in chess.SQUARES]
+
+# Squares within two king steps of each square, excluding the square, in ascending order
+KING_MOBILITY_SQUARES = [
+    [other for other in chess.SQUARES if other != square and SQUARE_DISTANCES[square][other] <= 2]
+    for square in chess.SQUARES
+]
+
+# The three squares directly in front of a king on each square, for each color
+BB_PAWN_SHIELDS = {
+    color: [
+        (chess.BB_KING_ATTACKS[square] & chess.BB_RANKS[chess.square_rank(square) + (1 if color == chess.WHITE else -1)])
+        if 0 <= chess.square_rank(square) + (1 if color == chess.WHITE else -1) < 8 else 0
+        for square in chess.SQUARES
+    ]
+    for color in chess.COLORS
+}
+
+# Squares ahead of a pawn on each square, on its own and adjacent files, for each color
+BB_PASSED_PAWN_SPANS = {
+    color: [
+        (BB_SQUARE_FILES[square] | BB_ADJACENT_FILES[chess.square_file(square)]) &
+        sum(chess.BB_RANKS[rank] for rank in range(8)
+            if (rank > chess.square_rank(square) if color == chess.WHITE else rank < chess.square_rank(square)))
+        for square in chess.SQUARES
+    ]
+    for color in chess.COLORS
+}
+
+# Squares visited by evaluate_center_control, in order (C5 is listed twice)
+CENTER_CONTROL_SQUARES = [chess.E4, chess.D4, chess.E5, chess.D5]
+CENTER_ADJACENT_SQUARES = [chess.C3, chess.E3, chess.C4, chess.C5, chess.E4, chess.C5, chess.C6, chess.E6]
+
+# Squares where calculate_rook_coordination wants rooks, and the pawn break squares it
+# rewards (several are listed twice, and count twice)
+IDEAL_ROOK_SQUARES = [chess.C1, chess.F1, chess.C8, chess.F8]
+BB_IDEAL_ROOK_SQUARES = chess.BB_C1 | chess.BB_F1 | chess.BB_C8 | chess.BB_F8
+ROOK_PAWN_BREAK_SQUARES = [chess.B4, chess.C4, chess.D4, chess.E4, chess.B5, chess.C5, chess.D5, chess.E5,
+                           chess.B5, chess.C5, chess.D5, chess.E5, chess.B6, chess.C6, chess.D6, chess.E6,
+                           chess.B3, chess.C3, chess.D3, chess.E3, chess.B6, chess.C6, chess.D6, chess.E6]
+
+# Squares where evaluate_piece_exchanges considers knights and bishops active
+BB_EXCHANGE_KNIGHT_SQUARES = chess.BB_C6 | chess.BB_F6 | chess.BB_C3 | chess.BB_F3
+BB_EXCHANGE_BISHOP_SQUARES = chess.BB_B2 | chess.BB_G2 | chess.BB_B7 | chess.BB_G7
+
+# Central squares and their weights (strategic importance), for calculate_central_support
+CENTRAL_SQUARE_WEIGHTS = {
+    chess.D4: 1.5,
+    chess.D5: 1.5,
+    chess.E4: 1.5,
+    chess.E5: 1.5,
+    chess.C4: 1.0,
+    chess.C5: 1.0,
+    chess.F4: 1.0,
+    chess.F5: 1.0
+}
+
+# Key squares with weights based on strategic importance, and piece weights, for calculate_key_square_control
+KEY_SQUARE_WEIGHTS = {
+    chess.E4: 1.0, chess.D4: 1.0, chess.E5: 1.0, chess.D5: 1.0,  # Central squares
+    chess.F2: 0.5, chess.G2: 0.5, chess.F3: 0.5, chess.G3: 0.5,  # Squares near white king
+    chess.F7: 0.5, chess.G7: 0.5, chess.F6: 0.5, chess.G6: 0.5,  # Squares near black king
+    chess.C4: 0.8, chess.C5: 0.8, chess.F4: 0.8, chess.F5: 0.8,  # Important pawn break squares
+    chess.D3: 0.7, chess.D6: 0.7, chess.E3: 0.7, chess.E6: 0.7,  # Near center control squares
+}
+KEY_SQUARE_PIECE_WEIGHTS = {
+    chess.PAWN: 0.1,
+    chess.KNIGHT: 0.3,
+    chess.BISHOP: 0.3,
+    chess.ROOK: 0.5,
+    chess.QUEEN: 0.9,
+    chess.KING: 0.2
+}
+
+# Piece values used by evaluate_material_impact, which counts the king
+MATERIAL_IMPACT_VALUES = dict(PIECE_VALUES)
+MATERIAL_IMPACT_VALUES[chess.KING] = 200
+
+# Development squares of each piece type, and the back rank squares checked for rooks,
+# for calculate_development_advantage
+DEVELOPMENT_SQUARES = {
+    chess.KNIGHT: [chess.D2, chess.D7, chess.E2, chess.E7, chess.C3, chess.C6, chess.F3, chess.F6],
+    chess.BISHOP: [chess.C1, chess.F1, chess.C8, chess.F8, chess.B2, chess.G2, chess.B7, chess.G7],
+    chess.ROOK: [chess.A1, chess.H1, chess.A8, chess.H8],
+    chess.QUEEN: [chess.D1, chess.D8],
+    chess.KING: [chess.C1, chess.G1, chess.C8, chess.G8]
+}
+BACK_RANK_SQUARES = [
+    chess.A1, chess.A8, chess.B1, chess.B8, chess.C1, chess.C8, chess.D1, chess.D8,
+    chess.E1, chess.E8, chess.F1, chess.F8, chess.G1, chess.G8, chess.H1, chess.H8
+]
+
+def _pawn_cover_squares(square):
+    """
+    Squares checked by evaluate_pawn_cover around a king: the neighbouring square
+    indices, including those that wrap around to the opposite edge of the board.
+    """
+    mask = 0
+    king_file, king_rank = chess.square_file(square), chess.square_rank(square)
+    for i in range(-1, 2):
+        for j in range(-1, 2):
+            if i == 0 and j == 0:
+                continue
+            target = chess.square(king_file + i, king_rank + j)
+            if chess.square_file(target) in range(8) and chess.square_rank(target) in range(8):
+                mask |= chess.BB_SQUARES[target]
+    return mask
+
+BB_PAWN_COVERS = [_pawn_cover_squares(square) for square in chess.SQUARES]
+
+def _positional_piece_square_values(table, piece_value, color):
+    """
+    Flatten a calculate_positional_features table (rows listed from rank 1), scaled by
+    the piece value. Black reads the row of the square with its file mirrored.
+    """
+    return [table[square // 8][square % 8 if color == chess.WHITE else 7 - square % 8] * piece_value
+            for square in chess.SQUARES]
+
+_POSITIONAL_TABLES = {
+    chess.PAWN: (100, [
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [50, 50, 50, 50, 50, 50, 50, 50],
+        [10, 10, 20, 30, 30, 20, 10, 10],
+        [5, 5, 10, 25, 25, 10, 5, 5],
+        [0, 0, 0, 20, 20, 0, 0, 0],
+        [5, -5, -10, 0, 0, -10, -5, 5],
+        [5, 10, 10, -20, -20, 10, 10, 5],
+        [0, 0, 0, 0, 0, 0, 0, 0]
+    ]),
+    chess.KNIGHT: (320, [
+        [-50, -40, -30, -30, -30, -30, -40, -50],
+        [-40, -20, 0, 0, 0, 0, -20, -40],
+        [-30, 0, 10, 15, 15, 10, 0, -30],
+        [-30, 5, 15, 20, 20, 15, 5, -30],
+        [-30, 0, 15, 20, 20, 15, 0, -30],
+        [-30, 5, 10, 15, 15, 10, 5, -30],
+        [-40, -20, 0, 5, 5, 0, -20, -40],
+        [-50, -40, -30, -30, -30, -30, -40, -50]
+    ])
+}
+
+# Piece-square values of calculate_positional_features, already multiplied by the piece value
+POSITIONAL_PIECE_SQUARE_VALUES = {
+    color: {piece_type: _positional_piece_square_values(table, piece_value, color)
+            for piece_type, (piece_value, table) in _POSITIONAL_TABLES.items()}
+    for color in chess.COLORS
+}
+
+# Piece-square bonuses of PIECE_SQUARE_TABLES for each color, indexed directly by square
+PIECE_SQUARE_VALUES = {
+    color: {
+        piece_type: [table[square if color == chess.WHITE else chess.square_mirror(square)] for square in chess.SQUARES]
+        for piece_type, table in PIECE_SQUARE_TABLES.items()
     }
+    for color in chess.COLORS
+}
+
+def _linear_rays(step):
+    """
+    Squares reached from each square by repeatedly adding step to the square index
+    until it leaves 0..63, without stopping at the board edge.
+    """
+    rays = []
+    for square in chess.SQUARES:
+        ray = 0
+        target = square + step
+        while 0 <= target < 64:
+            ray |= chess.BB_SQUARES[target]
+            target += step
+        rays.append(ray)
+    return rays
+
+# Both diagonals through each square, including the square itself
+BB_DIAGONALS = [
+    sum(chess.BB_SQUARES[target] for target in chess.SQUARES
+        if abs(chess.square_file(target) - chess.square_file(square)) == abs(chess.square_rank(target) - chess.square_rank(square)))
+    for square in chess.SQUARES
+]
+
+# Index-stepping rays used by is_pinned, keyed by step
+BB_LINEAR_RAYS = {step: _linear_rays(step) for step in [1, -1, 8, -8, 9, -9, 7, -7]}
+
+def _first_blocker(ray, occupied, step):
+    """
+    Return the bitboard of the first occupied square along a ray walked in the given step direction.
+    """
+    blockers = ray & occupied
+    if not blockers:
+        return 0
+    if step > 0:
+        return blockers & -blockers
+    return chess.BB_SQUARES[chess.msb(blockers)]
+
+def _king_step_spread(mask):
+    """
+    Return the mask together with every square one king step away from it.
+    """
+    row = mask | ((mask << 1) & ~chess.BB_FILE_A) | ((mask >> 1) & ~chess.BB_FILE_H)
+    return (row | (row << 8) | (row >> 8)) & chess.BB_ALL
+
+def _horizontal_neighbours(mask):
+    """
+    Return the squares directly left and right of the squares in the mask.
+    """
+    return ((mask << 1) & ~chess.BB_FILE_A) | ((mask >> 1) & ~chess.BB_FILE_H)
+
+def _pawn_chains(pawns):
+    """
+    Split a pawn bitboard into chains of pawns connected through adjacent squares,
+    ordered by their lowest square, each listing its squares in ascending order.
+    """
+    chains = []
+    while pawns:
+        # Grow the chain from its lowest pawn until it stops picking up new pawns
+        chain = pawns & -pawns
+        while True:
+            grown = _king_step_spread(chain) & pawns
+            if grown == chain:
+                break
+            chain = grown
+
+        chains.append(tuple(chess.scan_forward(chain)))
+        pawns &= ~chain
+    return tuple(chains)
+
+def _pawn_terms(board):
+    """
+    Compute the terms of each color that depend on nothing but the pawns, for the pawn hash table.
+    """
+    terms = {}
+    for color in chess.COLORS:
+        pawns = board.pieces_mask(chess.PAWN, color)
+        chains = _pawn_chains(pawns)
+        terms[color] = {
+            'pawn_chains': chains,
+            'pawn_structure_strength': sum(len(chain) for chain in chains),
+            'pawn_mobility': sum(chess.popcount(chess.BB_PAWN_ATTACKS[color][square]) for square in chess.scan_forward(pawns))
+        }
+    return terms
+
+def _gives_check(board, move):
+    """
+    Return whether a legal move of the side to move puts the opponent in check.
+
+    Unlike chess.Board.gives_check, the board is not modified: the attackers of
+    the enemy king are computed on the occupancy the move would leave behind.
+    """
+    color = board.turn
+    king = board.king(not color)
+    if king is None:
+        return False
+
+    occupied = board.occupied
+    own = {piece_type: board.pieces_mask(piece_type, color) for piece_type in chess.PIECE_TYPES}
+    from_mask = chess.BB_SQUARES[move.from_square]
+    rank = chess.square_rank(move.from_square)
+
+    if board.is_castling(move):
+        kingside = board.is_kingside_castling(move)
+        rook_from = move.to_square
+        if not own[chess.ROOK] & chess.BB_SQUARES[rook_from]:
+            rook_from = chess.square(7 if kingside else 0, rank)
+        king_to = chess.BB_SQUARES[chess.square(6 if kingside else 2, rank)]
+        rook_to = chess.BB_SQUARES[chess.square(5 if kingside else 3, rank)]
+        occupied = (occupied & ~from_mask & ~chess.BB_SQUARES[rook_from]) | king_to | rook_to
+        own[chess.KING] = (own[chess.KING] & ~from_mask) | king_to
+        own[chess.ROOK] = (own[chess.ROOK] & ~chess.BB_SQUARES[rook_from]) | rook_to
+    else:
+        to_mask = chess.BB_SQUARES[move.to_square]
+        piece_type = board.piece_type_at(move.from_square)
+        if board.is_en_passant(move):
+            occupied &= ~chess.BB_SQUARES[chess.square(chess.square_file(move.to_square), rank)]
+        occupied = (occupied & ~from_mask) | to_mask
+        own[piece_type] &= ~from_mask
+        own[move.promotion or piece_type] |= to_mask
+
+    diagonal = chess.BB_DIAG_ATTACKS[king][chess.BB_DIAG_MASKS[king] & occupied]
+    straight = (chess.BB_RANK_ATTACKS[king][chess.BB_RANK_MASKS[king] & occupied] |
+                chess.BB_FILE_ATTACKS[king][chess.BB_FILE_MASKS[king] & occupied])
+    return bool(chess.BB_PAWN_ATTACKS[not color][king] & own[chess.PAWN] or
+                chess.BB_KNIGHT_ATTACKS[king] & own[chess.KNIGHT] or
+                diagonal & (own[chess.BISHOP] | own[chess.QUEEN]) or
+                straight & (own[chess.ROOK] | own[chess.QUEEN]))
+
+# Shared by every evaluation; see calculate_pawn_structure_strength, get_pawn_chains and calculate_pawn_mobility
+pawn_hash_table = PawnHashTable(_pawn_terms)
+
+class PositionContext:
+    """
+    Attack maps, piece lists and legal moves of a single position.
+
+    Built once per analyze_board call and passed down to every feature function,
+    so the same attackers/attacks sets are not recomputed for every square each
+    feature looks at. The board must not be modified while the context is in use.
+
+    Attributes:
+    board (chess.Board): The chess board the context was built from.
+    pieces (list): The piece on each square, None for empty squares.
+    squares (dict): Occupied squares of each color in ascending order.
+    piece_squares (dict): Squares of each (piece type, color) in ascending order.
+    attacks (list): Attack bitboard of the piece on each square, 0 for empty squares.
+    attackers (dict): Attackers bitboard of every square, for each color (built on first use).
+    results (dict): Results of memoized feature functions for this position.
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.pieces = [None] * 64
+        self.squares = {chess.WHITE: [], chess.BLACK: []}
+        self.piece_squares = {
+            (piece_type, color): [] for piece_type in chess.PIECE_TYPES for color in chess.COLORS
+        }
+        self.attacks = [0] * 64
+
+        for square in chess.scan_forward(board.occupied):
+            piece = board.piece_at(square)
+            self.pieces[square] = piece
+            self.squares[piece.color].append(square)
+            self.piece_squares[piece.piece_type, piece.color].append(square)
+            self.attacks[square] = board.attacks_mask(square)
+
+        self.results = {}
+        self._attackers = None
+        self._legal_moves = {}
+        self._is_check = None
+        self._is_checkmate = None
+        self._mirror = None
+
+    @property
+    def attackers(self):
+        if self._attackers is None:
+            board = self.board
+            self._attackers = {
+                color: [board.attackers_mask(color, square) for square in chess.SQUARES]
+                for color in chess.COLORS
+            }
+        return self._attackers
+
+    @property
+    def legal_moves(self):
+        """
+        Legal moves of the side to move.
+        """
+        return self.legal_moves_for(self.board.turn)
+
+    def legal_moves_for(self, turn):
+        """
+        Legal moves of the position with the given side to move.
+
+        Matches flipping board.turn and listing board.legal_moves, without
+        touching the board itself.
+        """
+        if turn not in self._legal_moves:
+            board = self.board
+            if turn != board.turn:
+                board = board.copy(stack=False)
+                board.turn = turn
+            self._legal_moves[turn] = list(board.legal_moves)
+        return self._legal_moves[turn]
+
+    def is_check(self):
+        if self._is_check is None:
+            self._is_check = self.board.is_check()
+        return self._is_check
+
+    def is_checkmate(self):
+        if self._is_checkmate is None:
+            self._is_checkmate = self.board.is_checkmate()
+        return self._is_checkmate
+
+    def mirror(self):
+        """
+        Context of the mirrored board (see chess.Board.mirror), built on first use.
+        """
+        if self._mirror is None:
+            self._mirror = PositionContext(self.board.mirror())
+        return self._mirror
+
+def _context(board, context):
+    """
+    Return the given position context, or build one for the board if none was passed.
+    """
+    if context is None:
+        return PositionContext(board)
+    return context
+
+def _memoized(function):
+    """
+    Compute a feature function once per position context and arguments.
+
+    The wrapped function keeps the usual (board, ..., context=None) signature.
+    Its results are stored in context.results, so they are shared by every
+    caller evaluating the same position and live as long as the context.
+    """
+    argument_count = function.__code__.co_argcount - 2
+
+    @functools.wraps(function)
+    def wrapper(board, *args, context=None):
+        if len(args) > argument_count:
+            args, context = args[:argument_count], args[argument_count]
+        context = _context(board, context)
+        key = (function.__name__,) + args
+        if key not in context.results:
+            context.results[key] = function(board, *args, context)
+        return context.results[key]
+
+    return wrapper
+
+# Metrics reported by analyze_board: name -> (function of board, color and context,
+# whether the function scores the position from white's point of view)
+ANALYSIS_METRICS = {
+    'material_balance': (lambda board, color, context: evaluate_material_balance(board, context), True), #Done
+    'piece_mobility': (lambda board, color, context: evaluate_piece_mobility(board, context), True), #Done
+    'piece_coordination': (lambda board, color, context: evaluate_piece_coordination(board, context), True), #Progress
+    'pawn_structure': (lambda board, color, context: evaluate_pawn_structure(board, context), True), #Done
+    'king_safety': (lambda board, color, context: evaluate_king_safety(board, color, context), False), #Done
+    'control_of_center': (lambda board, color, context: evaluate_center_control(board, context), True), #Done
+    'piece_activity': (lambda board, color, context: evaluate_piece_activity(board, context), True), #Done
+    'space_control': (lambda board, color, context: 0, False), #evaluate_space_control(board)#Progress
+    'pawn_structure_strength': (lambda board, color, context: calculate_pawn_structure_strength(board, color, context), False), #Done
+    'piece_placement': (lambda board, color, context: evaluate_piece_position(board, color, context), False), #Done
+    'piece_exchange': (lambda board, color, context: evaluate_piece_exchanges(board, color, context), False), #Done
+    'tempo': (lambda board, color, context: calculate_initiative_and_tempo(board, context), True) #Done
+}
+
+def _evaluate_metric(name, board, color, context):
+    """
+    Compute one analyze_board metric, from the point of view of the given color.
+    """
+    function, white_point_of_view = ANALYSIS_METRICS[name]
+    value = function(board, color, context)
+    if white_point_of_view and color == chess.BLACK:
+        value = - (value)
+    return value
+
+class LazyMetrics(collections.abc.Mapping):
+    """
+    Read-only mapping of selected analyze_board metrics, each computed on first access.
+
+    The metrics share one position context, so sub-evaluations used by several
+    of them are only computed once. The board is copied, so later moves on the
+    caller's board do not change the results.
+    """
+
+    def __init__(self, board, color, features):
+        features = set(features)
+        unknown = sorted(features - set(ANALYSIS_METRICS))
+        if unknown:
+            raise ValueError(f"Unknown metrics: {', '.join(unknown)}")
+
+        self._board = board.copy(stack=False)
+        self._color = color
+        self._features = [name for name in ANALYSIS_METRICS if name in features]
+        self._context = None
+        self._values = {}
+
+    def __getitem__(self, name):
+        if name not in self._values:
+            if name not in self._features:
+                raise KeyError(name)
+            if self._context is None:
+                self._context = PositionContext(self._board)
+            self._values[name] = _evaluate_metric(name, self._board, self._color, self._context)
+        return self._values[name]
+
+    def __iter__(self):
+        return iter(self._features)
+
+    def __len__(self):
+        return len(self._features)
+
+    def __repr__(self):
+        values = ', '.join(f"'{name}': {self._values[name]!r}" if name in self._values else f"'{name}': <lazy>"
+                           for name in self._features)
+        return f"LazyMetrics({{{values}}})"
+
+def analyze_board(board, color, features=None):
+    """
+    Evaluate the position for the given color.
+
+    Parameters:
+    board (chess.Board): The chess board.
+    color (bool): The color of the player (chess.WHITE or chess.BLACK).
+    features (iterable): Names of the metrics to compute (see ANALYSIS_METRICS).
+        If given, a LazyMetrics mapping is returned and each metric is only
+        computed when it is first read. By default every metric is computed.
+
+    Returns:
+    dict: The evaluation metrics, keyed by name.
+    """
+    if features is not None:
+        return LazyMetrics(board, color, features)
+
+    context = PositionContext(board)
+    return {name: _evaluate_metric(name, board, color, context) for name in ANALYSIS_METRICS}
 
 
 #Main Functions
-def evaluate_material_balance(board):
+@_memoized
+def evaluate_material_balance(board, context=None):
     """
     Evaluate the material balance on the board along with other factors.
     
@@ -62,24 +624,23 @@ def evaluate_material_balance(board):
     Positive scores indicate a material advantage for white,
     negative scores indicate a material advantage for black.
     """
+    context = _context(board, context)
     white_material = 0
     black_material = 0
     
     # Count material for each side
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
-        if piece:
-            if piece.color == chess.WHITE:
-                white_material += piece_value_for_material_balance(piece)
-            else:
-                black_material += piece_value_for_material_balance(piece)
+    for square in context.squares[chess.WHITE]:
+        white_material += piece_value_for_material_balance(context.pieces[square])
+    for square in context.squares[chess.BLACK]:
+        black_material += piece_value_for_material_balance(context.pieces[square])
     
     # Calculate material balance score
     material_balance_score = white_material - black_material
     
     return material_balance_score
 
-def evaluate_piece_mobility(board):
+@_memoized
+def evaluate_piece_mobility(board, context=None):
     """
     Evaluate the piece mobility on the board.
     
@@ -96,49 +657,51 @@ def evaluate_piece_mobility(board):
     Positive scores indicate better mobility for white,
     negative scores indicate better mobility for black.
     """
-    original_turn = board.turn
+    context = _context(board, context)
+    pieces = context.pieces
+    white_squares = context.squares[chess.WHITE]
+    black_squares = context.squares[chess.BLACK]
 
     # 1. Number of legal moves for each side
-    white_mobility = len(list(board.legal_moves))
-    board.turn = chess.BLACK
-    black_mobility = len(list(board.legal_moves))
-    board.turn = original_turn
+    white_mobility = len(context.legal_moves)
+    black_mobility = len(context.legal_moves_for(chess.BLACK))
 
     mobility_score = white_mobility - black_mobility
 
     # 2. Centralization of pieces
-    white_centralization = sum(1 for square in chess.SQUARES if board.piece_at(square) and board.piece_at(square).color == chess.WHITE and square in CENTER_SQUARES)
-    black_centralization = sum(1 for square in chess.SQUARES if board.piece_at(square) and board.piece_at(square).color == chess.BLACK and square in CENTER_SQUARES)
+    white_centralization = sum(1 for square in white_squares if square in CENTER_SQUARES)
+    black_centralization = sum(1 for square in black_squares if square in CENTER_SQUARES)
     centralization_score = white_centralization - black_centralization
 
     # 3. Control over important squares
-    white_control_center = sum(1 for square in CENTER_SQUARES if board.color_at(square) == chess.WHITE)
-    black_control_center = sum(1 for square in CENTER_SQUARES if board.color_at(square) == chess.BLACK)
+    white_control_center = sum(1 for square in CENTER_SQUARES if pieces[square] and pieces[square].color == chess.WHITE)
+    black_control_center = sum(1 for square in CENTER_SQUARES if pieces[square] and pieces[square].color == chess.BLACK)
     center_control_score = white_control_center - black_control_center
 
     # 4. Piece coordination and potential for piece exchanges
-    white_piece_coordination = sum(1 for square in chess.SQUARES if board.piece_at(square) and board.piece_at(square).color == chess.WHITE)
-    black_piece_coordination = sum(1 for square in chess.SQUARES if board.piece_at(square) and board.piece_at(square).color == chess.BLACK)
+    white_piece_coordination = len(white_squares)
+    black_piece_coordination = len(black_squares)
     piece_coordination_score = white_piece_coordination - black_piece_coordination
 
     # 5. Pawn structure and its impact on piece mobility
-    white_pawn_structure = sum(1 for square in chess.SQUARES if board.piece_at(square) and board.piece_at(square).color == chess.WHITE and board.piece_at(square).piece_type == chess.PAWN)
-    black_pawn_structure = sum(1 for square in chess.SQUARES if board.piece_at(square) and board.piece_at(square).color == chess.BLACK and board.piece_at(square).piece_type == chess.PAWN)
+    white_pawn_structure = len(context.piece_squares[chess.PAWN, chess.WHITE])
+    black_pawn_structure = len(context.piece_squares[chess.PAWN, chess.BLACK])
     pawn_structure_score = white_pawn_structure - black_pawn_structure
 
     # 6. Open lines and diagonals for rooks, bishops, and queens
-    white_open_lines = sum(1 for square in chess.SQUARES if board.piece_at(square) and board.piece_at(square).color == chess.WHITE and board.piece_at(square).piece_type in [chess.ROOK, chess.BISHOP, chess.QUEEN] and is_open_file(board, square))
-    black_open_lines = sum(1 for square in chess.SQUARES if board.piece_at(square) and board.piece_at(square).color == chess.BLACK and board.piece_at(square).piece_type in [chess.ROOK, chess.BISHOP, chess.QUEEN] and is_open_file(board, square))
+    white_open_lines = sum(1 for square in white_squares if pieces[square].piece_type in [chess.ROOK, chess.BISHOP, chess.QUEEN] and is_open_file(board, square))
+    black_open_lines = sum(1 for square in black_squares if pieces[square].piece_type in [chess.ROOK, chess.BISHOP, chess.QUEEN] and is_open_file(board, square))
     open_lines_score = white_open_lines - black_open_lines
 
     # 7. Connectivity between pieces and king safety
-    white_king_safety = evaluate_king_safety(board, chess.WHITE)
-    black_king_safety = evaluate_king_safety(board, chess.BLACK)
+    white_king_safety = evaluate_king_safety(board, chess.WHITE, context)
+    black_king_safety = evaluate_king_safety(board, chess.BLACK, context)
     connectivity_score = white_king_safety - black_king_safety
 
     # 8. Tactical threats and opportunities
-    white_tactics = evaluate_tactics(board)
-    black_tactics = evaluate_tactics(board.mirror())
+    mirror_context = context.mirror()
+    white_tactics = evaluate_tactics(board, context)
+    black_tactics = evaluate_tactics(mirror_context.board, mirror_context)
     tactics_score = white_tactics - black_tactics
 
     # Combine all scores with appropriate weights
@@ -155,7 +718,8 @@ def evaluate_piece_mobility(board):
 
     return total_score
 
-def evaluate_king_safety(board, color):
+@_memoized
+def evaluate_king_safety(board, color, context=None):
     """
     Evaluate the safety of the king on the board.
     
@@ -168,11 +732,12 @@ def evaluate_king_safety(board, color):
     
     Higher scores indicate a safer king position.
     """
+    context = _context(board, context)
     king_square = board.king(color)  # Get the square of the king for the given color
 
     # Factors Considered:
     pawn_cover_score = evaluate_pawn_cover(board, king_square)
-    attackers_score = evaluate_attackers(board, king_square)  # Ensure this function is defined
+    attackers_score = evaluate_attackers(board, king_square, context)  # Ensure this function is defined
     open_files_score = evaluate_open_files(board, king_square)
     pawn_shield_score = evaluate_pawn_shield(board, king_square)
     king_mobility_score = evaluate_king_mobility(board, king_square)
@@ -183,21 +748,23 @@ def evaluate_king_safety(board, color):
 
     return safety_score
 
-def evaluate_pawn_structure(board):
+@_memoized
+def evaluate_pawn_structure(board, context=None):
     """
     Evaluate the pawn structure on the board.
     """
+    context = _context(board, context)
     white_pawn_structure_score = evaluate_pawn_structure_score(board, chess.WHITE)
     black_pawn_structure_score = evaluate_pawn_structure_score(board, chess.BLACK)
     pawn_structure_score = white_pawn_structure_score - black_pawn_structure_score
     
     # Additional complexity
-    white_pawn_structure_strength = calculate_pawn_structure_strength(board, chess.WHITE)
-    black_pawn_structure_strength = calculate_pawn_structure_strength(board, chess.BLACK)
+    white_pawn_structure_strength = calculate_pawn_structure_strength(board, chess.WHITE, context)
+    black_pawn_structure_strength = calculate_pawn_structure_strength(board, chess.BLACK, context)
     pawn_structure_strength = white_pawn_structure_strength - black_pawn_structure_strength
     
-    white_pawn_mobility = calculate_pawn_mobility(board, chess.WHITE)
-    black_pawn_mobility = calculate_pawn_mobility(board, chess.BLACK)
+    white_pawn_mobility = calculate_pawn_mobility(board, chess.WHITE, context)
+    black_pawn_mobility = calculate_pawn_mobility(board, chess.BLACK, context)
     pawn_mobility = white_pawn_mobility - black_pawn_mobility
     
     white_pawn_breaks = calculate_pawn_breaks(board, chess.WHITE)
@@ -227,42 +794,45 @@ def eval_passed_pawns(board, color):
     
     return passed_pawn_count
 
-def evaluate_center_control(board):
+@_memoized
+def evaluate_center_control(board, context=None):
     """
     Evaluate the control of center squares on the board.
     More control over central squares results in a higher score.
     """
+    context = _context(board, context)
+    pieces = context.pieces
+    white_attackers_masks = context.attackers[chess.WHITE]
+    black_attackers_masks = context.attackers[chess.BLACK]
     white_control = 0
     black_control = 0
     
-    # Central squares
-    center_squares = [chess.E4, chess.D4, chess.E5, chess.D5]
-    
-    # Adjacent squares
-    adjacent_squares = [chess.C3, chess.E3, chess.C4, chess.C5, chess.E4, chess.C5, chess.C6, chess.E6]
+    # Central squares and adjacent squares
+    center_squares = CENTER_CONTROL_SQUARES
+    adjacent_squares = CENTER_ADJACENT_SQUARES
     
     # Piece activity and coordination around center squares
     for square in center_squares:
-        white_attackers = board.attackers_mask(chess.WHITE, square)
-        black_attackers = board.attackers_mask(chess.BLACK, square)
+        white_attackers = white_attackers_masks[square]
+        black_attackers = black_attackers_masks[square]
         
         # Count white pieces attacking center squares
-        white_control += bin(white_attackers).count('1') * 0.5
+        white_control += chess.popcount(white_attackers) * 0.5
         
         # Count black pieces attacking center squares
-        black_control += bin(black_attackers).count('1') * 0.5
+        black_control += chess.popcount(black_attackers) * 0.5
     
     # Check control of central squares and adjacent squares
     for square in center_squares + adjacent_squares:
-        if board.attackers_mask(chess.WHITE, square):
+        if white_attackers_masks[square]:
             white_control += 1
-        elif board.attackers_mask(chess.BLACK, square):
+        elif black_attackers_masks[square]:
             black_control += 1
     
     # Evaluate pawn structure around center squares
     for square in center_squares:
-        if board.piece_at(square) and board.piece_at(square).piece_type == chess.PAWN:
-            if board.piece_at(square).color == chess.WHITE:
+        if pieces[square] and pieces[square].piece_type == chess.PAWN:
+            if pieces[square].color == chess.WHITE:
                 white_control += 0.25  # Increase control score for each white pawn on center square
             else:
                 black_control += 0.25  # Increase control score for each black pawn on center square
@@ -270,9 +840,9 @@ def evaluate_center_control(board):
     # Evaluate potential future control over center squares
     # Analyze which pieces see which squares around the center
     for square in center_squares:
-        piece = board.piece_at(square)
+        piece = pieces[square]
         if piece:
-            attackers = board.attackers_mask(not piece.color, square)
+            attackers = context.attackers[not piece.color][square]
             if attackers:
                 if piece.color == chess.WHITE:
                     white_control += 0.5  # Increase control score for white pieces under attack
@@ -281,7 +851,8 @@ def evaluate_center_control(board):
     
     return white_control - black_control
 
-def evaluate_piece_activity(board):
+@_memoized
+def evaluate_piece_activity(board, context=None):
     """
     Evaluate piece activity and mobility.
     
@@ -290,60 +861,56 @@ def evaluate_piece_activity(board):
     2. Centralization of pieces.
     3. Control over important squares (e.g., center).
     """
-    original_turn = board.turn
+    context = _context(board, context)
     
     # Number of legal moves for each side
-    white_mobility = len(list(board.legal_moves))
-    board.turn = chess.BLACK
-    black_mobility = len(list(board.legal_moves))
-    board.turn = original_turn
+    white_mobility = len(context.legal_moves)
+    black_mobility = len(context.legal_moves_for(chess.BLACK))
     
     mobility_score = white_mobility - black_mobility
 
     # Centralization of pieces
-    center_squares = [chess.E4, chess.D4, chess.E5, chess.D5]
-    white_centralization = sum(1 for square in chess.SQUARES if board.piece_at(square) and board.piece_at(square).color == chess.WHITE and square in center_squares)
-    black_centralization = sum(1 for square in chess.SQUARES if board.piece_at(square) and board.piece_at(square).color == chess.BLACK and square in center_squares)
+    white_centralization = chess.popcount(board.occupied_co[chess.WHITE] & BB_CENTER)
+    black_centralization = chess.popcount(board.occupied_co[chess.BLACK] & BB_CENTER)
     centralization_score = white_centralization - black_centralization
 
-    # Control over important squares
-    white_control_center = sum(1 for square in center_squares if board.color_at(square) == chess.WHITE)
-    black_control_center = sum(1 for square in center_squares if board.color_at(square) == chess.BLACK)
-    center_control_score = white_control_center - black_control_center
+    # Control over important squares, counted as occupation of the center
+    center_control_score = centralization_score
 
     return mobility_score * 0.5 + centralization_score * 0.3 + center_control_score * 0.2
 
-def evaluate_piece_coordination(board):
+@_memoized
+def evaluate_piece_coordination(board, context=None):
     """
     Evaluate the coordination between pieces on the board.
     Higher scores indicate better coordination and mutual support among pieces.
     """
-    key_squares = list(chess.SquareSet(chess.BB_RANK_4 | chess.BB_RANK_5 | chess.BB_RANK_6))
+    context = _context(board, context)
     white_coordination = 0
     black_coordination = 0
     
     # Evaluate piece harmony
-    white_harmony, black_harmony = evaluate_piece_harmony(board)
+    white_harmony, black_harmony = evaluate_piece_harmony(board, context)
     white_coordination += white_harmony
     black_coordination += black_harmony
     
     # Iterate through all squares
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
+    for square in chess.scan_forward(board.occupied):
+        piece = context.pieces[square]
         if piece:
             # Find attackers and defenders
-            attackers = list(board.attackers(piece.color, square))
-            defenders = list(board.attackers(not piece.color, square))
+            attackers = context.attackers[piece.color][square]
+            defenders = context.attackers[not piece.color][square]
             
             # Calculate support value based on number of attackers and defenders
-            support_value = len(attackers) - len(defenders)
+            support_value = chess.popcount(attackers) - chess.popcount(defenders)
             
             # Bonus for centralized pieces
             if square in CENTER_SQUARES:
                 support_value += 0.5
             
             # Bonus for control of key squares
-            if square in key_squares:
+            if BB_KEY_RANKS & chess.BB_SQUARES[square]:
                 support_value += 0.5
             
             # Penalty for being attacked
@@ -351,7 +918,7 @@ def evaluate_piece_coordination(board):
                 support_value -= 0.5
             
             # Additional bonus for future mobility potential
-            mobility_bonus = calculate_mobility_bonus(board, piece, square)
+            mobility_bonus = calculate_mobility_bonus(board, piece, square, context)
             support_value += mobility_bonus
             
             # Update coordination score based on piece color
@@ -372,7 +939,7 @@ def evaluate_piece_coordination(board):
 
 #Additional Calculation functions
 
-def evaluate_piece_harmony(board):
+def evaluate_piece_harmony(board, context=None):
     """
     Evaluate the harmony and coordination between pieces on the board.
     
@@ -390,96 +957,85 @@ def evaluate_piece_harmony(board):
     
     Higher scores indicate better harmony and coordination between pieces.
     """
+    context = _context(board, context)
     white_harmony_score = 0
     black_harmony_score = 0
     
     # 1. Coordination between pieces of the same color
-    white_harmony_score += calculate_color_coordination(board, chess.WHITE)
-    black_harmony_score += calculate_color_coordination(board, chess.BLACK)
+    white_harmony_score += calculate_color_coordination(board, chess.WHITE, context)
+    black_harmony_score += calculate_color_coordination(board, chess.BLACK, context)
     
     # 2. Control of key squares and lines by coordinated pieces
-    white_harmony_score += calculate_key_square_control(board, chess.WHITE)
-    black_harmony_score += calculate_key_square_control(board, chess.BLACK)
+    white_harmony_score += calculate_key_square_control(board, chess.WHITE, context)
+    black_harmony_score += calculate_key_square_control(board, chess.BLACK, context)
     
     # 3. Support of central squares by minor pieces
-    white_harmony_score += calculate_central_support(board, chess.WHITE)
-    black_harmony_score += calculate_central_support(board, chess.BLACK)
+    white_harmony_score += calculate_central_support(board, chess.WHITE, context)
+    black_harmony_score += calculate_central_support(board, chess.BLACK, context)
     
     # 4. Coordination between rooks on open files or ranks
-    white_harmony_score += calculate_rook_coordination(board, chess.WHITE)
-    black_harmony_score += calculate_rook_coordination(board, chess.BLACK)
+    white_harmony_score += calculate_rook_coordination(board, chess.WHITE, context)
+    black_harmony_score += calculate_rook_coordination(board, chess.BLACK, context)
     
     # 5. Harmony in pawn structure and piece placement
     white_harmony_score += evaluate_pawn_structure_score(board, chess.WHITE)
     black_harmony_score += evaluate_pawn_structure_score(board, chess.BLACK)
     
     # 6. Coordination between major and minor pieces for potential threats
-    white_harmony_score += calculate_threat_coordination(board, chess.WHITE)
-    black_harmony_score += calculate_threat_coordination(board, chess.BLACK)
+    white_harmony_score += calculate_threat_coordination(board, chess.WHITE, context)
+    black_harmony_score += calculate_threat_coordination(board, chess.BLACK, context)
     
     # 7. Evaluation of piece activity and mobility in relation to coordination
-    white_harmony_score += calculate_mobility_coordination(board, chess.WHITE)
-    black_harmony_score += calculate_mobility_coordination(board, chess.BLACK)
+    white_harmony_score += calculate_mobility_coordination(board, chess.WHITE, context)
+    black_harmony_score += calculate_mobility_coordination(board, chess.BLACK, context)
     
     # 8. Awareness of piece values and imbalances
-    white_harmony_score += calculate_piece_value_awareness(board, chess.WHITE)
-    black_harmony_score += calculate_piece_value_awareness(board, chess.BLACK)
+    white_harmony_score += calculate_piece_value_awareness(board, chess.WHITE, context)
+    black_harmony_score += calculate_piece_value_awareness(board, chess.BLACK, context)
     
     # 9. Analysis of positional features such as outposts and weak squares
-    white_harmony_score += calculate_positional_features(board, chess.WHITE)
-    black_harmony_score += calculate_positional_features(board, chess.BLACK)
+    white_harmony_score += calculate_positional_features(board, chess.WHITE, context)
+    black_harmony_score += calculate_positional_features(board, chess.BLACK, context)
     
     # 10. Utilization of tactical patterns within coordinated piece setups
-    white_harmony_score += calculate_tactical_utilization(board, chess.WHITE)
-    black_harmony_score += calculate_tactical_utilization(board, chess.BLACK)
+    white_harmony_score += calculate_tactical_utilization(board, chess.WHITE, context)
+    black_harmony_score += calculate_tactical_utilization(board, chess.BLACK, context)
     
     return white_harmony_score, black_harmony_score
 
 def is_pinned(board, square, color):
     # Check if there's a piece on the square
-    piece = board.piece_at(square)
-    if piece is None:
+    occupied = board.occupied
+    if not occupied & chess.BB_SQUARES[square]:
         return False
 
+    enemy = board.occupied_co[not color]
+
     # Check if the piece is pinned by a rook or a queen
+    rooks_and_queens = (board.rooks | board.queens) & enemy
     for direction in [1, -1, 8, -8]:
-        target = square + direction
-        while 0 <= target < 64:
-            if board.piece_at(target) is not None:
-                if board.piece_at(target).color != color:
-                    if board.piece_at(target).piece_type in [chess.ROOK, chess.QUEEN]:
-                        return True
-                    else:
-                        break
-                else:
-                    break
-            target += direction
+        if _first_blocker(BB_LINEAR_RAYS[direction][square], occupied, direction) & rooks_and_queens:
+            return True
 
     # Check if the piece is pinned by a bishop or a queen
+    bishops_and_queens = (board.bishops | board.queens) & enemy
     for direction in [9, -9, 7, -7]:
-        target = square + direction
-        while 0 <= target < 64:
-            if board.piece_at(target) is not None:
-                if board.piece_at(target).color != color:
-                    if board.piece_at(target).piece_type in [chess.BISHOP, chess.QUEEN]:
-                        return True
-                    else:
-                        break
-                else:
-                    break
-            target += direction
+        if _first_blocker(BB_LINEAR_RAYS[direction][square], occupied, direction) & bishops_and_queens:
+            return True
 
     return False
 
-def calculate_tactical_utilization(board, color):
+def calculate_tactical_utilization(board, color, context=None):
+    context = _context(board, context)
+    pieces = context.pieces
     tactical_utilization = 0
 
     # Look for attacks and threats on the board
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
+    for square in context.squares[color]:
+        piece = pieces[square]
         if piece is not None and piece.color == color:
             # Check for attacks on opponent's pieces
-            attackers = board.attackers(not color, square)
+            attackers = context.attackers[not color][square]
             if attackers:
                 tactical_utilization += 0.2  # Increment for each attacked opponent piece
 
@@ -488,77 +1044,44 @@ def calculate_tactical_utilization(board, color):
                 tactical_utilization += 0.3  # Increment for each pinned piece
 
             # Check for potential forks and skewers
-            moves = board.attacks(square)
-            for move in moves:
-                attacked_piece = board.piece_at(move)
-                if attacked_piece is None or attacked_piece.color != color:
-                    tactical_utilization += 0.4  # Increment for each potential fork or skewer
+            moves = context.attacks[square] & ~board.occupied_co[color]
+            for move in chess.scan_forward(moves):
+                tactical_utilization += 0.4  # Increment for each potential fork or skewer
 
     # Check for checks and checkmates
-    if board.is_checkmate():
+    if context.is_checkmate():
         tactical_utilization += 1
-    elif board.is_check():
+    elif context.is_check():
         tactical_utilization += 0.5  # Increment for checks
 
     return tactical_utilization
 
-def calculate_positional_features(board, color):
+def calculate_positional_features(board, color, context=None):
+    context = _context(board, context)
     features = 0
 
     # Material
-    material = board.piece_map()
     white_material = 0
     black_material = 0
-    for piece in material.values():
-        if piece.color == chess.WHITE:
-            white_material += piece.piece_type
-        else:
-            black_material += piece.piece_type
+    for square in context.squares[chess.WHITE]:
+        white_material += context.pieces[square].piece_type
+    for square in context.squares[chess.BLACK]:
+        black_material += context.pieces[square].piece_type
     features += white_material - black_material
 
-    # Piece square tables
-    pst_values = {
-        chess.PAWN: [
-            [0, 0, 0, 0, 0, 0, 0, 0],
-            [50, 50, 50, 50, 50, 50, 50, 50],
-            [10, 10, 20, 30, 30, 20, 10, 10],
-            [5, 5, 10, 25, 25, 10, 5, 5],
-            [0, 0, 0, 20, 20, 0, 0, 0],
-            [5, -5, -10, 0, 0, -10, -5, 5],
-            [5, 10, 10, -20, -20, 10, 10, 5],
-            [0, 0, 0, 0, 0, 0, 0, 0]
-        ],
-        chess.KNIGHT: [
-            [-50, -40, -30, -30, -30, -30, -40, -50],
-            [-40, -20, 0, 0, 0, 0, -20, -40],
-            [-30, 0, 10, 15, 15, 10, 0, -30],
-            [-30, 5, 15, 20, 20, 15, 5, -30],
-            [-30, 0, 15, 20, 20, 15, 0, -30],
-            [-30, 5, 10, 15, 15, 10, 5, -30],
-            [-40, -20, 0, 5, 5, 0, -20, -40],
-            [-50, -40, -30, -30, -30, -30, -40, -50]
-        ],
-        # Add tables for other pieces
-    }
-
-    piece_values = {
-        chess.PAWN: 100,
-        chess.KNIGHT: 320,
-        # Add values for other pieces
-    }
-
-    for piece_type, pst in pst_values.items():
-        pieces_on_board = board.pieces(piece_type, color)
+    # Piece square tables (see POSITIONAL_PIECE_SQUARE_VALUES)
+    for piece_type, values in POSITIONAL_PIECE_SQUARE_VALUES[color].items():
+        pieces_on_board = context.piece_squares[piece_type, color]
         if pieces_on_board:  # Check if there are pieces of this type on the board
             for square in pieces_on_board:
                 if color == chess.WHITE:
-                    features += pst[square // 8][square % 8] * piece_values[piece_type] / len(pieces_on_board)
+                    features += values[square] / len(pieces_on_board)
                 else:
-                    features -= pst[square // 8][7 - square % 8] * piece_values[piece_type] / len(pieces_on_board)
+                    features -= values[square] / len(pieces_on_board)
 
     return features
 
-def calculate_mobility_coordination(board, color):
+def calculate_mobility_coordination(board, color, context=None):
     """
     Calculate the coordination of mobility for the given color on the board.
 
@@ -569,25 +1092,25 @@ def calculate_mobility_coordination(board, color):
     Returns:
     float: The mobility coordination score for the specified color.
     """
+    context = _context(board, context)
     mobility_coordination_score = 0
 
     # Factor 1: Piece Mobility
     for piece_type in [chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN]:
-        for square in board.pieces(piece_type, color):
-            piece = board.piece_at(square)
+        for square in context.piece_squares[piece_type, color]:
             # Increase score based on the number of legal moves available to the piece
-            mobility_coordination_score += len(board.attacks(square))
+            mobility_coordination_score += chess.popcount(context.attacks[square])
 
     # Factor 2: Piece Placement
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
+    for square in context.squares[color]:
+        piece = context.pieces[square]
         if piece and piece.color == color:
             # Reward pieces in central squares or controlling key squares
-            if square in [chess.D4, chess.E4, chess.D5, chess.E5]:
+            if chess.BB_SQUARES[square] & BB_CENTER:
                 mobility_coordination_score += 0.5
-            elif square in [chess.C4, chess.F4, chess.C5, chess.F5]:
+            elif chess.BB_SQUARES[square] & BB_CENTER_FLANKS:
                 mobility_coordination_score += 0.3
-            elif square in [chess.D3, chess.E3, chess.D6, chess.E6]:
+            elif chess.BB_SQUARES[square] & BB_CENTER_FRONTS:
                 mobility_coordination_score += 0.3
 
     # Factor 3: Piece Synergy
@@ -602,7 +1125,7 @@ def calculate_mobility_coordination(board, color):
 
     return mobility_coordination_score
 
-def calculate_piece_value_awareness(board, color):
+def calculate_piece_value_awareness(board, color, context=None):
     """
     Calculate the piece value awareness for the given color on the board.
 
@@ -613,37 +1136,30 @@ def calculate_piece_value_awareness(board, color):
     Returns:
     float: The piece value awareness score for the specified color.
     """
-    piece_values = {
-        chess.PAWN: 1,
-        chess.KNIGHT: 3,
-        chess.BISHOP: 3,
-        chess.ROOK: 5,
-        chess.QUEEN: 9,
-        chess.KING: 0  # King value is not counted
-    }
 
+    context = _context(board, context)
     awareness_score = 0
 
     # Evaluate the awareness of each piece's value
-    for piece_type, value in piece_values.items():
-        for square in board.pieces(piece_type, color):
-            piece = board.piece_at(square)
+    for piece_type, value in PIECE_VALUES.items():
+        for square in context.piece_squares[piece_type, color]:
+            piece = context.pieces[square]
             # Reward pieces that are in positions to capture higher value pieces
-            opponents = board.pieces(piece_type, not color)
+            opponents = context.piece_squares[piece_type, not color]
             for opp_square in opponents:
                 if piece and opp_square:
-                    opp_piece = board.piece_at(opp_square)
+                    opp_piece = context.pieces[opp_square]
                     if opp_piece:
                         # Weight captures based on the relative value of the pieces
-                        awareness_score += piece_values[opp_piece.piece_type] - piece_values[piece.piece_type]
+                        awareness_score += PIECE_VALUES[opp_piece.piece_type] - PIECE_VALUES[piece.piece_type]
                         
                         # Reward pieces that are central or control key squares
-                        if opp_square in [chess.D4, chess.E4, chess.D5, chess.E5]:
+                        if chess.BB_SQUARES[opp_square] & BB_CENTER:
                             awareness_score += 0.5
                         # Penalize pieces that are less active or restricted in mobility
                         if piece.piece_type == chess.KNIGHT:
                             # Penalize knights on the edge of the board
-                            if opp_square in [chess.A1, chess.A8, chess.H1, chess.H8]:
+                            if chess.BB_SQUARES[opp_square] & chess.BB_CORNERS:
                                 awareness_score -= 0.5
                         elif piece.piece_type == chess.BISHOP:
                             # Penalize bishops blocked by their own pawns
@@ -658,15 +1174,15 @@ def calculate_piece_value_awareness(board, color):
                                 awareness_score -= 0.5
                         elif piece.piece_type == chess.QUEEN:
                             # Reward queens in central squares
-                            if square in [chess.D4, chess.E4, chess.D5, chess.E5]:
+                            if chess.BB_SQUARES[square] & BB_CENTER:
                                 awareness_score += 1
                             # Penalize queens overextended or exposed to attacks
-                            if board.is_attacked_by(not color, square):
+                            if context.attackers[not color][square]:
                                 awareness_score -= 1
 
     return awareness_score
 
-def calculate_rook_coordination(board, color):
+def calculate_rook_coordination(board, color, context=None):
     """
     Calculate the coordination of rooks for the given color on the board, considering various factors.
 
@@ -677,14 +1193,13 @@ def calculate_rook_coordination(board, color):
     Returns:
     float: The coordination score for rooks of the specified color.
     """
+    context = _context(board, context)
+    pieces = context.pieces
     coordination_score = 0
 
-    # Define squares where rooks can be ideally placed for coordination
-    ideal_rook_squares = [chess.square(2, 0), chess.square(5, 0), chess.square(2, 7), chess.square(5, 7)]
-
     # Evaluate coordination based on the presence of rooks on ideal squares
-    for square in ideal_rook_squares:
-        piece = board.piece_at(square)
+    for square in IDEAL_ROOK_SQUARES:
+        piece = pieces[square]
         if piece and piece.piece_type == chess.ROOK and piece.color == color:
             coordination_score += 1  # Increment coordination score for each rook on an ideal square
 
@@ -693,7 +1208,7 @@ def calculate_rook_coordination(board, color):
         rook_on_file = False
         for rank in [0, 1, 6, 7]:  # Numeric values for ranks
             square = chess.square(file, rank)
-            piece = board.piece_at(square)
+            piece = pieces[square]
             if piece and piece.piece_type == chess.ROOK and piece.color == color:
                 rook_on_file = True
                 break
@@ -701,27 +1216,25 @@ def calculate_rook_coordination(board, color):
             coordination_score += 0.5  # Increment coordination score for each rook controlling a key file
 
     # Consider support for pawn breaks
-    pawn_break_squares = [chess.B4, chess.C4, chess.D4, chess.E4, chess.B5, chess.C5, chess.D5, chess.E5,
-                          chess.B5, chess.C5, chess.D5, chess.E5, chess.B6, chess.C6, chess.D6, chess.E6,
-                          chess.B3, chess.C3, chess.D3, chess.E3, chess.B6, chess.C6, chess.D6, chess.E6]
-    for square in pawn_break_squares:
-        piece = board.piece_at(square)
+    for square in ROOK_PAWN_BREAK_SQUARES:
+        piece = pieces[square]
         if piece and piece.piece_type == chess.PAWN and piece.color == color:
             coordination_score += 0.2  # Increment coordination score for each rook supporting a potential pawn break
 
     # Consider the potential to create threats
-    for move in board.legal_moves:
-        if move.piece == chess.ROOK and move.from_square in ideal_rook_squares:
+    for move in context.legal_moves:
+        moving_piece = pieces[move.from_square]
+        if moving_piece.piece_type == chess.ROOK and chess.BB_SQUARES[move.from_square] & BB_IDEAL_ROOK_SQUARES:
             coordination_score += 0.5  # Increment coordination score for each rook threatening an opponent's piece
 
     # Consider rook safety
-    for square in ideal_rook_squares:
-        if board.is_attacked_by(not color, square):
+    for square in IDEAL_ROOK_SQUARES:
+        if context.attackers[not color][square]:
             coordination_score -= 0.5  # Decrement coordination score if rook is under threat
 
     return coordination_score
 
-def calculate_threat_coordination(board, color):
+def calculate_threat_coordination(board, color, context=None):
     """
     Calculate the coordination of threats for the given color on the board.
 
@@ -732,24 +1245,25 @@ def calculate_threat_coordination(board, color):
     Returns:
     float: The threat coordination score for the specified color.
     """
+    context = _context(board, context)
     threat_coordination_score = 0
 
     # Factor 1: Piece activity and control over key squares
     for piece_type in [chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN]:
-        for square in board.pieces(piece_type, color):
+        for square in context.piece_squares[piece_type, color]:
             # Increase score for pieces in the center or controlling key squares
-            if square in [chess.D4, chess.E4, chess.D5, chess.E5]:
+            if chess.BB_SQUARES[square] & BB_CENTER:
                 threat_coordination_score += 0.5
-            elif square in [chess.C4, chess.F4, chess.C5, chess.F5]:
+            elif chess.BB_SQUARES[square] & BB_CENTER_FLANKS:
                 threat_coordination_score += 0.3
-            elif square in [chess.D3, chess.E3, chess.D6, chess.E6]:
+            elif chess.BB_SQUARES[square] & BB_CENTER_FRONTS:
                 threat_coordination_score += 0.3
 
     # Factor 2: Evaluation of pawn structures supporting piece coordination
     for file in range(8):
         for rank in range(8):
             square = chess.square(file, rank)
-            if board.piece_at(square) == chess.PAWN and board.color_at(square) == color:
+            if context.pieces[square] == chess.PAWN and board.color_at(square) == color:
                 # Add score for pawns supporting pieces in the center or key squares
                 if chess.square_file(square) in [2, 3, 4, 5] and chess.square_rank(square) in [3, 4, 5, 6]:
                     threat_coordination_score += 0.2
@@ -762,7 +1276,7 @@ def calculate_threat_coordination(board, color):
 
     return threat_coordination_score
 
-def calculate_utilization_of_initiative(board, color):
+def calculate_utilization_of_initiative(board, color, context=None):
     """
     Calculate the utilization of initiative for the given color on the board.
 
@@ -773,52 +1287,51 @@ def calculate_utilization_of_initiative(board, color):
     Returns:
     float: The utilization of initiative score for the specified color.
     """
+    context = _context(board, context)
+    pieces = context.pieces
+    attackers = context.attackers[color]
     initiative_score = 0
 
     # Evaluate piece activity and coordination
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
-        if piece and piece.color == color:
-            legal_moves = len(list(board.legal_moves))
-            initiative_score += legal_moves * 0.1  # Increment score based on legal moves
-            
-            # Check if the piece is well-coordinated with other pieces
-            piece_coordination = 0
-            for other_square in chess.SQUARES:
-                other_piece = board.piece_at(other_square)
-                if other_piece and other_piece.color == color and other_piece != piece:
-                    piece_coordination += 0.1  # Increment score for each well-coordinated piece
-            initiative_score += piece_coordination
+    legal_moves = len(context.legal_moves)
+    for square in context.squares[color]:
+        piece = pieces[square]
+        initiative_score += legal_moves * 0.1  # Increment score based on legal moves
+        
+        # Check if the piece is well-coordinated with other pieces
+        piece_coordination = 0
+        for other_square in context.squares[color]:
+            if pieces[other_square] != piece:
+                piece_coordination += 0.1  # Increment score for each well-coordinated piece
+        initiative_score += piece_coordination
 
     # Evaluate threats to opponent's pieces and king safety
     opponent_color = not color
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
-        if piece and piece.color == opponent_color:
-            if board.is_attacked_by(color, square):
-                initiative_score += 0.5  # Increase score for threatening opponent pieces
-            if board.is_attacked_by(color, chess.E8 if color == chess.WHITE else chess.E1):
-                initiative_score += 1  # Increase score for attacking opponent king
+    king_attacked = attackers[chess.E8 if color == chess.WHITE else chess.E1]
+    for square in context.squares[opponent_color]:
+        if attackers[square]:
+            initiative_score += 0.5  # Increase score for threatening opponent pieces
+        if king_attacked:
+            initiative_score += 1  # Increase score for attacking opponent king
 
     # Evaluate control of center and development advantage
-    center_squares = [chess.D4, chess.E4, chess.D5, chess.E5]
-    for square in center_squares:
-        piece = board.piece_at(square)
+    for square in chess.scan_forward(BB_CENTER):
+        piece = pieces[square]
         if piece and piece.color == color:
             initiative_score += 0.5  # Increment score for controlling the center
 
     # Evaluate tempo and pawn structure
+    # After any move it is the other side's turn, so every legal move gains
+    # tempo for the color that is not to move
     tempo = 0
-    for move in board.legal_moves:
-        board.push(move)
-        if board.turn == color:
+    if board.turn != color:
+        for move in context.legal_moves:
             tempo += 0.1  # Increment score for gaining tempo
-        board.pop()
     initiative_score += tempo
 
     return initiative_score
 
-def calculate_color_coordination(board, color):
+def calculate_color_coordination(board, color, context=None):
     """
     Calculate the coordination among the pieces of a given color on the board.
 
@@ -829,73 +1342,61 @@ def calculate_color_coordination(board, color):
     Returns:
     float: The coordination score for the specified color.
     """
-    # Piece values for weighting coordination
-    piece_values = {
-        chess.PAWN: 1,
-        chess.KNIGHT: 3,
-        chess.BISHOP: 3,
-        chess.ROOK: 5,
-        chess.QUEEN: 9,
-        chess.KING: 0
-    }
-
-    # Center squares
-    center_squares = [chess.D4, chess.D5, chess.E4, chess.E5]
 
-    # Key squares for control (example: 4th to 6th ranks)
-    key_squares = list(chess.SquareSet(chess.BB_RANK_4 | chess.BB_RANK_5 | chess.BB_RANK_6))
+    context = _context(board, context)
+    pieces = context.pieces
+    own_squares = context.squares[color]
 
     # Calculate the coordination score
     coordination_score = 0
 
     # Iterate over all squares on the board
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
+    for square in own_squares:
+        piece = pieces[square]
         if piece and piece.color == color:
             piece_type = piece.piece_type
-            piece_value = piece_values[piece_type]
+            piece_value = PIECE_VALUES[piece_type]
 
             # Get all the squares attacked by the piece
-            attacks = board.attacks(square)
+            attacks = context.attacks[square]
 
-            for target_square in attacks:
-                target_piece = board.piece_at(target_square)
+            for target_square in chess.scan_forward(attacks & board.occupied_co[color]):
+                target_piece = pieces[target_square]
 
                 # Check if the target square is occupied by a friendly piece
                 if target_piece and target_piece.color == color:
-                    target_piece_value = piece_values[target_piece.piece_type]
+                    target_piece_value = PIECE_VALUES[target_piece.piece_type]
 
                     # Add to the coordination score based on piece values
                     coordination_score += piece_value * target_piece_value
 
             # Add proximity factor (pieces closer to each other coordinate better)
-            for other_square in chess.SQUARES:
-                other_piece = board.piece_at(other_square)
-                if other_piece and other_piece.color == color and other_square != square:
-                    distance = chess.square_distance(square, other_square)
+            for other_square in own_squares:
+                if other_square != square:
+                    distance = SQUARE_DISTANCES[square][other_square]
                     proximity_factor = 1 / (distance + 1)
                     coordination_score += piece_value * proximity_factor
 
             # Add centralization factor
-            if square in center_squares:
+            if chess.BB_SQUARES[square] & BB_CENTER:
                 coordination_score += piece_value * 0.5
 
-            # Add control of key squares
-            if square in key_squares:
+            # Add control of key squares (4th to 6th ranks)
+            if chess.BB_SQUARES[square] & BB_KEY_RANKS:
                 coordination_score += piece_value * 0.3
 
             # Add piece activity (more active pieces contribute more)
-            activity_factor = len(attacks) / 8.0
+            activity_factor = chess.popcount(attacks) / 8.0
             coordination_score += piece_value * activity_factor
 
     # Normalize the coordination score based on the number of pieces
-    num_pieces = len([piece for piece in board.piece_map().values() if piece.color == color])
+    num_pieces = len(own_squares)
     if num_pieces > 1:
         coordination_score /= num_pieces
 
     return coordination_score
 
-def calculate_central_support(board, color):
+def calculate_central_support(board, color, context=None):
     """
     Calculate the central support for the given color on the board.
 
@@ -906,69 +1407,51 @@ def calculate_central_support(board, color):
     Returns:
     float: The central support score for the specified color.
     """
-    # Piece values for weighting central support
-    piece_values = {
-        chess.PAWN: 1,
-        chess.KNIGHT: 3,
-        chess.BISHOP: 3,
-        chess.ROOK: 5,
-        chess.QUEEN: 9,
-        chess.KING: 0
-    }
-
-    # Central squares and their weights (strategic importance)
-    central_squares = {
-        chess.D4: 1.5,
-        chess.D5: 1.5,
-        chess.E4: 1.5,
-        chess.E5: 1.5,
-        chess.C4: 1.0,
-        chess.C5: 1.0,
-        chess.F4: 1.0,
-        chess.F5: 1.0
-    }
 
+    context = _context(board, context)
+    pieces = context.pieces
     central_support_score = 0
 
-    for square, weight in central_squares.items():
+    for square, weight in CENTRAL_SQUARE_WEIGHTS.items():
         # Check which pieces control the central square
-        attackers = board.attackers(color, square)
-        defenders = board.attackers(not color, square)
+        attackers = list(chess.scan_forward(context.attackers[color][square]))
+        defenders = list(chess.scan_forward(context.attackers[not color][square]))
 
         # Calculate control of central square
         for attacker_square in attackers:
-            piece = board.piece_at(attacker_square)
+            piece = pieces[attacker_square]
             if piece and piece.color == color:
                 piece_type = piece.piece_type
-                piece_value = piece_values[piece_type]
+                piece_value = PIECE_VALUES[piece_type]
                 # Add distance factor (closer pieces have more influence)
-                distance_factor = 1 / (1 + chess.square_distance(attacker_square, square))
+                distance_factor = 1 / (1 + SQUARE_DISTANCES[attacker_square][square])
                 central_support_score += piece_value * weight * distance_factor
 
         # Calculate defense of central square
         for defender_square in defenders:
-            piece = board.piece_at(defender_square)
+            piece = pieces[defender_square]
             if piece and piece.color == color:
                 piece_type = piece.piece_type
-                piece_value = piece_values[piece_type]
+                piece_value = PIECE_VALUES[piece_type]
                 # Add distance factor (closer pieces have more influence)
-                distance_factor = 1 / (1 + chess.square_distance(defender_square, square))
+                distance_factor = 1 / (1 + SQUARE_DISTANCES[defender_square][square])
                 central_support_score += piece_value * weight * distance_factor * 0.5  # Defending is less valuable than controlling
 
         # Add piece coordination factor
         for attacker_square in attackers:
             for other_attacker_square in attackers:
                 if attacker_square != other_attacker_square:
-                    piece1 = board.piece_at(attacker_square)
-                    piece2 = board.piece_at(other_attacker_square)
+                    piece1 = pieces[attacker_square]
+                    piece2 = pieces[other_attacker_square]
                     if piece1 and piece2 and piece1.color == color and piece2.color == color:
                         # Add coordination value based on the types of pieces
-                        coord_value = (piece_values[piece1.piece_type] + piece_values[piece2.piece_type]) * 0.1
+                        coord_value = (PIECE_VALUES[piece1.piece_type] + PIECE_VALUES[piece2.piece_type]) * 0.1
                         central_support_score += coord_value
 
     return central_support_score
 
-def calculate_key_square_control(board, color):
+@_memoized
+def calculate_key_square_control(board, color, context=None):
     """
     Calculate the control over key squares for a given board and color.
     
@@ -979,95 +1462,82 @@ def calculate_key_square_control(board, color):
     Returns:
     float: The control score for the specified color.
     """
-    # Define key squares with weights based on strategic importance
-    key_squares = {
-        chess.E4: 1.0, chess.D4: 1.0, chess.E5: 1.0, chess.D5: 1.0,  # Central squares
-        chess.F2: 0.5, chess.G2: 0.5, chess.F3: 0.5, chess.G3: 0.5,  # Squares near white king
-        chess.F7: 0.5, chess.G7: 0.5, chess.F6: 0.5, chess.G6: 0.5,  # Squares near black king
-        chess.C4: 0.8, chess.C5: 0.8, chess.F4: 0.8, chess.F5: 0.8,  # Important pawn break squares
-        chess.D3: 0.7, chess.D6: 0.7, chess.E3: 0.7, chess.E6: 0.7,  # Near center control squares
-    }
-    
-    # Piece weights
-    piece_weights = {
-        chess.PAWN: 0.1,
-        chess.KNIGHT: 0.3,
-        chess.BISHOP: 0.3,
-        chess.ROOK: 0.5,
-        chess.QUEEN: 0.9,
-        chess.KING: 0.2
-    }
-    
+    context = _context(board, context)
+    pieces = context.pieces
     control_score = 0
     
-    for square, square_weight in key_squares.items():
+    for square, square_weight in KEY_SQUARE_WEIGHTS.items():
         # Get attackers for the square from both colors
-        attackers_white = board.attackers(chess.WHITE, square)
-        attackers_black = board.attackers(chess.BLACK, square)
+        attackers_white = context.attackers[chess.WHITE][square]
+        attackers_black = context.attackers[chess.BLACK][square]
         
         # Calculate control by white pieces
         if color == chess.WHITE:
-            for attacker in attackers_white:
-                piece = board.piece_at(attacker)
-                control_score += piece_weights[piece.piece_type] * square_weight
+            for attacker in chess.scan_forward(attackers_white):
+                piece = pieces[attacker]
+                control_score += KEY_SQUARE_PIECE_WEIGHTS[piece.piece_type] * square_weight
         
         # Calculate control by black pieces
         if color == chess.BLACK:
-            for attacker in attackers_black:
-                piece = board.piece_at(attacker)
-                control_score += piece_weights[piece.piece_type] * square_weight
+            for attacker in chess.scan_forward(attackers_black):
+                piece = pieces[attacker]
+                control_score += KEY_SQUARE_PIECE_WEIGHTS[piece.piece_type] * square_weight
     
     return control_score
 
-def calculate_mobility_bonus(board, piece, square):
+def calculate_mobility_bonus(board, piece, square, context=None):
     """
     Calculate a mobility bonus for a piece based on potential future mobility.
     """
+    context = _context(board, context)
+    mobility = chess.popcount(context.attacks[square])
     mobility_bonus = 0
     
     # Check if the piece is a knight
     if piece.piece_type == chess.KNIGHT:
         # Knights have high mobility potential, especially if they control many empty squares around them
-        mobility_bonus += len(list(board.attacks(square))) * 0.1
+        mobility_bonus += mobility * 0.1
         
     # Check if the piece is a bishop
     elif piece.piece_type == chess.BISHOP:
         # Bishops have higher mobility potential if they control long diagonals
-        mobility_bonus += len(list(board.attacks(square))) * 0.05
+        mobility_bonus += mobility * 0.05
     
     # Check if the piece is a rook
     elif piece.piece_type == chess.ROOK:
         # Rooks have higher mobility potential if they control open files or ranks
-        mobility_bonus += len(list(board.attacks(square))) * 0.03
+        mobility_bonus += mobility * 0.03
     
     # Check if the piece is a queen
     elif piece.piece_type == chess.QUEEN:
         # Queens have high mobility potential, especially if they control many squares around them
-        mobility_bonus += len(list(board.attacks(square))) * 0.07
+        mobility_bonus += mobility * 0.07
     
     # Check if the piece is a pawn
     elif piece.piece_type == chess.PAWN:
         # Pawns have limited mobility, but if they have the potential to advance, they gain a mobility bonus
         if piece.color == chess.WHITE:
-            if square in list(chess.SquareSet(chess.BB_RANK_4)):
+            if chess.BB_SQUARES[square] & chess.BB_RANK_4:
                 mobility_bonus += 0.5
         else:
-            if square in list(chess.SquareSet(chess.BB_RANK_5)):
+            if chess.BB_SQUARES[square] & chess.BB_RANK_5:
                 mobility_bonus += 0.5
     
     return mobility_bonus
 
-def evaluate_piece_activity_and_coordination(board):
+@_memoized
+def evaluate_piece_activity_and_coordination(board, context=None):
     """
     Evaluate the activity and coordination of pieces on the board.
     Higher scores indicate better activity and coordination among pieces.
     """
+    context = _context(board, context)
     white_activity = 0
     black_activity = 0
     
     # Iterate through all squares
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
+    for square in chess.scan_forward(board.occupied):
+        piece = context.pieces[square]
         if piece:
             # Calculate activity value based on piece mobility and coordination
             activity_value = 1
@@ -1094,7 +1564,8 @@ def evaluate_piece_activity_and_coordination(board):
     
     return white_activity - black_activity
 
-def evaluate_defensive_offensive_tactics(board):
+@_memoized
+def evaluate_defensive_offensive_tactics(board, context=None):
     """
     Evaluate the balance between defensive and offensive tactics.
     
@@ -1107,20 +1578,22 @@ def evaluate_defensive_offensive_tactics(board):
     
     Higher positive scores indicate a stronger offensive position, while higher negative scores indicate a stronger defensive position.
     """
+    context = _context(board, context)
+
     # Evaluate defensive tactics
-    defensive_score = evaluate_defensive_tactics(board)
+    defensive_score = evaluate_defensive_tactics(board, context)
     
     # Evaluate offensive tactics
-    offensive_score = evaluate_offensive_tactics(board)
+    offensive_score = evaluate_offensive_tactics(board, context)
     
     # Evaluate pawn structure around kings
-    pawn_structure_score = evaluate_pawn_structure(board)
+    pawn_structure_score = evaluate_pawn_structure(board, context)
     
     # Evaluate control of center squares
-    center_control_score = evaluate_center_control(board)
+    center_control_score = evaluate_center_control(board, context)
     
     # Evaluate piece activity and mobility
-    piece_activity_score = evaluate_piece_activity(board)
+    piece_activity_score = evaluate_piece_activity(board, context)
     
     # Combine scores with weights
     total_score = offensive_score * 0.4 - defensive_score * 0.3 + pawn_structure_score * 0.1 + center_control_score * 0.1 + piece_activity_score * 0.1
@@ -1131,12 +1604,7 @@ def is_open_file(board, square):
     """
     Check if the file of the given square is open (no pawns).
     """
-    file = chess.square_file(square)
-    for rank in range(8):
-        if board.piece_at(chess.square(file, rank)) is not None and \
-           board.piece_at(chess.square(file, rank)).piece_type == chess.PAWN:
-            return False
-    return True
+    return not board.pawns & chess.BB_FILES[chess.square_file(square)]
  
 def is_open_diagonal(board, square):
     """
@@ -1149,31 +1617,14 @@ def is_open_diagonal(board, square):
     Returns:
     - True if the diagonal is open, False otherwise.
     """
-    file, rank = chess.square_file(square), chess.square_rank(square)
-    directions = [(1, 1), (1, -1), (-1, 1), (-1, -1)]  # Directions for the four diagonals
-    for direction in directions:
-        file_dir, rank_dir = direction
-        file_pos, rank_pos = file + file_dir, rank + rank_dir
-        while 0 <= file_pos < 8 and 0 <= rank_pos < 8:
-            if board.piece_at(chess.square(file_pos, rank_pos)):
-                # If there is a piece on any square of the diagonal, the diagonal is not open
-                return False
-            file_pos += file_dir
-            rank_pos += rank_dir
-    return True
+    # If there is a piece on any square of the diagonal, the diagonal is not open
+    return not board.occupied & BB_DIAGONALS[square] & ~chess.BB_SQUARES[square]
 
 def piece_value_for_material_balance(piece):
     """
     Get the value of a chess piece.
     """
-    values = {
-        chess.PAWN: 1,
-        chess.KNIGHT: 3,
-        chess.BISHOP: 3,
-        chess.ROOK: 5,
-        chess.QUEEN: 9
-    }
-    return values.get(piece.piece_type, 0) * (1 if piece.color == chess.WHITE else -1)
+    return PIECE_VALUES[piece.piece_type] * (1 if piece.color == chess.WHITE else -1)
 
 def evaluate_pawn_structure_score(board, color):
     """
@@ -1191,112 +1642,51 @@ def evaluate_pawn_structure_score(board, color):
         chess.BLACK: [1, 2, 3, 4, 5]
     }
 
+    # Pawns of either color on a rank are scored, against the structure of the given color
+    own_pieces = board.occupied_co[color]
     for rank in pawn_ranks[color]:
-        for file in range(8):
-            square = chess.square(file, rank)
-            piece = board.piece_at(square)
-            if piece and piece.piece_type == chess.PAWN:
-                # Check for isolated pawns
-                isolated_pawns = 0
-                if is_isolated_pawn(board, color, square):
-                    isolated_pawns = 1
+        pawns_on_rank = board.pawns & chess.BB_RANKS[rank]
+        if not pawns_on_rank:
+            continue
 
-                # Check for doubled pawns
-                doubled_pawns = count_doubled_pawns(board, color, rank)
+        # Check for isolated pawns
+        isolated_pawns = chess.popcount(pawns_on_rank & ~_horizontal_neighbours(own_pieces))
 
-                # Check for backward pawns
-                backward_pawns = count_backward_pawns(board, color, rank)
+        # Check for doubled pawns
+        doubled_pawns = count_doubled_pawns(board, color, rank)
 
-                pawn_structure_score -= isolated_pawns + doubled_pawns + backward_pawns
+        # Check for backward pawns
+        backward_pawns = count_backward_pawns(board, color, rank)
+
+        pawn_structure_score -= isolated_pawns + chess.popcount(pawns_on_rank) * (doubled_pawns + backward_pawns)
 
     return pawn_structure_score
 
-def calculate_pawn_structure_strength(board, color):
+@_memoized
+def calculate_pawn_structure_strength(board, color, context=None):
     """
     Calculate the pawn structure strength for the specified color.
     """
-    pawn_structure_strength = 0
-    
-    # Evaluate pawn chains
-    pawn_chains = get_pawn_chains(board, color)
-    for chain in pawn_chains:
-        chain_length = len(chain)
-        pawn_structure_strength += chain_length
-    
-    return pawn_structure_strength
+    # Sum of the pawn chain lengths, looked up in the pawn hash table
+    return pawn_hash_table.lookup(board)[color]['pawn_structure_strength']
 
 def get_pawn_chains(board, color):
     """
     Identify and return pawn chains for the given color.
-    """
-    chains = []
-    visited = set()
-
-    def explore_chain(row, col, chain):
-        """
-        Explore pawn chain recursively on the chessboard.
 
-        Args:
-        - row: Current row to explore.
-        - col: Current column to explore.
-        - chain: List to store squares in the chain.
+    A chain is a group of pawns connected through adjacent squares (diagonals,
+    vertical, and horizontal). Chains are ordered by their lowest square and
+    list their squares in ascending order.
+    """
+    return [list(chain) for chain in pawn_hash_table.lookup(board)[color]['pawn_chains']]
 
-        Returns:
-        - None
-        """
-        if not (0 <= row < 8 and 0 <= col < 8):
-            return  # Ensure the square is within the board boundaries
-
-        square_index = row * 8 + col  # Convert (row, col) tuple to single integer index
-
-        if (
-            square_index in visited or
-            not board.piece_at(square_index) or
-            board.piece_at(square_index).piece_type != chess.PAWN or
-            board.piece_at(square_index).color != color
-        ):
-            return
-
-        visited.add(square_index)
-        chain.append(square_index)
-
-        # Define the adjacent squares (diagonals, vertical, and horizontal)
-        adjacent_squares = [
-            (row + dx, col + dy) 
-            for dx in [-1, 0, 1] 
-            for dy in [-1, 0, 1] 
-            if (dx != 0 or dy != 0)
-        ]
-        
-        for adj_row, adj_col in adjacent_squares:
-            explore_chain(adj_row, adj_col, chain)
-
-    # Iterate through all squares on the board
-    for square_index in chess.SQUARES:
-        row, col = divmod(square_index, 8)  # Convert square index to (row, col) tuple
-        if (
-            board.piece_at(square_index) and
-            board.piece_at(square_index).piece_type == chess.PAWN and
-            board.piece_at(square_index).color == color and
-            square_index not in visited
-        ):
-            chain = []
-            explore_chain(row, col, chain)
-            if chain:
-                chains.append(chain)
-
-    return chains
-
-def calculate_pawn_mobility(board, color):
+@_memoized
+def calculate_pawn_mobility(board, color, context=None):
     """
     Calculate the pawn mobility score for the specified color.
     """
-    pawn_mobility = 0
-    
-    for square in board.pieces(chess.PAWN, color):
-        pawn_mobility += len(list(board.attacks(square)))
-    
-    return pawn_mobility
+    # Squares attacked by the pawns, looked up in the pawn hash table
+    return pawn_hash_table.lookup(board)[color]['pawn_mobility']
 
 def calculate_pawn_breaks(board, color):
     """
@@ -1315,7 +1705,8 @@ def calculate_pawn_breaks(board, color):
     
     return pawn_breaks
 
-def evaluate_tactics(board):
+@_memoized
+def evaluate_tactics(board, context=None):
     """
     Evaluate the tactical opportunities and threats on the board.
     
@@ -1334,93 +1725,93 @@ def evaluate_tactics(board):
     Positive scores indicate better tactical opportunities for white,
     negative scores indicate better tactical opportunities for black.
     """
+    context = _context(board, context)
+    pieces = context.pieces
+    white_attackers = context.attackers[chess.WHITE]
+    black_attackers = context.attackers[chess.BLACK]
+
     # Initialize tactic scores
     white_tactics_score = 0
     black_tactics_score = 0
     
     # Count hanging pieces
-    white_hanging_pieces = sum(1 for square in chess.SQUARES if board.piece_at(square) and board.piece_at(square).color == chess.WHITE and board.is_attacked_by(chess.BLACK, square))
-    black_hanging_pieces = sum(1 for square in chess.SQUARES if board.piece_at(square) and board.piece_at(square).color == chess.BLACK and board.is_attacked_by(chess.WHITE, square))
+    white_hanging_pieces = sum(1 for square in context.squares[chess.WHITE] if black_attackers[square])
+    black_hanging_pieces = sum(1 for square in context.squares[chess.BLACK] if white_attackers[square])
     
     # Evaluate forks, pins, skewers, discovered attacks
-    for square in chess.SQUARES:        
-        piece = board.piece_at(square)
+    for square in chess.scan_forward(board.occupied):
+        piece = pieces[square]
         if piece:
-            attackers = board.attackers(not piece.color, square)
-            defenders = board.attackers(piece.color, square)
-            if len(attackers) > 1:
-                if len(defenders) == 0:
+            attackers = chess.popcount(context.attackers[not piece.color][square])
+            defenders_mask = context.attackers[piece.color][square]
+            defenders = chess.popcount(defenders_mask)
+            if attackers > 1:
+                if defenders == 0:
                     if piece.color == chess.WHITE:
                         white_tactics_score += 1  # Fork opportunity
                     else:
                         black_tactics_score += 1
-                elif len(defenders) == 1:
+                elif defenders == 1:
                     if piece.piece_type == chess.KING:
                         if piece.color == chess.WHITE:
                             white_tactics_score += 1  # King in danger of a fork
                         else:
                             black_tactics_score += 1
                     else:
-                        pinned_piece = board.piece_at(defenders.pop())
+                        pinned_piece = pieces[chess.lsb(defenders_mask)]
                         if pinned_piece.piece_type != chess.KING:
                             if piece.color == chess.WHITE:
                                 white_tactics_score += 1  # Pin opportunity
                             else:
                                 black_tactics_score += 1
-            elif len(attackers) == 1 and len(defenders) > 1:
+            elif attackers == 1 and defenders > 1:
                 if piece.color == chess.WHITE:
                     white_tactics_score += 1  # Skewer opportunity
                 else:
                     black_tactics_score += 1
-            elif len(attackers) == 1 and len(defenders) == 0:
+            elif attackers == 1 and defenders == 0:
                 if piece.color == chess.WHITE:
                     white_tactics_score += 1  # Discovered attack opportunity
                 else:
                     black_tactics_score += 1
     
     # Evaluate threats to opponent's pieces and king
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
+    for square in chess.scan_forward(board.occupied):
+        piece = pieces[square]
         if piece and piece.color == chess.WHITE:
-            attackers = board.attackers(chess.BLACK, square)
+            attackers = black_attackers[square]
             if attackers:
-                white_tactics_score += len(attackers)  # Threats to opponent's pieces
-                if board.is_checkmate():
+                white_tactics_score += chess.popcount(attackers)  # Threats to opponent's pieces
+                if context.is_checkmate():
                     white_tactics_score += 10  # Checkmate threat
         elif piece and piece.color == chess.BLACK:
-            attackers = board.attackers(chess.WHITE, square)
+            attackers = white_attackers[square]
             if attackers:
-                black_tactics_score += len(attackers)  # Threats to opponent's pieces
-                if board.is_checkmate():
+                black_tactics_score += chess.popcount(attackers)  # Threats to opponent's pieces
+                if context.is_checkmate():
                     black_tactics_score += 10  # Checkmate threat
     
-    # Evaluate opportunities for captures and checks
-    white_tactics_score += len(list(board.legal_moves))
-    black_tactics_score += len(list(board.legal_moves))
-    
-    # Evaluate defensive and offensive tactics, including deflections, decoys, and interference
-    white_tactics_score += evaluate_defensive_offensive_tactics(board)
-    black_tactics_score += evaluate_defensive_offensive_tactics(board)
-    
-    # Evaluate control of key squares, files, diagonals, and ranks
-    white_tactics_score += evaluate_control_of_key_squares_files_diagonals_ranks(board)
-    black_tactics_score += evaluate_control_of_key_squares_files_diagonals_ranks(board)
-    
-    # Evaluate pawn structures for pawn breaks and weaknesses
-    white_tactics_score += evaluate_pawn_structure(board)
-    black_tactics_score += evaluate_pawn_structure(board)
-    
-    # Evaluate piece activity and coordination
-    white_tactics_score += evaluate_piece_activity_and_coordination(board)
-    black_tactics_score += evaluate_piece_activity_and_coordination(board)
-    
-    # Calculate initiative and tempo
-    white_tactics_score += calculate_initiative_and_tempo(board)
-    black_tactics_score += calculate_initiative_and_tempo(board)
-    
-    # Analyze material imbalances and piece values
-    white_tactics_score += analyze_material_imbalances_and_piece_values(board)
-    black_tactics_score += analyze_material_imbalances_and_piece_values(board)
+    # The following terms score the whole position, so both sides receive the same
+    # value; each is evaluated once and added to both scores
+    shared_scores = [
+        # Opportunities for captures and checks
+        len(context.legal_moves),
+        # Defensive and offensive tactics, including deflections, decoys, and interference
+        evaluate_defensive_offensive_tactics(board, context),
+        # Control of key squares, files, diagonals, and ranks
+        evaluate_control_of_key_squares_files_diagonals_ranks(board, context),
+        # Pawn structures for pawn breaks and weaknesses
+        evaluate_pawn_structure(board, context),
+        # Piece activity and coordination
+        evaluate_piece_activity_and_coordination(board, context),
+        # Initiative and tempo
+        calculate_initiative_and_tempo(board, context),
+        # Material imbalances and piece values
+        analyze_material_imbalances_and_piece_values(board, context)
+    ]
+    for score in shared_scores:
+        white_tactics_score += score
+        black_tactics_score += score
     
     # Calculate tactic scores
     white_tactics_score += white_hanging_pieces
@@ -1432,23 +1823,11 @@ def is_isolated_pawn(board, color, square):
     """
     Check if the pawn at the specified square is isolated.
     """
-    file_idx = chess.square_file(square)
-    rank_idx = chess.square_rank(square)
+    # Check if there are no friendly pieces directly beside the pawn
+    return not board.occupied_co[color] & _horizontal_neighbours(chess.BB_SQUARES[square])
 
-    # Check if there are no friendly pawns on adjacent files
-    if file_idx == 0:
-        right_square = chess.square(file_idx + 1, rank_idx)
-        return not board.piece_at(right_square) or board.piece_at(right_square).color != color
-    elif file_idx == 7:
-        left_square = chess.square(file_idx - 1, rank_idx)
-        return not board.piece_at(left_square) or board.piece_at(left_square).color != color
-    else:
-        left_square = chess.square(file_idx - 1, rank_idx)
-        right_square = chess.square(file_idx + 1, rank_idx)
-        return (not board.piece_at(left_square) or board.piece_at(left_square).color != color) and \
-               (not board.piece_at(right_square) or board.piece_at(right_square).color != color)
-
-def analyze_material_imbalances_and_piece_values(board):
+@_memoized
+def analyze_material_imbalances_and_piece_values(board, context=None):
     """
     Analyze material imbalances and evaluate the relative values of pieces.
     
@@ -1463,36 +1842,38 @@ def analyze_material_imbalances_and_piece_values(board):
     Higher positive scores indicate favorable material imbalances and piece values for white,
     while higher negative scores indicate favorable conditions for black.
     """
+    context = _context(board, context)
     white_material_score = 0
     black_material_score = 0
     
     # 1. Total material count for each side
-    white_material_score += calculate_total_material(board, chess.WHITE)
-    black_material_score += calculate_total_material(board, chess.BLACK)
+    white_material_score += calculate_total_material(board, chess.WHITE, context)
+    black_material_score += calculate_total_material(board, chess.BLACK, context)
     
     # 2. Presence of material imbalances
-    white_material_score += evaluate_material_imbalances(board, chess.WHITE)
-    black_material_score += evaluate_material_imbalances(board, chess.BLACK)
+    white_material_score += evaluate_material_imbalances(board, chess.WHITE, context)
+    black_material_score += evaluate_material_imbalances(board, chess.BLACK, context)
     
     # 3. Evaluation of piece values based on the current board position
-    white_material_score += evaluate_piece_values(board, chess.WHITE)
-    black_material_score += evaluate_piece_values(board, chess.BLACK)
+    white_material_score += evaluate_piece_values(board, chess.WHITE, context)
+    black_material_score += evaluate_piece_values(board, chess.BLACK, context)
     
     # 4. Positional significance of specific pieces
-    white_material_score += evaluate_piece_position(board, chess.WHITE)
-    black_material_score += evaluate_piece_position(board, chess.BLACK)
+    white_material_score += evaluate_piece_position(board, chess.WHITE, context)
+    black_material_score += evaluate_piece_position(board, chess.BLACK, context)
     
     # 5. Potential for piece exchanges and simplification of the position
-    white_material_score += evaluate_piece_exchanges(board, chess.WHITE)
-    black_material_score += evaluate_piece_exchanges(board, chess.BLACK)
+    white_material_score += evaluate_piece_exchanges(board, chess.WHITE, context)
+    black_material_score += evaluate_piece_exchanges(board, chess.BLACK, context)
     
     # 6. Impact of material imbalances on pawn structure and king safety
-    white_material_score += evaluate_material_impact(board, chess.WHITE)
-    black_material_score += evaluate_material_impact(board, chess.BLACK)
+    white_material_score += evaluate_material_impact(board, chess.WHITE, context)
+    black_material_score += evaluate_material_impact(board, chess.BLACK, context)
     
     return white_material_score - black_material_score
 
-def evaluate_material_impact(board, color):
+@_memoized
+def evaluate_material_impact(board, color, context=None):
     """
     Evaluate the impact of material on the board for the given color.
 
@@ -1503,46 +1884,33 @@ def evaluate_material_impact(board, color):
     Returns:
     float: The evaluation score for material impact.
     """
-    piece_values = {
-        chess.PAWN: 1,
-        chess.KNIGHT: 3,
-        chess.BISHOP: 3,
-        chess.ROOK: 5,
-        chess.QUEEN: 9,
-        chess.KING: 200,
-    }
-
+    context = _context(board, context)
     material_impact_score = 0
 
+    # Pawn structure, piece coordination and king safety do not depend on the piece,
+    # so they are evaluated once for the whole loop
+    pawn_structure_score = evaluate_pawn_structure(board, context)
+    piece_coordination_score = evaluate_piece_coordination(board, context)
+    king_safety_score = evaluate_king_safety(board, color, context)
+
     # Evaluate material impact based on piece mobility, control of key squares, pawn structure, piece coordination, and king safety
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
+    for square in context.squares[color]:
+        piece = context.pieces[square]
         if piece and piece.color == color:
             # Evaluate the mobility of each piece
-            mobility_score = len(board.attacks(square))
+            mobility_score = chess.popcount(context.attacks[square])
             
             # Evaluate the control of key squares
-            control_score = 0
-            for target_square in board.attacks(square):
-                if board.piece_at(target_square) is None:
-                    control_score += 1
-
-            # Evaluate pawn structure
-            pawn_structure_score = evaluate_pawn_structure(board)
-
-            # Evaluate piece coordination
-            piece_coordination_score = evaluate_piece_coordination(board)
-
-            # Evaluate king safety
-            king_safety_score = evaluate_king_safety(board, color)
+            control_score = chess.popcount(context.attacks[square] & ~board.occupied)
 
             # Adjust material impact based on various factors
-            material_impact_score += piece_values[piece.piece_type] + mobility_score + control_score + \
+            material_impact_score += MATERIAL_IMPACT_VALUES[piece.piece_type] + mobility_score + control_score + \
                                       pawn_structure_score + piece_coordination_score + king_safety_score
 
     return material_impact_score
 
-def evaluate_piece_position(board, color):
+@_memoized
+def evaluate_piece_position(board, color, context=None):
     """
     Evaluate the positional advantage of each piece for the given color.
 
@@ -1553,28 +1921,21 @@ def evaluate_piece_position(board, color):
     Returns:
     float: The total positional advantage score for the specified color.
     """
-    piece_position_scores = {
-        chess.PAWN: 1,    # Example scores, adjust as needed
-        chess.KNIGHT: 3,
-        chess.BISHOP: 3,
-        chess.ROOK: 5,
-        chess.QUEEN: 9,
-        chess.KING: 0  # King positional advantage is not considered
-    }
-
+    context = _context(board, context)
     position_score = 0
 
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
+    for square in context.squares[color]:
+        piece = context.pieces[square]
         if piece and piece.color == color:
             piece_type = piece.piece_type
-            position_score += piece_position_scores[piece_type]
+            position_score += PIECE_VALUES[piece_type]  # King positional advantage is not considered
 
             # You can add more complex logic to assign scores based on piece positioning
 
     return position_score
 
-def calculate_initiative_and_tempo(board):
+@_memoized
+def calculate_initiative_and_tempo(board, context=None):
     """
     Evaluate the initiative and tempo in the current board position.
     
@@ -1590,44 +1951,46 @@ def calculate_initiative_and_tempo(board):
     
     Higher scores indicate a stronger initiative and tempo advantage.
     """
+    context = _context(board, context)
     white_initiative_score = 0
     black_initiative_score = 0
     
     # 1. Development advantage and piece activity
-    white_initiative_score += calculate_development_advantage(board, chess.WHITE)
-    black_initiative_score += calculate_development_advantage(board, chess.BLACK)
+    white_initiative_score += calculate_development_advantage(board, chess.WHITE, context)
+    black_initiative_score += calculate_development_advantage(board, chess.BLACK, context)
     
     # 2. Ability to control key squares and lines
-    white_initiative_score += calculate_key_square_control(board, chess.WHITE)
-    black_initiative_score += calculate_key_square_control(board, chess.BLACK)
+    white_initiative_score += calculate_key_square_control(board, chess.WHITE, context)
+    black_initiative_score += calculate_key_square_control(board, chess.BLACK, context)
     
     # 3. Presence of threats and forcing moves
-    white_initiative_score += calculate_threat_presence(board, chess.WHITE)
-    black_initiative_score += calculate_threat_presence(board, chess.BLACK)
+    white_initiative_score += calculate_threat_presence(board, chess.WHITE, context)
+    black_initiative_score += calculate_threat_presence(board, chess.BLACK, context)
     
     # 4. Flexibility in piece placement and future plans
-    white_initiative_score += calculate_flexibility(board, chess.WHITE)
-    black_initiative_score += calculate_flexibility(board, chess.BLACK)
+    white_initiative_score += calculate_flexibility(board, chess.WHITE, context)
+    black_initiative_score += calculate_flexibility(board, chess.BLACK, context)
     
     # 5. King safety and defensive solidity
-    white_initiative_score += evaluate_king_safety(board, chess.WHITE)
-    black_initiative_score += evaluate_king_safety(board, chess.BLACK)
+    white_initiative_score += evaluate_king_safety(board, chess.WHITE, context)
+    black_initiative_score += evaluate_king_safety(board, chess.BLACK, context)
     
     # 6. Pawn structure and potential pawn breaks
     white_initiative_score += evaluate_pawn_structure_score(board, chess.WHITE)
     black_initiative_score += evaluate_pawn_structure_score(board, chess.BLACK)
     
     # 7. Utilization of initiative to dictate the pace of the game
-    white_initiative_score += calculate_utilization_of_initiative(board, chess.WHITE)
-    black_initiative_score += calculate_utilization_of_initiative(board, chess.BLACK)
+    white_initiative_score += calculate_utilization_of_initiative(board, chess.WHITE, context)
+    black_initiative_score += calculate_utilization_of_initiative(board, chess.BLACK, context)
     
     # 8. Tempo advantage in terms of forcing responses from the opponent
-    white_initiative_score += calculate_tempo_advantage(board, chess.WHITE)
-    black_initiative_score += calculate_tempo_advantage(board, chess.BLACK)
+    white_initiative_score += calculate_tempo_advantage(board, chess.WHITE, context)
+    black_initiative_score += calculate_tempo_advantage(board, chess.BLACK, context)
     
     return white_initiative_score - black_initiative_score
 
-def evaluate_piece_exchanges(board, color):
+@_memoized
+def evaluate_piece_exchanges(board, color, context=None):
     """
     Evaluate the potential gains or losses from piece exchanges for the given color.
 
@@ -1638,40 +2001,34 @@ def evaluate_piece_exchanges(board, color):
     Returns:
     float: The evaluation score for potential piece exchanges.
     """
-    piece_values = {
-        chess.PAWN: 1,
-        chess.KNIGHT: 3,
-        chess.BISHOP: 3,
-        chess.ROOK: 5,
-        chess.QUEEN: 9,
-        chess.KING: 0  # The king's value is not counted for total material
-    }
 
+    context = _context(board, context)
+    pieces = context.pieces
     exchange_score = 0
 
     # Iterate over all squares
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
+    for square in context.squares[color]:
+        piece = pieces[square]
         if piece and piece.color == color:
             # Evaluate potential piece exchanges for each piece
-            for target_square in board.attacks(square):
-                target_piece = board.piece_at(target_square)
+            for target_square in chess.scan_forward(context.attacks[square] & board.occupied):
+                target_piece = pieces[target_square]
                 if target_piece:
                     # Calculate the difference in piece values
-                    exchange_value = piece_values[target_piece.piece_type] - piece_values[piece.piece_type]
+                    exchange_value = PIECE_VALUES[target_piece.piece_type] - PIECE_VALUES[piece.piece_type]
                     
                     # Adjust exchange value based on piece mobility and positional advantages
                     if piece.piece_type == chess.PAWN:
                         # Pawns in the center have higher mobility
-                        if square in [chess.D4, chess.E4, chess.D5, chess.E5]:
+                        if chess.BB_SQUARES[square] & BB_CENTER:
                             exchange_value += 0.5
                     elif piece.piece_type == chess.KNIGHT:
                         # Knights in advanced positions are more active
-                        if square in [chess.C6, chess.F6, chess.C3, chess.F3]:
+                        if chess.BB_SQUARES[square] & BB_EXCHANGE_KNIGHT_SQUARES:
                             exchange_value += 0.5
                     elif piece.piece_type == chess.BISHOP:
                         # Bishops controlling key diagonals are more valuable
-                        if square in [chess.B2, chess.G2, chess.B7, chess.G7]:
+                        if chess.BB_SQUARES[square] & BB_EXCHANGE_BISHOP_SQUARES:
                             exchange_value += 0.5
                     elif piece.piece_type == chess.ROOK:
                         # Rooks on open files are more powerful
@@ -1679,14 +2036,15 @@ def evaluate_piece_exchanges(board, color):
                             exchange_value += 1
                     elif piece.piece_type == chess.QUEEN:
                         # Queens in central squares exert more influence
-                        if square in [chess.D4, chess.E4, chess.D5, chess.E5]:
+                        if chess.BB_SQUARES[square] & BB_CENTER:
                             exchange_value += 1
                     
                     exchange_score += exchange_value
 
     return exchange_score
 
-def evaluate_piece_values(board, color):
+@_memoized
+def evaluate_piece_values(board, color, context=None):
     """
     Evaluate the worth of each piece based on its location for the given color on the board.
 
@@ -1697,27 +2055,21 @@ def evaluate_piece_values(board, color):
     Returns:
     float: The total value of pieces based on their location.
     """
-    piece_values = {
-        chess.PAWN: 1,
-        chess.KNIGHT: 3,
-        chess.BISHOP: 3,
-        chess.ROOK: 5,
-        chess.QUEEN: 9,
-        chess.KING: 0  # The king's value is not counted for total material
-    }
 
+    context = _context(board, context)
     total_value = 0
 
     # Evaluate the worth of each piece based on its location
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
+    for square in context.squares[color]:
+        piece = context.pieces[square]
         if piece and piece.color == color:
             piece_type = piece.piece_type
-            total_value += piece_values[piece_type]
+            total_value += PIECE_VALUES[piece_type]
 
     return total_value
 
-def evaluate_material_imbalances(board, color):
+@_memoized
+def evaluate_material_imbalances(board, color, context=None):
     """
     Evaluate material imbalances for the given color on the board.
 
@@ -1728,25 +2080,20 @@ def evaluate_material_imbalances(board, color):
     Returns:
     float: The material imbalance score for the specified color.
     """
-    piece_values = {
-        chess.PAWN: 1,
-        chess.KNIGHT: 3,
-        chess.BISHOP: 3,
-        chess.ROOK: 5,
-        chess.QUEEN: 9,
-        chess.KING: 0
-    }
+
+    context = _context(board, context)
 
     # Calculate total material for both colors
-    total_material_color = calculate_total_material(board, color)
-    total_material_opponent = calculate_total_material(board, not color)
+    total_material_color = calculate_total_material(board, color, context)
+    total_material_opponent = calculate_total_material(board, not color, context)
 
     # Calculate material imbalance score
     material_imbalance = total_material_color - total_material_opponent
 
     return material_imbalance
 
-def calculate_total_material(board, color):
+@_memoized
+def calculate_total_material(board, color, context=None):
     """
     Calculate the total material score for the given color on the board.
 
@@ -1757,25 +2104,18 @@ def calculate_total_material(board, color):
     Returns:
     float: The total material score for the specified color.
     """
-    piece_values = {
-        chess.PAWN: 1,
-        chess.KNIGHT: 3,
-        chess.BISHOP: 3,
-        chess.ROOK: 5,
-        chess.QUEEN: 9,
-        chess.KING: 0
-    }
 
+    context = _context(board, context)
     total_material_score = 0
 
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
+    for square in context.squares[color]:
+        piece = context.pieces[square]
         if piece and piece.color == color:
-            total_material_score += piece_values[piece.piece_type]
+            total_material_score += PIECE_VALUES[piece.piece_type]
 
     return total_material_score
 
-def calculate_tempo_advantage(board, color):
+def calculate_tempo_advantage(board, color, context=None):
     """
     Calculate the tempo advantage for the given color on the board.
 
@@ -1786,13 +2126,15 @@ def calculate_tempo_advantage(board, color):
     Returns:
     float: The tempo advantage score for the specified color.
     """
+    context = _context(board, context)
+    pieces = context.pieces
     tempo_advantage = 0
 
     # Evaluate rapid development and active piece play
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
+    legal_moves = len(context.legal_moves)
+    for square in context.squares[color]:
+        piece = pieces[square]
         if piece and piece.color == color:
-            legal_moves = len(list(board.legal_moves))
             tempo_advantage += legal_moves * 0.1  # Increment score based on legal moves
             
             # Check if the piece is well-placed for rapid development
@@ -1809,8 +2151,8 @@ def calculate_tempo_advantage(board, color):
             
             # Check if the piece is actively involved in threats or control
             active_play = 0
-            for target_square in board.attackers(color, square):
-                if board.piece_at(target_square) and board.piece_at(target_square).color != color:
+            for target_square in chess.scan_forward(context.attackers[color][square]):
+                if pieces[target_square] and pieces[target_square].color != color:
                     active_play += 0.1  # Increment score for threatening opponent pieces
                 else:
                     active_play += 0.05  # Increment score for controlling squares
@@ -1823,7 +2165,7 @@ def calculate_tempo_advantage(board, color):
     
     return tempo_advantage
 
-def calculate_flexibility(board, color):
+def calculate_flexibility(board, color, context=None):
     """
     Calculate the flexibility for the given color on the board.
 
@@ -1834,38 +2176,34 @@ def calculate_flexibility(board, color):
     Returns:
     float: The flexibility score for the specified color.
     """
+    context = _context(board, context)
+    pieces = context.pieces
     flexibility_score = 0
 
     # Evaluate piece mobility and coordination
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
+    for square in context.squares[color]:
+        piece = pieces[square]
         if piece and piece.color == color:
-            mobility = len(board.attacks(square))
+            attacks = context.attacks[square]
+            mobility = chess.popcount(attacks)
             flexibility_score += mobility
 
             # Check piece coordination with same color pieces
-            coordination_bonus = 0
-            for adjacent_square in board.attacks(square):
-                if board.piece_at(adjacent_square) and board.piece_at(adjacent_square).color == color:
-                    coordination_bonus += 0.5  # Increase flexibility for coordinated pieces
+            coordination_bonus = chess.popcount(attacks & board.occupied_co[color]) * 0.5  # Increase flexibility for coordinated pieces
             flexibility_score += coordination_bonus
 
     # Evaluate control of key squares
-    key_squares = [chess.E4, chess.D4, chess.E5, chess.D5]  # Example: Central squares
-    for square in key_squares:
-        if board.piece_at(square) and board.piece_at(square).color == color:
+    for square in chess.scan_forward(BB_CENTER):  # Example: Central squares
+        if pieces[square] and pieces[square].color == color:
             flexibility_score += 1  # Increase flexibility for controlling key squares
 
     # Evaluate pawn structure stability
-    pawns = board.pieces(chess.PAWN, color)
+    pawns = context.piece_squares[chess.PAWN, color]
     for pawn_square in pawns:
-        pawn_file = chess.square_file(pawn_square)
-        adjacent_files = [pawn_file - 1, pawn_file + 1]
-        for file in adjacent_files:
-            if 0 <= file < 8:
-                square = chess.square(file, chess.square_rank(pawn_square))
-                if board.piece_at(square) is None:
-                    flexibility_score += 0.5  # Minor score for potential pawn advances
+        neighbours = BB_ADJACENT_FILES[chess.square_file(pawn_square)] & BB_SQUARE_RANKS[pawn_square]
+        for square in chess.scan_forward(neighbours):
+            if pieces[square] is None:
+                flexibility_score += 0.5  # Minor score for potential pawn advances
 
     return flexibility_score
 
@@ -1873,52 +2211,37 @@ def count_doubled_pawns(board, color, rank):
     """
     Count the number of doubled pawns on the specified rank for the given color.
     """
-    doubled_pawns_count = 0
-    pawn_files = set()  # Keep track of files where pawns are found
-
-    # Find all pawns on the specified rank and record their file positions
-    for file in range(8):
-        piece = board.piece_at(chess.square(file, rank))
-        if piece and piece.piece_type == chess.PAWN and piece.color == color:
-            pawn_files.add(file)
-
-    # Check if there are multiple pawns on the same file
-    for file in pawn_files:
-        # If there is another pawn of the same color on the same file, it's a doubled pawn
-        if sum(1 for f in pawn_files if f == file) > 1:
-            doubled_pawns_count += 1
+    pawns_on_rank = board.pieces_mask(chess.PAWN, color) & chess.BB_RANKS[rank]
 
-    return doubled_pawns_count
+    # A file counts when more than one of the rank's pawns stands on it
+    return sum(1 for file_mask in chess.BB_FILES if chess.popcount(pawns_on_rank & file_mask) > 1)
 
 def count_backward_pawns(board, color, rank):
     """
     Count the number of backward pawns on the specified rank for the given color.
     """
-    backward_pawns_count = 0
+    pawns_on_rank = board.pieces_mask(chess.PAWN, color) & chess.BB_RANKS[rank]
 
-    # Iterate over the files on the specified rank
-    for file in range(8):
-        piece = board.piece_at(chess.square(file, rank))
-        if piece and piece.piece_type == chess.PAWN and piece.color == color:
-            # Check if there is no friendly pawn on an adjacent file and a higher rank
-            if (file == 0 or not board.piece_at(chess.square(file - 1, rank + 1)) or board.piece_at(chess.square(file - 1, rank + 1)).color != color) \
-                and (file == 7 or not board.piece_at(chess.square(file + 1, rank + 1)) or board.piece_at(chess.square(file + 1, rank + 1)).color != color):
-                backward_pawns_count += 1
+    # Check if there is no friendly piece on an adjacent file and a higher rank
+    supported = _horizontal_neighbours(board.occupied_co[color] >> 8)
 
-    return backward_pawns_count
+    return chess.popcount(pawns_on_rank & ~supported)
 
-def evaluate_defensive_activity(board, color):
+@_memoized
+def evaluate_defensive_activity(board, color, context=None):
     """
     Evaluate the defensive activity of the given color on the chessboard.
 
     Higher positive scores indicate stronger defensive activity.
     """
+    context = _context(board, context)
+
     # Initialize defensive activity score
     defensive_activity_score = 0
     
     # Evaluate piece placement and control of key squares
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
+    for square in context.squares[color]:
+        piece = context.pieces[square]
         if piece is not None and piece.color == color:
             # Evaluate the placement of defensive pieces
             piece_value = piece_value_score(piece)
@@ -1949,7 +2272,7 @@ def evaluate_defensive_activity(board, color):
                     defensive_activity_score += 0.5
 
     # Evaluate pawn structure for defensive stability
-    pawn_structure_score = evaluate_pawn_structure(board)
+    pawn_structure_score = evaluate_pawn_structure(board, context)
     defensive_activity_score += pawn_structure_score
 
     return defensive_activity_score
@@ -1974,18 +2297,21 @@ def piece_value_score(piece):
     else:
         return 0
 
-def evaluate_offensive_tactics(board):
+@_memoized
+def evaluate_offensive_tactics(board, context=None):
     """
     Evaluate offensive tactics on the chessboard.
 
     Higher positive scores indicate stronger offensive tactics.
     """
+    context = _context(board, context)
+
     # Initialize offensive tactics score
     offensive_tactics_score = 0
     
     # Evaluate piece activity and control of key squares
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
+    for square in context.squares[board.turn]:
+        piece = context.pieces[square]
         if piece is not None and piece.color == board.turn:
             # Evaluate the activity of offensive pieces
             piece_value = piece_value_score(piece)
@@ -2021,7 +2347,8 @@ def evaluate_offensive_tactics(board):
 
     return offensive_tactics_score
 
-def evaluate_defensive_tactics(board):
+@_memoized
+def evaluate_defensive_tactics(board, context=None):
     """
     Evaluate the defensive tactics of a given chess position.
 
@@ -2034,6 +2361,8 @@ def evaluate_defensive_tactics(board):
 
     Higher positive scores indicate stronger defensive positions.
     """
+    context = _context(board, context)
+
     # Initialize defensive score
     defensive_score = 0
     
@@ -2044,28 +2373,28 @@ def evaluate_defensive_tactics(board):
     king_square = board.king(color)
     
     # Evaluate the presence of pieces defending the king
-    defenders_score = evaluate_defenders(board, king_square, color)
+    defenders_score = evaluate_defenders(board, king_square, color, context)
     defensive_score += defenders_score
     
     # Evaluate the activity of defensive pieces
-    activity_score = evaluate_defensive_activity(board, color)
+    activity_score = evaluate_defensive_activity(board, color, context)
     defensive_score += activity_score
     
     # Evaluate pawn structure around the king
-    pawn_structure_score = evaluate_pawn_structure(board)
+    pawn_structure_score = evaluate_pawn_structure(board, context)
     defensive_score += pawn_structure_score
     
     # Evaluate the safety of the king
-    king_safety_score = evaluate_king_safety(board, color)
+    king_safety_score = evaluate_king_safety(board, color, context)
     defensive_score += king_safety_score
     
     # Evaluate potential threats from the opponent
-    threats_score = evaluate_threats(board, king_square, color)
+    threats_score = evaluate_threats(board, king_square, color, context)
     defensive_score += threats_score
     
     return defensive_score
 
-def calculate_threat_presence(board, color):
+def calculate_threat_presence(board, color, context=None):
     """
     Calculate the threat presence for the given color on the board.
 
@@ -2076,50 +2405,43 @@ def calculate_threat_presence(board, color):
     Returns:
     float: The threat presence score for the specified color.
     """
-    piece_values = {
-        chess.PAWN: 1,
-        chess.KNIGHT: 3,
-        chess.BISHOP: 3,
-        chess.ROOK: 5,
-        chess.QUEEN: 9,
-        chess.KING: 0  # King threats are not considered in terms of material value
-    }
 
+    context = _context(board, context)
+    pieces = context.pieces
+    attackers_masks = context.attackers[color]
     opponent_color = not color
     threat_score = 0
 
     # Evaluate attacked squares
     for square in chess.SQUARES:
-        attackers = board.attackers(color, square)
+        attackers = attackers_masks[square]
         if attackers:
-            for attacker in attackers:
+            for attacker in chess.scan_forward(attackers):
                 threat_score += 0.1  # Minor score for attacking any square
 
     # Evaluate threats to opponent pieces
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
+    for square in context.squares[opponent_color]:
+        piece = pieces[square]
         if piece and piece.color == opponent_color:
-            attackers = board.attackers(color, square)
+            attackers = attackers_masks[square]
             if attackers:
-                for attacker in attackers:
-                    threat_score += piece_values[piece.piece_type] * 0.2  # Higher score for threatening valuable pieces
+                for attacker in chess.scan_forward(attackers):
+                    threat_score += PIECE_VALUES[piece.piece_type] * 0.2  # Higher score for threatening valuable pieces
 
     # Evaluate potential tactics (forks, pins, skewers)
-    for move in board.legal_moves:
+    for move in context.legal_moves:
         if board.color_at(move.from_square) == color:
-            board.push(move)
-            if board.is_check():
+            if _gives_check(board, move):
                 threat_score += 2  # Significant score for giving check
-            board.pop()
 
-            if board.is_attacked_by(color, move.to_square):
-                attacking_piece = board.piece_at(move.to_square)
+            if attackers_masks[move.to_square]:
+                attacking_piece = pieces[move.to_square]
                 if attacking_piece and attacking_piece.piece_type in [chess.KNIGHT, chess.ROOK, chess.QUEEN]:
                     threat_score += 1  # Significant score for tactical threats
 
     return threat_score
 
-def calculate_development_advantage(board, color):
+def calculate_development_advantage(board, color, context=None):
     """
     Calculate the development advantage for the given color on the board.
 
@@ -2130,58 +2452,40 @@ def calculate_development_advantage(board, color):
     Returns:
     float: The development advantage score for the specified color.
     """
-    piece_values = {
-        chess.KNIGHT: 3,
-        chess.BISHOP: 3,
-        chess.ROOK: 5,
-        chess.QUEEN: 9,
-        chess.KING: 0
-    }
-
-    development_squares = {
-        chess.KNIGHT: [chess.D2, chess.D7, chess.E2, chess.E7, chess.C3, chess.C6, chess.F3, chess.F6],
-        chess.BISHOP: [chess.C1, chess.F1, chess.C8, chess.F8, chess.B2, chess.G2, chess.B7, chess.G7],
-        chess.ROOK: [chess.A1, chess.H1, chess.A8, chess.H8],
-        chess.QUEEN: [chess.D1, chess.D8],
-        chess.KING: [chess.C1, chess.G1, chess.C8, chess.G8]
-    }
-
-    open_file_squares = [
-        chess.A1, chess.A8, chess.B1, chess.B8, chess.C1, chess.C8, chess.D1, chess.D8, chess.E1, chess.E8, chess.F1, chess.F8, chess.G1, chess.G8, chess.H1, chess.H8
-    ]
-
+    context = _context(board, context)
+    pieces = context.pieces
     development_score = 0
 
     # Evaluate piece development
     for piece_type in [chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN]:
-        for square in development_squares[piece_type]:
-            piece = board.piece_at(square)
+        for square in DEVELOPMENT_SQUARES[piece_type]:
+            piece = pieces[square]
             if piece and piece.piece_type == piece_type and piece.color == color:
                 if piece_type in [chess.KNIGHT, chess.BISHOP]:
-                    development_score += piece_values[piece_type] * 0.5  # Partially developed
+                    development_score += PIECE_VALUES[piece_type] * 0.5  # Partially developed
                 else:
-                    development_score += piece_values[piece_type]  # Fully developed
+                    development_score += PIECE_VALUES[piece_type]  # Fully developed
 
     # Evaluate rook activation on open or semi-open files
-    for square in open_file_squares:
-        piece = board.piece_at(square)
+    for square in BACK_RANK_SQUARES:
+        piece = pieces[square]
         if piece and piece.piece_type == chess.ROOK and piece.color == color:
             if is_open_file(board, chess.square_file(square)):
-                development_score += piece_values[chess.ROOK] * 1.5
+                development_score += PIECE_VALUES[chess.ROOK] * 1.5
             elif is_semi_open_file(board, color, chess.square_file(square)):
-                development_score += piece_values[chess.ROOK] * 1.0
+                development_score += PIECE_VALUES[chess.ROOK] * 1.0
 
     # Evaluate king safety (castling)
-    if board.turn == color and any(move.castling() for move in board.legal_moves):
+    if board.turn == color and any(board.is_castling(move) for move in context.legal_moves):
         development_score += 5  # Safe castling bonus
 
     # Evaluate piece coordination
-    pieces = list(board.pieces(chess.KNIGHT, color)) + list(board.pieces(chess.BISHOP, color))
-    for i, piece1 in enumerate(pieces):
-        for j, piece2 in enumerate(pieces):
+    minor_pieces = context.piece_squares[chess.KNIGHT, color] + context.piece_squares[chess.BISHOP, color]
+    for i, piece1 in enumerate(minor_pieces):
+        for j, piece2 in enumerate(minor_pieces):
             if i < j:
                 # Add coordination value based on the types of pieces
-                coord_value = (piece_values[board.piece_type_at(piece1)] + piece_values[board.piece_type_at(piece2)]) * 0.1
+                coord_value = (PIECE_VALUES[pieces[piece1].piece_type] + PIECE_VALUES[pieces[piece2].piece_type]) * 0.1
                 development_score += coord_value
 
     return development_score
@@ -2199,38 +2503,18 @@ def is_semi_open_file(board, color, file):
     bool: True if the file is semi-open for the specified color, False otherwise.
     """
     opposite_color = not color
-    for square in chess.SQUARES:
-        if chess.square_file(square) == file and board.piece_at(square) and board.piece_at(square).color == opposite_color:
-            return False
-    return True
+    return not board.occupied_co[opposite_color] & chess.BB_FILES[file]
 
 def evaluate_pawn_cover(board, king_square):
     """
     Evaluate the pawn cover around the king.
     More pawns providing cover result in a higher score.
     """
-    pawn_cover_score = 0
-    king_file, king_rank = chess.square_file(king_square), chess.square_rank(king_square)
-    
-    # Check the squares surrounding the king
-    for i in range(-1, 2):
-        for j in range(-1, 2):
-            # Skip the king's square
-            if i == 0 and j == 0:
-                continue
-            
-            square = chess.square(king_file + i, king_rank + j)
-            # Ensure the square is on the board
-            if not chess.square_file(square) in range(8) or not chess.square_rank(square) in range(8):
-                continue
-            
-            piece = board.piece_at(square)
-            if piece is not None and piece.color == chess.WHITE and piece.piece_type == chess.PAWN:
-                pawn_cover_score += 1
-    
-    return pawn_cover_score
+    # Count the white pawns on the squares surrounding the king (see BB_PAWN_COVERS)
+    white_pawns = board.pawns & board.occupied_co[chess.WHITE]
+    return chess.popcount(BB_PAWN_COVERS[king_square] & white_pawns)
 
-def evaluate_attackers(board, king_square):
+def evaluate_attackers(board, king_square, context=None):
     """
     Evaluate the presence of attackers near the king.
     
@@ -2239,26 +2523,30 @@ def evaluate_attackers(board, king_square):
     
     Higher scores indicate a higher number of attackers near the king.
     """
+    context = _context(board, context)
+
     # Get squares adjacent to the king
     adjacent_squares = chess.SquareSet(_sliding_attacks(board, king_square))
     
     # Count the number of attackers on adjacent squares
-    attackers_count = sum(1 for square in adjacent_squares if board.is_attacked_by(chess.BLACK, square))
+    attackers_count = sum(1 for square in adjacent_squares if context.attackers[chess.BLACK][square])
     
     return attackers_count
 
-def evaluate_defenders(board, king_square, color):
+def evaluate_defenders(board, king_square, color, context=None):
     """
     Evaluate the presence of pieces defending the king.
 
     Higher positive scores indicate more defenders around the king.
     """
+    context = _context(board, context)
+
     # Initialize defenders score
     defenders_score = 0
     
     # Check for pieces defending the king
-    attackers = board.attackers(not color, king_square)
-    num_defenders = len(attackers)
+    attackers = context.attackers[not color][king_square]
+    num_defenders = chess.popcount(attackers)
     
     # Increase the score based on the number of defenders
     defenders_score += num_defenders
@@ -2269,73 +2557,32 @@ def _sliding_attacks(board, square):
     """
     Calculate the squares attacked by sliding pieces (bishop, rook, queen) from a given square.
     """
-    attacks = chess.SquareSet()
-    piece = board.piece_at(square)
-    
-    if piece is None:
-        return attacks
-    
-    directions = []
-    if piece.piece_type == chess.BISHOP or piece.piece_type == chess.QUEEN:
-        # Bishop directions: diagonals
-        directions.extend([(-1, -1), (-1, 1), (1, -1), (1, 1)])
-    if piece.piece_type == chess.ROOK or piece.piece_type == chess.QUEEN:
-        # Rook directions: vertical and horizontal
-        directions.extend([(-1, 0), (1, 0), (0, -1), (0, 1)])
-    
-    for dx, dy in directions:
-        for i in range(1, 8):
-            f, r = chess.square_file(square) + i * dx, chess.square_rank(square) + i * dy
-            if 0 <= f < 8 and 0 <= r < 8:
-                target_square = chess.square(f, r)
-                attacks.add(target_square)
-                if board.piece_at(target_square) is not None:
-                    break
-            else:
-                break
+    # Other pieces do not slide and attack nothing here
+    if board.piece_type_at(square) not in [chess.BISHOP, chess.ROOK, chess.QUEEN]:
+        return chess.SquareSet()
     
-    return attacks
+    return chess.SquareSet(board.attacks_mask(square))
 
 def evaluate_open_files(board, king_square):
     """
     Evaluate the presence of open files in front of the king.
     Open files increase the vulnerability of the king.
     """
-    open_files_score = 0
     king_file = chess.square_file(king_square)
     
     # Check the files in front of the king
-    for file in range(8):
-        if file != king_file and all(board.piece_at(chess.square(file, rank)) is None for rank in range(8)):
-            open_files_score -= 1
+    empty_files = sum(1 for file, file_mask in enumerate(chess.BB_FILES) if file != king_file and not board.occupied & file_mask)
     
-    return open_files_score
+    return -empty_files
 
 def evaluate_pawn_shield(board, king_square):
     """
     Evaluate the strength of the pawn shield in front of the king.
     A stronger pawn shield provides better protection for the king.
     """
-    pawn_shield_score = 0
-    king_file, king_rank = chess.square_file(king_square), chess.square_rank(king_square)
-    
-    # Check the squares in front of the king
-    front_squares = []
-    for i in range(-1, 2):
-        file_index = king_file + i
-        rank_index = king_rank + 1
-        # Ensure the square is within the board boundaries
-        if 0 <= file_index < 8 and 0 <= rank_index < 8:
-            front_squares.append(chess.square(file_index, rank_index))
-    
-    for square in front_squares:
-        piece_type = board.piece_type_at(square)
-        color = board.color_at(square)
-        
-        if piece_type == chess.PAWN and color == chess.WHITE:
-            pawn_shield_score += 1
-    
-    return pawn_shield_score
+    # Count the white pawns on the squares in front of the king (towards rank 8, for either king)
+    white_pawns = board.pawns & board.occupied_co[chess.WHITE]
+    return chess.popcount(BB_PAWN_SHIELDS[chess.WHITE][king_square] & white_pawns)
 
 def evaluate_king_mobility(board, king_square):
     """
@@ -2345,8 +2592,7 @@ def evaluate_king_mobility(board, king_square):
     king_mobility_score = 0
     
     # Check the squares where the king can move
-    mobility_squares = [square for square in chess.SQUARES if square != king_square and
-                        chess.square_distance(square, king_square) <= 2]
+    mobility_squares = KING_MOBILITY_SQUARES[king_square]
     
     # Limit the maximum number of iterations to avoid potential recursion issues
     max_iterations = min(len(mobility_squares), 5)  # Set a reasonable maximum
@@ -2363,12 +2609,14 @@ def evaluate_king_mobility(board, king_square):
     
     return king_mobility_score
 
-def evaluate_threats(board, king_square, color):
+def evaluate_threats(board, king_square, color, context=None):
     """
     Evaluate potential threats from the opponent.
 
     Higher positive scores indicate more threats to the opponent's king.
     """
+    context = _context(board, context)
+
     # Initialize threats score
     threats_score = 0
     
@@ -2376,15 +2624,15 @@ def evaluate_threats(board, king_square, color):
     opponent_king_square = board.king(not color)
     
     # Evaluate threats to the opponent's king
-    num_attacks = len(board.attacks(opponent_king_square))
+    num_attacks = chess.popcount(context.attacks[opponent_king_square])
     
     # Increase the score based on the number of attacks
     threats_score += num_attacks
     
     # Evaluate the strength and proximity of attacks
-    for attack_square in board.attacks(opponent_king_square):
+    for attack_square in chess.scan_forward(context.attacks[opponent_king_square] & board.occupied):
         # Get the piece attacking the opponent's king
-        attacking_piece = board.piece_at(attack_square)
+        attacking_piece = context.pieces[attack_square]
         if attacking_piece is not None and attacking_piece.color != color:
             # Evaluate the strength of the attacking piece
             piece_value = piece_value_score(attacking_piece)
@@ -2417,7 +2665,8 @@ def piece_value_score(piece):
     else:
         return 0
 
-def evaluate_control_of_key_squares_files_diagonals_ranks(board):
+@_memoized
+def evaluate_control_of_key_squares_files_diagonals_ranks(board, context=None):
     """
     Evaluate the control of key squares, files, diagonals, and ranks.
     
@@ -2426,56 +2675,26 @@ def evaluate_control_of_key_squares_files_diagonals_ranks(board):
     2. Presence of pawns controlling files and diagonals.
     3. Piece activity and positioning.
     """
+    context = _context(board, context)
+    white_pieces = board.occupied_co[chess.WHITE]
+    black_pieces = board.occupied_co[chess.BLACK]
     white_control = 0
     black_control = 0
 
     # Evaluate control of files
-    for file_idx in range(8):
-        file_squares = chess.BB_FILES[file_idx]
-        white_pawns_on_file = sum(1 for sq in chess.SQUARES if (file_squares & chess.BB_SQUARES[sq]) and board.piece_at(sq) == chess.PAWN and board.color_at(sq) == chess.WHITE)
-        black_pawns_on_file = sum(1 for sq in chess.SQUARES if (file_squares & chess.BB_SQUARES[sq]) and board.piece_at(sq) == chess.PAWN and board.color_at(sq) == chess.BLACK)
-        white_control += white_pawns_on_file
-        black_control += black_pawns_on_file
-
-        white_rooks_on_file = sum(1 for sq in chess.SQUARES if (file_squares & chess.BB_SQUARES[sq]) and board.piece_at(sq) == chess.ROOK and board.color_at(sq) == chess.WHITE)
-        black_rooks_on_file = sum(1 for sq in chess.SQUARES if (file_squares & chess.BB_SQUARES[sq]) and board.piece_at(sq) == chess.ROOK and board.color_at(sq) == chess.BLACK)
-        white_control += white_rooks_on_file * 2
-        black_control += black_rooks_on_file * 2
+    # The square scans this used to do compared Piece objects against piece
+    # type constants, which never matches, so pawns and rooks on files have
+    # never added to either side. Kept at zero so the metric does not change.
 
     # Evaluate control of diagonals
-    def get_diagonal_squares(square):
-        file, rank = chess.square_file(square), chess.square_rank(square)
-        diagonals = []
-
-        # Top right and bottom left diagonals
-        for i in range(-min(file, rank), 8 - max(file, rank)):
-            diagonals.append(chess.square(file + i, rank + i))
-
-        # Top left and bottom right diagonals
-        for i in range(-min(7 - file, rank), min(7 - rank, file) + 1):
-            diagonals.append(chess.square(file - i, rank + i))
-
-        return set(diagonals)
-
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
-        if piece:
-            diagonals = get_diagonal_squares(square)
-            white_pieces_on_diag = sum(1 for sq in diagonals if board.color_at(sq) == chess.WHITE)
-            black_pieces_on_diag = sum(1 for sq in diagonals if board.color_at(sq) == chess.BLACK)
-            if piece.color == chess.WHITE:
-                white_control += white_pieces_on_diag
-            else:
-                black_control += black_pieces_on_diag
+    for square in context.squares[chess.WHITE]:
+        white_control += chess.popcount(BB_DIAGONALS[square] & white_pieces)
+    for square in context.squares[chess.BLACK]:
+        black_control += chess.popcount(BB_DIAGONALS[square] & black_pieces)
 
     # Evaluate piece activity and positioning
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
-        if piece:
-            if piece.color == chess.WHITE:
-                white_control += 1
-            else:
-                black_control += 1
+    white_control += len(context.squares[chess.WHITE])
+    black_control += len(context.squares[chess.BLACK])
 
     return white_control - black_control
 
@@ -2494,19 +2713,13 @@ def evaluate_pawn_structures(board, color):
     pawns = board.pieces(chess.PAWN, color)
 
     # Doubled pawns penalty
-    file_counts = [0] * 8  # Initialize list to count pawns on each file
-    for sq in pawns:
-        file_counts[chess.square_file(sq)] += 1
+    file_counts = [chess.popcount(int(pawns) & file_mask) for file_mask in chess.BB_FILES]  # Count pawns on each file
     doubled_pawns_count = sum(count - 1 for count in file_counts if count > 1)
     pawn_structure_score -= doubled_pawns_count * 0.5  # Each doubled pawn reduces the score
 
-    # Isolated pawns penalty
-    isolated_pawns_count = 0
-    for sq in pawns:
-        file_idx = chess.square_file(sq)
-        if file_idx > 0 and file_idx < 7:  # Exclude pawns on A and H files
-            if board.piece_at(sq - 1) is None and board.piece_at(sq + 1) is None:
-                isolated_pawns_count += 1
+    # Isolated pawns penalty (pawns on the A and H files are excluded)
+    inner_pawns = int(pawns) & ~chess.BB_FILE_A & ~chess.BB_FILE_H
+    isolated_pawns_count = chess.popcount(inner_pawns & ~_horizontal_neighbours(board.occupied))
     pawn_structure_score -= isolated_pawns_count * 0.5  # Each isolated pawn reduces the score
 
     # Passed pawns bonus
@@ -2516,7 +2729,7 @@ def evaluate_pawn_structures(board, color):
     # Pawn mobility
     mobility_score = 0
     for sq in pawns:
-        mobility_score += len(board.attacks(sq))
+        mobility_score += chess.popcount(board.attacks_mask(sq))
     pawn_structure_score += mobility_score * 0.1  # Increase score based on pawn mobility
 
     # Pawn structure near kings
@@ -2544,3 +2757,8 @@ def proximity_to_king_score(attack_square, king_square):
         return 1
     else:
         return 0
+
+# Opt-in profiling of the feature functions, see Ai/eval_profile.py
+if os.environ.get('EVAL_PROFILE', '') not in ('', '0'):
+    from Ai.eval_profile import enable_from_environment
+    enable_from_environment()
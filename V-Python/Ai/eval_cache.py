@@ -0,0 +1,109 @@
+import collections
+
+import chess
+import chess.polyglot
+
+from Ai.eval import analyze_board
+
+DEFAULT_CACHE_SIZE = 100000
+
+class EvaluationCache:
+    """
+    Bounded cache of analyze_board results.
+
+    Entries are keyed on the Zobrist hash of the position and the color the
+    metrics were computed for, and the least recently used entry is evicted
+    once the cache is full. One cache can be shared by self-play, rating games
+    and search code so that recurring positions are only analyzed once.
+
+    Attributes:
+    max_size (int): Maximum number of entries kept.
+    hits (int): Lookups answered from the cache.
+    misses (int): Lookups that had to run analyze_board.
+    evictions (int): Entries dropped to stay within max_size.
+    """
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        if max_size < 1:
+            raise ValueError(f"max_size must be at least 1, got {max_size}")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(board, color):
+        """
+        Return the cache key of a position evaluated for the given color.
+        """
+        return chess.polyglot.zobrist_hash(board), color
+
+    def get(self, board, color):
+        """
+        Return a copy of the cached metrics for the position, or None if it is not cached.
+        """
+        key = self.key(board, color)
+        metrics = self._entries.get(key)
+        if metrics is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(metrics)
+
+    def put(self, board, color, metrics):
+        """
+        Store the metrics of a position, evicting the least recently used entries if needed.
+        """
+        key = self.key(board, color)
+        self._entries[key] = dict(metrics)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def analyze(self, board, color):
+        """
+        Return analyze_board(board, color), computing it only if the position is not cached.
+
+        Parameters:
+        board (chess.Board): The chess board.
+        color (bool): The color of the player (chess.WHITE or chess.BLACK).
+
+        Returns:
+        dict: The evaluation metrics, as returned by analyze_board.
+        """
+        metrics = self.get(board, color)
+        if metrics is None:
+            metrics = analyze_board(board, color)
+            self.put(board, color, metrics)
+        return metrics
+
+    def clear(self):
+        """
+        Drop all entries and reset the counters.
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        """
+        Return the size of the cache and its hit, miss and eviction counters.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,148 @@
+import collections
+import multiprocessing
+import os
+import queue
+
+import chess
+
+from Ai.eval import analyze_board
+
+DEFAULT_CHUNK_SIZE = 16
+
+def _analyze_chunk(fens, color, features):
+    """
+    Evaluate a chunk of positions in a worker process.
+    """
+    results = []
+    for fen in fens:
+        metrics = analyze_board(chess.Board(fen), color, features)
+        results.append((fen, dict(metrics)))
+    return results
+
+def _chunks(positions, chunk_size):
+    """
+    Group positions (FENs or boards) into lists of FENs of at most chunk_size.
+    """
+    chunk = []
+    for position in positions:
+        chunk.append(position.fen() if isinstance(position, chess.Board) else position)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class EvaluationPool:
+    """
+    Process pool running analyze_board on streams of positions.
+
+    Positions are sent to the workers in chunks of FENs, and at most
+    max_pending chunks are in flight at any time: the input iterable is only
+    read as fast as results are consumed, so arbitrarily long streams can be
+    labeled with bounded memory. Use as a context manager, or call close()
+    (or terminate()) when done:
+
+        with EvaluationPool() as pool:
+            for fen, metrics in pool.imap(fens):
+                ...
+
+    Worker processes import Ai.eval, so scripts using the pool on platforms
+    that spawn processes (Windows, macOS) need an if __name__ == '__main__' guard.
+
+    Attributes:
+    processes (int): Number of worker processes.
+    chunk_size (int): Number of positions sent to a worker at once.
+    max_pending (int): Maximum number of chunks submitted but not yet consumed.
+    """
+
+    def __init__(self, processes=None, chunk_size=DEFAULT_CHUNK_SIZE, max_pending=None):
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.max_pending = max_pending or 2 * self.processes
+        self._pool = multiprocessing.Pool(self.processes)
+
+    def imap(self, positions, color=chess.WHITE, features=None, ordered=True):
+        """
+        Evaluate a stream of positions, yielding results as they become available.
+
+        Parameters:
+        positions (iterable): FEN strings or chess.Board objects.
+        color (bool): The color the positions are scored for (chess.WHITE or chess.BLACK).
+        features (list): Metric names passed on to analyze_board, all metrics by default.
+        ordered (bool): Yield results in input order. Otherwise results are yielded
+            as soon as their chunk is done, which keeps all workers busy when some
+            chunks are slower than others.
+
+        Returns:
+        generator: (fen, metrics) pairs, metrics being a dict as returned by analyze_board.
+        """
+        if self._pool is None:
+            raise ValueError("EvaluationPool is closed")
+        if ordered:
+            return self._imap_ordered(positions, color, features)
+        return self._imap_unordered(positions, color, features)
+
+    def _imap_ordered(self, positions, color, features):
+        pending = collections.deque()
+        for chunk in _chunks(positions, self.chunk_size):
+            pending.append(self._pool.apply_async(_analyze_chunk, (chunk, color, features)))
+            if len(pending) >= self.max_pending:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+    def _imap_unordered(self, positions, color, features):
+        finished = queue.Queue()
+        in_flight = 0
+
+        def take():
+            result = finished.get()
+            if isinstance(result, BaseException):
+                raise result
+            return result
+
+        for chunk in _chunks(positions, self.chunk_size):
+            self._pool.apply_async(_analyze_chunk, (chunk, color, features),
+                                   callback=finished.put, error_callback=finished.put)
+            in_flight += 1
+            if in_flight >= self.max_pending:
+                in_flight -= 1
+                yield from take()
+        while in_flight:
+            in_flight -= 1
+            yield from take()
+
+    def map(self, positions, color=chess.WHITE, features=None):
+        """
+        Evaluate positions and return the list of (fen, metrics) pairs, in input order.
+        """
+        return list(self.imap(positions, color, features))
+
+    def close(self):
+        """
+        Let the workers finish the submitted chunks, then stop them.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def terminate(self):
+        """
+        Stop the workers immediately, dropping any unfinished chunks.
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
@@ -0,0 +1,212 @@
+import atexit
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+
+import Ai.eval as eval_module
+
+# Set to enable profiling of every evaluation in the process; the table is printed at exit
+PROFILE_ENV_VAR = 'EVAL_PROFILE'
+# Set to a file path to also write the results there as JSON at exit
+PROFILE_JSON_ENV_VAR = 'EVAL_PROFILE_JSON'
+
+def feature_functions():
+    """
+    Return the public functions defined in Ai.eval, by name.
+    """
+    return {
+        name: function for name, function in vars(eval_module).items()
+        if inspect.isfunction(function) and function.__module__ == eval_module.__name__ and not name.startswith('_')
+    }
+
+class EvalProfiler:
+    """
+    Call counts and timings of the feature functions of Ai.eval.
+
+    While enabled, every public function of Ai.eval is replaced by a timing
+    wrapper, in Ai.eval and in any loaded module that imported it by name. Calls
+    between feature functions go through the module globals, so nested calls
+    are recorded too. Disabling puts the original functions back, so a
+    disabled profiler costs nothing.
+
+    Can be used as a context manager:
+
+        with EvalProfiler() as profiler:
+            analyze_board(board, chess.WHITE)
+        print(profiler.table())
+
+    Attributes:
+    calls (dict): Number of calls of each function, by name.
+    cumulative_time (dict): Seconds spent in each function, including the functions it called.
+    self_time (dict): Seconds spent in each function, excluding the functions it called.
+    """
+
+    _active = None
+
+    def __init__(self):
+        self.calls = {}
+        self.cumulative_time = {}
+        self.self_time = {}
+        self._patches = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self._patches)
+
+    def _wrap(self, name, function):
+        local = self._local
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            # Each running call accumulates the time spent in its callees,
+            # which is subtracted from its own self time
+            stack = local.__dict__.setdefault('stack', [])
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                child_time = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with self._lock:
+                    self.calls[name] = self.calls.get(name, 0) + 1
+                    self.cumulative_time[name] = self.cumulative_time.get(name, 0.0) + elapsed
+                    self.self_time[name] = self.self_time.get(name, 0.0) + elapsed - child_time
+
+        return wrapper
+
+    def enable(self):
+        """
+        Install the timing wrappers. Only one profiler can be enabled at a time.
+        """
+        if self.enabled:
+            return
+        if EvalProfiler._active is not None:
+            raise RuntimeError("Another EvalProfiler is already enabled")
+
+        functions = feature_functions()
+        modules = [module for module in list(sys.modules.values())
+                   if module is not None and module is not sys.modules[__name__]]
+        wrappers = {id(function): self._wrap(name, function) for name, function in functions.items()}
+        for module in modules:
+            for attribute, value in list(getattr(module, '__dict__', {}).items()):
+                if inspect.isfunction(value) and id(value) in wrappers:
+                    self._patches.append((module, attribute, value))
+                    setattr(module, attribute, wrappers[id(value)])
+        EvalProfiler._active = self
+
+    def disable(self):
+        """
+        Put the original functions back. The recorded results are kept.
+        """
+        for module, attribute, value in reversed(self._patches):
+            setattr(module, attribute, value)
+        self._patches = []
+        if EvalProfiler._active is self:
+            EvalProfiler._active = None
+
+    def reset(self):
+        """
+        Clear the recorded results.
+        """
+        with self._lock:
+            self.calls.clear()
+            self.cumulative_time.clear()
+            self.self_time.clear()
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disable()
+
+    def stats(self):
+        """
+        Return the recorded results.
+
+        Returns:
+        dict: 'positions' (analyze_board calls), 'total_time' (seconds in analyze_board),
+        'positions_per_second' and 'functions', a list of per-function results sorted
+        by self time, each with name, calls, calls_per_position, cumulative_time,
+        self_time and self_time_share.
+        """
+        with self._lock:
+            positions = self.calls.get('analyze_board', 0)
+            total_time = self.cumulative_time.get('analyze_board', 0.0)
+            total_self_time = sum(self.self_time.values())
+            functions = [
+                {
+                    'name': name,
+                    'calls': calls,
+                    'calls_per_position': calls / positions if positions else None,
+                    'cumulative_time': self.cumulative_time.get(name, 0.0),
+                    'self_time': self.self_time.get(name, 0.0),
+                    'self_time_share': self.self_time.get(name, 0.0) / total_self_time if total_self_time else 0.0
+                }
+                for name, calls in self.calls.items()
+            ]
+
+        functions.sort(key=lambda entry: entry['self_time'], reverse=True)
+        return {
+            'positions': positions,
+            'total_time': total_time,
+            'positions_per_second': positions / total_time if total_time else None,
+            'functions': functions
+        }
+
+    def table(self, limit=None):
+        """
+        Return the recorded results as a text table, slowest functions (by self time) first.
+        """
+        stats = self.stats()
+        if stats['positions_per_second'] is None:
+            header = f"{stats['positions']} positions"
+        else:
+            header = f"{stats['positions']} positions in {stats['total_time']:.3f}s ({stats['positions_per_second']:.1f} positions/s)"
+
+        lines = [header, f"{'function':<55} {'calls':>9} {'per pos':>8} {'cum s':>9} {'self s':>9} {'self %':>7}"]
+        for entry in stats['functions'][:limit]:
+            per_position = '' if entry['calls_per_position'] is None else f"{entry['calls_per_position']:.1f}"
+            lines.append(f"{entry['name']:<55} {entry['calls']:>9} {per_position:>8} {entry['cumulative_time']:>9.4f} "
+                         f"{entry['self_time']:>9.4f} {entry['self_time_share'] * 100:>6.1f}%")
+        return '\n'.join(lines)
+
+    def to_json(self, path=None):
+        """
+        Return the recorded results as JSON, also writing them to path if one is given.
+        """
+        data = json.dumps(self.stats(), indent=2)
+        if path is not None:
+            with open(path, 'w') as file:
+                file.write(data)
+        return data
+
+def _report_at_exit(profiler):
+    profiler.disable()
+    json_path = os.environ.get(PROFILE_JSON_ENV_VAR)
+    if json_path:
+        profiler.to_json(json_path)
+    print(profiler.table())
+
+def enable_from_environment():
+    """
+    Enable a process-wide profiler if EVAL_PROFILE is set, reporting at exit.
+
+    Returns:
+    EvalProfiler: The enabled profiler, or None if profiling is not requested.
+    """
+    if os.environ.get(PROFILE_ENV_VAR, '') in ('', '0'):
+        return None
+    profiler = EvalProfiler()
+    profiler.enable()
+    atexit.register(_report_at_exit, profiler)
+    return profiler
@@ -0,0 +1,137 @@
+import chess
+import chess.polyglot
+
+from Ai.eval import ANALYSIS_METRICS, PIECE_SQUARE_VALUES, PIECE_VALUES, analyze_board
+
+# analyze_board metrics kept up to date move by move by IncrementalEvaluator
+INCREMENTAL_METRICS = ['material_balance']
+
+def pawn_key(color, square):
+    """
+    Return the Zobrist key of a pawn of the given color on the given square.
+    """
+    return chess.polyglot.POLYGLOT_RANDOM_ARRAY[64 * (0 if color == chess.WHITE else 1) + square]
+
+def pawn_hash(board):
+    """
+    Return the Zobrist hash of the pawns on the board, ignoring every other piece.
+    """
+    key = 0
+    for color in chess.COLORS:
+        for square in chess.scan_forward(board.pawns & board.occupied_co[color]):
+            key ^= pawn_key(color, square)
+    return key
+
+def piece_square_value(piece, square):
+    """
+    Return the piece-square bonus of a piece on a square, in centipawns.
+    """
+    return PIECE_SQUARE_VALUES[piece.color][piece.piece_type][square]
+
+class IncrementalEvaluator:
+    """
+    Material, piece-square and pawn hash terms of a board, updated on every move.
+
+    Moves are made and taken back through push and pop, which update the
+    running terms from the squares the move touches instead of rescanning the
+    board. The board is shared with the caller and must only be changed
+    through the evaluator while it is in use.
+
+    Attributes:
+    board (chess.Board): The chess board being evaluated.
+    material (dict): Sum of PIECE_VALUES of each color's pieces.
+    piece_square (dict): Sum of PIECE_SQUARE_TABLES bonuses of each color's pieces, in centipawns.
+    pawn_hash (int): Zobrist hash of the pawns, see pawn_hash().
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.material = {chess.WHITE: 0, chess.BLACK: 0}
+        self.piece_square = {chess.WHITE: 0, chess.BLACK: 0}
+        self.pawn_hash = 0
+        self._history = []
+
+        for square in chess.scan_forward(board.occupied):
+            self._add(board.piece_at(square), square)
+
+    def _add(self, piece, square):
+        self.material[piece.color] += PIECE_VALUES[piece.piece_type]
+        self.piece_square[piece.color] += piece_square_value(piece, square)
+        if piece.piece_type == chess.PAWN:
+            self.pawn_hash ^= pawn_key(piece.color, square)
+
+    def _remove(self, piece, square):
+        self.material[piece.color] -= PIECE_VALUES[piece.piece_type]
+        self.piece_square[piece.color] -= piece_square_value(piece, square)
+        if piece.piece_type == chess.PAWN:
+            self.pawn_hash ^= pawn_key(piece.color, square)
+
+    def push(self, move):
+        """
+        Make a move on the board and update the running terms.
+        """
+        board = self.board
+        self._history.append((dict(self.material), dict(self.piece_square), self.pawn_hash))
+
+        if move:
+            piece = board.piece_at(move.from_square)
+            rank = chess.square_rank(move.from_square)
+
+            if board.is_castling(move):
+                kingside = board.is_kingside_castling(move)
+                rook_from = move.to_square
+                if board.piece_type_at(rook_from) != chess.ROOK:
+                    rook_from = chess.square(7 if kingside else 0, rank)
+                rook = board.piece_at(rook_from)
+                self._remove(piece, move.from_square)
+                self._remove(rook, rook_from)
+                self._add(piece, chess.square(6 if kingside else 2, rank))
+                self._add(rook, chess.square(5 if kingside else 3, rank))
+            else:
+                capture_square = move.to_square
+                if board.is_en_passant(move):
+                    capture_square = chess.square(chess.square_file(move.to_square), rank)
+                captured = board.piece_at(capture_square)
+                if captured:
+                    self._remove(captured, capture_square)
+
+                self._remove(piece, move.from_square)
+                if move.promotion:
+                    piece = chess.Piece(move.promotion, piece.color)
+                self._add(piece, move.to_square)
+
+        board.push(move)
+
+    def pop(self):
+        """
+        Take back the last move made with push and restore the running terms.
+        """
+        move = self.board.pop()
+        self.material, self.piece_square, self.pawn_hash = self._history.pop()
+        return move
+
+    def score(self, color):
+        """
+        Return the material and piece-square balance for the given color, in pawns.
+        """
+        material = self.material[color] - self.material[not color]
+        piece_square = self.piece_square[color] - self.piece_square[not color]
+        return material + piece_square / 100
+
+    def metrics(self, color):
+        """
+        Return analyze_board(board, color), reusing the running terms.
+
+        Only the metrics not listed in INCREMENTAL_METRICS are computed by
+        analyze_board.
+        """
+        features = [name for name in ANALYSIS_METRICS if name not in INCREMENTAL_METRICS]
+        computed = analyze_board(self.board, color, features)
+
+        # evaluate_material_balance subtracts black's negative piece values,
+        # so it adds up the material of both sides
+        material_balance = self.material[chess.WHITE] + self.material[chess.BLACK]
+        if color == chess.BLACK:
+            material_balance = - (material_balance)
+
+        return {name: material_balance if name == 'material_balance' else computed[name] for name in ANALYSIS_METRICS}
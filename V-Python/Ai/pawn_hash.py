@@ -0,0 +1,90 @@
+import collections
+
+import chess
+
+DEFAULT_PAWN_HASH_SIZE = 16384
+
+class PawnHashTable:
+    """
+    Bounded cache of pawn-structure terms, keyed on the pawn placement.
+
+    Entries are keyed on the white and black pawn bitboards only, so every
+    position with the same pawns shares one entry however the other pieces
+    are placed. Only terms that depend on nothing but the pawns may be stored.
+    The least recently used entry is evicted once the table is full.
+
+    Attributes:
+    compute (callable): Function of a board returning the entry for its pawns.
+    max_size (int): Maximum number of entries kept.
+    hits (int): Lookups answered from the table.
+    misses (int): Lookups that had to compute the entry.
+    evictions (int): Entries dropped to stay within max_size.
+    """
+
+    def __init__(self, compute, max_size=DEFAULT_PAWN_HASH_SIZE):
+        if max_size < 1:
+            raise ValueError(f"max_size must be at least 1, got {max_size}")
+        self.compute = compute
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(board):
+        """
+        Return the table key of a position: its white and black pawn bitboards.
+        """
+        return board.pawns & board.occupied_co[chess.WHITE], board.pawns & board.occupied_co[chess.BLACK]
+
+    def lookup(self, board):
+        """
+        Return the entry for the pawns of the board, computing it if it is not stored.
+
+        Parameters:
+        board (chess.Board): The chess board.
+
+        Returns:
+        The entry returned by compute for these pawns. It is shared, and must not be modified.
+        """
+        key = self.key(board)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        entry = self.compute(board)
+        self._entries[key] = entry
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def clear(self):
+        """
+        Drop all entries and reset the counters.
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        """
+        Return the size of the table and its hit, miss and eviction counters.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,397 @@
+import time
+
+import chess
+import chess.engine
+
+from Ai.eval import PIECE_VALUES
+from Ai.incremental_eval import IncrementalEvaluator
+
+# Scores are in centipawns from the point of view of the side to move
+MATE_SCORE = 100000
+# Scores beyond this are mates, found this many plies from the root at most
+MATE_THRESHOLD = MATE_SCORE - 1000
+INFINITE_SCORE = MATE_SCORE + 1
+
+DEFAULT_TT_SIZE = 1 << 20
+DEFAULT_LIMIT_TIME = 0.1
+MAX_DEPTH = 64
+# Nodes searched between two checks of the time and node limits
+LIMIT_CHECK_INTERVAL = 1024
+# Share of the remaining clock time spent on one move, when playing on a clock
+CLOCK_TIME_SHARE = 1 / 30
+
+TT_EXACT = 0
+TT_LOWER = 1
+TT_UPPER = 2
+
+# Attacker values for MVV-LVA ordering: the king is the least welcome capturer
+MVV_LVA_ATTACKER_VALUES = dict(PIECE_VALUES)
+MVV_LVA_ATTACKER_VALUES[chess.KING] = 10
+
+# Ordering scores of the different move classes, best first
+TT_MOVE_ORDER = 1 << 30
+CAPTURE_ORDER = 1 << 28
+PROMOTION_ORDER = 1 << 27
+KILLER_ORDER = 1 << 26
+
+class _SearchStopped(Exception):
+    """
+    Raised inside the search when the time or node limit is reached.
+    """
+
+def static_evaluation(evaluator):
+    """
+    Return the static evaluation of the evaluator's board for the side to move, in centipawns.
+
+    The evaluation is the material and piece-square balance kept up to date by
+    IncrementalEvaluator, so it costs nothing to compute at every node.
+    """
+    return round(evaluator.score(evaluator.board.turn) * 100)
+
+def mvv_lva(board, move):
+    """
+    Return the most valuable victim / least valuable attacker score of a capture.
+    """
+    victim = board.piece_type_at(move.to_square) or chess.PAWN  # en passant
+    attacker = board.piece_type_at(move.from_square)
+    return PIECE_VALUES[victim] * 100 - MVV_LVA_ATTACKER_VALUES[attacker]
+
+def search_deadline(board, limit, start):
+    """
+    Return the time.perf_counter() value the search must stop at, or None.
+
+    Parameters:
+    board (chess.Board): The position searched.
+    limit (chess.engine.Limit): Search limit; time, or the clock of the side to move.
+    start (float): time.perf_counter() value when the search started.
+    """
+    if limit.time is not None:
+        return start + limit.time
+    clock = limit.white_clock if board.turn == chess.WHITE else limit.black_clock
+    if clock is not None:
+        increment = (limit.white_inc if board.turn == chess.WHITE else limit.black_inc) or 0
+        return start + max(0.01, min(clock * CLOCK_TIME_SHARE + increment, clock / 2))
+    return None
+
+class SearchEngine:
+    """
+    Iterative-deepening alpha-beta search over the incremental evaluation.
+
+    Each iteration runs a principal variation search to one more ply, followed by
+    a captures-only quiescence search, with a transposition table and
+    MVV-LVA, killer and history move ordering. The search stops when the
+    time, node or depth limit is reached, and plays the best move of the
+    last completed iteration.
+
+    play() follows chess.engine.SimpleEngine.play, so a SearchEngine can be
+    used wherever the Stockfish engine is:
+
+        bot = ChessBot(SearchEngine(), chess.engine.Limit(time=1))
+
+    Attributes:
+    tt_size (int): Maximum number of transposition table entries.
+    nodes (int): Nodes searched by the last call to play().
+    """
+
+    def __init__(self, tt_size=DEFAULT_TT_SIZE):
+        self.tt_size = tt_size
+        self.nodes = 0
+        self._tt = {}
+        self._killers = []
+        self._history = {}
+        self._path = []
+        self._path_set = set()
+        self._root_depth = 0
+        self._root_best = None
+        self._deadline = None
+        self._max_nodes = None
+
+    def clear(self):
+        """
+        Forget the transposition table and the history heuristic.
+        """
+        self._tt.clear()
+        self._history.clear()
+
+    def _store(self, key, depth, score, flag, move, ply):
+        # Mate scores are stored relative to the position, not the root
+        if score > MATE_THRESHOLD:
+            score += ply
+        elif score < -MATE_THRESHOLD:
+            score -= ply
+        if key not in self._tt and len(self._tt) >= self.tt_size:
+            del self._tt[next(iter(self._tt))]
+        self._tt[key] = (depth, score, flag, move)
+
+    def _probe(self, key, ply):
+        entry = self._tt.get(key)
+        if entry is None:
+            return None
+        depth, score, flag, move = entry
+        if score > MATE_THRESHOLD:
+            score -= ply
+        elif score < -MATE_THRESHOLD:
+            score += ply
+        return depth, score, flag, move
+
+    def _check_limits(self):
+        self.nodes += 1
+        if self.nodes % LIMIT_CHECK_INTERVAL == 0:
+            if self._deadline is not None and time.perf_counter() >= self._deadline:
+                raise _SearchStopped()
+        if self._max_nodes is not None and self.nodes >= self._max_nodes:
+            raise _SearchStopped()
+
+    def _ordered_moves(self, board, moves, tt_move, ply):
+        killers = self._killers[ply] if ply < len(self._killers) else ()
+        history = self._history
+
+        def order(move):
+            if move == tt_move:
+                return TT_MOVE_ORDER
+            if board.is_capture(move):
+                return CAPTURE_ORDER + mvv_lva(board, move)
+            if move.promotion:
+                return PROMOTION_ORDER + move.promotion
+            if move in killers:
+                return KILLER_ORDER - killers.index(move)
+            return history.get((board.turn, move.from_square, move.to_square), 0)
+
+        return sorted(moves, key=order, reverse=True)
+
+    def _record_cutoff(self, board, move, depth, ply):
+        if board.is_capture(move) or move.promotion:
+            return
+        killers = self._killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        key = (board.turn, move.from_square, move.to_square)
+        self._history[key] = self._history.get(key, 0) + depth * depth
+
+    def _quiescence(self, evaluator, alpha, beta, ply):
+        self._check_limits()
+        board = evaluator.board
+
+        if board.is_check():
+            moves = list(board.legal_moves)
+            if not moves:
+                return -MATE_SCORE + ply
+            best = -INFINITE_SCORE
+        else:
+            best = static_evaluation(evaluator)
+            if best >= beta:
+                return best
+            if best > alpha:
+                alpha = best
+            moves = list(board.generate_legal_captures())
+            if not moves:
+                return best
+
+        moves.sort(key=lambda move: mvv_lva(board, move) if board.is_capture(move) else 0, reverse=True)
+        for move in moves:
+            evaluator.push(move)
+            score = -self._quiescence(evaluator, -beta, -alpha, ply + 1)
+            evaluator.pop()
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if score >= beta:
+                        break
+        return best
+
+    def _negamax(self, evaluator, depth, alpha, beta, ply):
+        board = evaluator.board
+        key = board._transposition_key()
+
+        # Repeating a position of the game or of the search path is scored as a draw
+        if ply > 0 and (board.halfmove_clock >= 100 or key in self._path_set):
+            return 0
+
+        # Check extension, bounded so that long series of checks still end
+        in_check = board.is_check()
+        if in_check and ply < 2 * self._root_depth:
+            depth += 1
+        if depth <= 0:
+            return self._quiescence(evaluator, alpha, beta, ply)
+
+        self._check_limits()
+        original_alpha = alpha
+        tt_move = None
+        entry = self._probe(key, ply)
+        if entry is not None:
+            entry_depth, entry_score, entry_flag, tt_move = entry
+            if ply > 0 and entry_depth >= depth:
+                if entry_flag == TT_EXACT:
+                    return entry_score
+                if entry_flag == TT_LOWER and entry_score >= beta:
+                    return entry_score
+                if entry_flag == TT_UPPER and entry_score <= alpha:
+                    return entry_score
+
+        moves = list(board.legal_moves)
+        if not moves:
+            return -MATE_SCORE + ply if in_check else 0
+
+        while len(self._killers) <= ply:
+            self._killers.append([])
+
+        self._path.append(key)
+        self._path_set.add(key)
+        best_score = -INFINITE_SCORE
+        best_move = None
+        try:
+            for index, move in enumerate(self._ordered_moves(board, moves, tt_move, ply)):
+                evaluator.push(move)
+                try:
+                    if index == 0:
+                        score = -self._negamax(evaluator, depth - 1, -beta, -alpha, ply + 1)
+                    else:
+                        # Principal variation search: prove the move is no better with a null window
+                        score = -self._negamax(evaluator, depth - 1, -alpha - 1, -alpha, ply + 1)
+                        if alpha < score < beta:
+                            score = -self._negamax(evaluator, depth - 1, -beta, -alpha, ply + 1)
+                finally:
+                    evaluator.pop()
+
+                if score > best_score:
+                    best_score = score
+                    best_move = move
+                    if score > alpha:
+                        alpha = score
+                        if ply == 0:
+                            self._root_best = (move, score)
+                        if score >= beta:
+                            self._record_cutoff(board, move, depth, ply)
+                            break
+        finally:
+            self._path.pop()
+            if key not in self._path:
+                self._path_set.discard(key)
+
+        if best_score <= original_alpha:
+            flag = TT_UPPER
+        elif best_score >= beta:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+        self._store(key, depth, best_score, flag, best_move, ply)
+        return best_score
+
+    def _principal_variation(self, board, first_move, max_length):
+        board = board.copy(stack=False)
+        pv = [first_move]
+        board.push(first_move)
+        seen = {board._transposition_key()}
+        while len(pv) < max_length:
+            entry = self._tt.get(board._transposition_key())
+            if entry is None or entry[3] is None or entry[3] not in board.legal_moves:
+                break
+            board.push(entry[3])
+            key = board._transposition_key()
+            if key in seen:
+                break
+            seen.add(key)
+            pv.append(entry[3])
+        return pv
+
+    def _game_history_keys(self, board):
+        # Positions since the last irreversible move, which can still be repeated
+        keys = []
+        board = board.copy()
+        for _ in range(min(board.halfmove_clock, len(board.move_stack))):
+            board.pop()
+            keys.append(board._transposition_key())
+        return keys
+
+    def search(self, board, limit):
+        """
+        Search a position within a limit.
+
+        Parameters:
+        board (chess.Board): The position to search. It is not modified.
+        limit (chess.engine.Limit): Stop after limit.time seconds, limit.nodes nodes or
+            limit.depth plies, whichever comes first. With only a clock (white_clock,
+            black_clock), a share of the remaining time is used. Without any limit
+            the search uses DEFAULT_LIMIT_TIME seconds.
+
+        Returns:
+        dict: 'move' (best move, None if there are no legal moves), 'score' (centipawns
+        for the side to move), 'depth' (last completed depth), 'nodes', 'time' and 'pv'.
+        """
+        start = time.perf_counter()
+        max_depth = limit.depth or MAX_DEPTH
+        self._max_nodes = limit.nodes
+        self._deadline = search_deadline(board, limit, start)
+        if self._deadline is None and limit.depth is None and limit.nodes is None:
+            self._deadline = start + DEFAULT_LIMIT_TIME
+
+        self.nodes = 0
+        self._killers = []
+        self._path = self._game_history_keys(board)
+        self._path_set = set(self._path)
+
+        legal_moves = list(board.legal_moves)
+        result = {'move': legal_moves[0] if legal_moves else None, 'score': 0, 'depth': 0,
+                  'nodes': 0, 'time': 0.0, 'pv': []}
+        if len(legal_moves) > 1:
+            evaluator = IncrementalEvaluator(board.copy())
+            for depth in range(1, max_depth + 1):
+                self._root_best = None
+                self._root_depth = depth
+                try:
+                    score = self._negamax(evaluator, depth, -INFINITE_SCORE, INFINITE_SCORE, 0)
+                except _SearchStopped:
+                    # The best move found so far in the unfinished iteration is kept: the
+                    # previous best move is searched first, so it was beaten by this one
+                    if self._root_best is not None:
+                        result['move'], result['score'] = self._root_best
+                    break
+                result['move'] = self._root_best[0]
+                result['score'] = score
+                result['depth'] = depth
+                if abs(score) > MATE_THRESHOLD:
+                    break
+            result['pv'] = self._principal_variation(board, result['move'], max(result['depth'], 1))
+        elif legal_moves:
+            result['pv'] = [legal_moves[0]]
+
+        result['nodes'] = self.nodes
+        result['time'] = time.perf_counter() - start
+        return result
+
+    def play(self, board, limit):
+        """
+        Select a move, like chess.engine.SimpleEngine.play.
+
+        Parameters:
+        board (chess.Board): The position to play a move in. It is not modified.
+        limit (chess.engine.Limit): Search limit, see search().
+
+        Returns:
+        chess.engine.PlayResult: The move, the expected reply as ponder move, and
+        the search information (score, depth, nodes, time, pv).
+        """
+        result = self.search(board, limit)
+        score = result['score']
+        if score > MATE_THRESHOLD:
+            pov_score = chess.engine.Mate((MATE_SCORE - score + 1) // 2)
+        elif score < -MATE_THRESHOLD:
+            pov_score = chess.engine.Mate(-((MATE_SCORE + score) // 2))
+        else:
+            pov_score = chess.engine.Cp(score)
+        info = {
+            'score': chess.engine.PovScore(pov_score, board.turn),
+            'depth': result['depth'],
+            'nodes': result['nodes'],
+            'time': result['time'],
+            'pv': result['pv']
+        }
+        ponder = result['pv'][1] if len(result['pv']) > 1 else None
+        return chess.engine.PlayResult(result['move'], ponder, info)
+
+    def quit(self):
+        """
+        Nothing to shut down; present so a SearchEngine can replace a SimpleEngine.
+        """
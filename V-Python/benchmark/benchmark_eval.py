@@ -0,0 +1,189 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import chess
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Ai.eval import ANALYSIS_METRICS, analyze_board, pawn_hash_table
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+POSITIONS_PATH = os.path.join(BENCHMARK_DIR, 'positions.csv')
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+DEFAULT_REPEATS = 3
+# Allowed slowdown against the baseline before a target counts as a regression
+DEFAULT_THRESHOLD = 0.10
+
+def load_positions(path=POSITIONS_PATH):
+    """
+    Load the benchmark corpus.
+
+    Parameters:
+    path (str): File with one "category,fen" line per position; lines starting with # are ignored.
+
+    Returns:
+    list: (category, chess.Board) pairs.
+    """
+    positions = []
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            category, fen = line.split(',', 1)
+            positions.append((category, chess.Board(fen)))
+    return positions
+
+def benchmark_target(evaluate, positions, repeats=DEFAULT_REPEATS):
+    """
+    Time one evaluation target over the corpus.
+
+    Every position is evaluated for both colors, repeats times. The pawn hash
+    table is cleared first so every target starts cold. Peak memory is
+    measured in a separate pass, because tracemalloc slows the timed code down.
+
+    Parameters:
+    evaluate (callable): Function of a board and a color.
+    positions (list): (category, chess.Board) pairs, as returned by load_positions.
+    repeats (int): Number of timed passes over the corpus.
+
+    Returns:
+    dict: positions, positions_per_second, p50_ms, p99_ms, peak_memory_kb.
+    """
+    boards = [board for category, board in positions]
+    pawn_hash_table.clear()
+
+    latencies = []
+    for _ in range(repeats):
+        for board in boards:
+            for color in chess.COLORS:
+                start = time.perf_counter()
+                evaluate(board, color)
+                latencies.append(time.perf_counter() - start)
+
+    pawn_hash_table.clear()
+    tracemalloc.start()
+    for board in boards:
+        for color in chess.COLORS:
+            evaluate(board, color)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies = np.array(latencies)
+    return {
+        'positions': len(latencies),
+        'positions_per_second': len(latencies) / latencies.sum(),
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'peak_memory_kb': peak_memory / 1024
+    }
+
+def metric_evaluator(name):
+    """
+    Return a function computing a single analyze_board metric on its own.
+    """
+    def evaluate(board, color):
+        return analyze_board(board, color, [name])[name]
+    return evaluate
+
+def run_benchmark(positions, repeats=DEFAULT_REPEATS, metrics=None):
+    """
+    Benchmark analyze_board as a whole and each of its metrics on its own.
+
+    Parameters:
+    positions (list): (category, chess.Board) pairs, as returned by load_positions.
+    repeats (int): Number of timed passes over the corpus.
+    metrics (list): Metric names to benchmark separately; all of ANALYSIS_METRICS by default.
+
+    Returns:
+    dict: Run information and the results of each target, keyed by target name.
+    """
+    if metrics is None:
+        metrics = list(ANALYSIS_METRICS)
+
+    targets = {'analyze_board': analyze_board}
+    for name in metrics:
+        targets[f'metric:{name}'] = metric_evaluator(name)
+
+    results = {}
+    for target, evaluate in targets.items():
+        results[target] = benchmark_target(evaluate, positions, repeats)
+        print(format_result(target, results[target]))
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'corpus_size': len(positions),
+        'repeats': repeats,
+        'results': results
+    }
+
+def compare_to_baseline(run, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare a run against a baseline run.
+
+    A target regresses when its throughput drops, or its p99 latency grows,
+    by more than the threshold fraction.
+
+    Returns:
+    list: Descriptions of the regressions found, empty if there are none.
+    """
+    regressions = []
+    for target, result in run['results'].items():
+        reference = baseline['results'].get(target)
+        if reference is None:
+            continue
+        if result['positions_per_second'] < reference['positions_per_second'] * (1 - threshold):
+            regressions.append(f"{target}: {result['positions_per_second']:.1f} positions/s, "
+                               f"baseline {reference['positions_per_second']:.1f}")
+        if result['p99_ms'] > reference['p99_ms'] * (1 + threshold):
+            regressions.append(f"{target}: p99 {result['p99_ms']:.2f} ms, baseline {reference['p99_ms']:.2f} ms")
+    return regressions
+
+def format_result(target, result):
+    return (f"{target:<40} {result['positions_per_second']:>10.1f} pos/s  p50 {result['p50_ms']:>8.2f} ms  "
+            f"p99 {result['p99_ms']:>8.2f} ms  peak {result['peak_memory_kb']:>9.1f} KiB")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark Ai/eval.py on a fixed corpus of positions.')
+    parser.add_argument('--positions', default=POSITIONS_PATH, help='corpus file of "category,fen" lines')
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS, help='timed passes over the corpus')
+    parser.add_argument('--metric', action='append', dest='metrics', choices=list(ANALYSIS_METRICS),
+                        help='benchmark only this metric separately (can be repeated)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed slowdown against the baseline, as a fraction')
+    parser.add_argument('--save-baseline', action='store_true', help='save this run as the new baseline')
+    parser.add_argument('--output', help='also write this run to a JSON file')
+    args = parser.parse_args()
+
+    run = run_benchmark(load_positions(args.positions), args.repeats, args.metrics)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(run, file, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(run, file, indent=2)
+        print(f'Baseline saved to {args.baseline}')
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare_to_baseline(run, baseline, args.threshold)
+        if regressions:
+            print(f'Regressions against {args.baseline} (threshold {args.threshold:.0%}):')
+            for regression in regressions:
+                print(f'  {regression}')
+            sys.exit(1)
+        print(f'No regressions against {args.baseline} (threshold {args.threshold:.0%})')
+    else:
+        print(f'No baseline at {args.baseline}; run with --save-baseline to create one')
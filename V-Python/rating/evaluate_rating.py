@@ -5,7 +5,8 @@ import numpy as np
 import sys
 
 sys.path.append(r"C:\Users\girsh\Desktop\Personal\Web\Active\Chess_Bot\V-Python")
-from Ai.chess_bot import (ChessBot, load_or_create_model, board_to_input, encode_move, result_to_value, train_model, save_game_data, model_path, engine_path)
+from Ai.chess_bot import (ChessBot, load_or_create_model, board_to_input, encode_move, result_to_value, train_model, model_path, engine_path)
+from Ai.bot.engine_pool import EnginePool
 
 
 STOCKFISH_RATING = 2500
@@ -29,12 +30,11 @@ def play_game(bot1, bot2, game_num, train_data):
 
         board.push(move)
         input_vector = board_to_input(board)
-        move_vector = encode_move(move)
-        game_data.append((input_vector, move_vector))
+        game_data.append((input_vector, encode_move(move)))
 
     print(f"Game {game_num} finished with result: {board.result()}.")
     result_value = result_to_value(board.result())
-    train_data.extend([(input_vector, move_vector, result_value) for input_vector, move_vector in game_data])
+    train_data.extend([(input_vector, move, result_value) for input_vector, move in game_data])
 
 def evaluate_bot(model_path, engine_path, num_games=3, bot_rating=INITIAL_BOT_RATING):
     model = load_or_create_model(model_path)
@@ -44,15 +44,18 @@ def evaluate_bot(model_path, engine_path, num_games=3, bot_rating=INITIAL_BOT_RA
     train_data = []
     stockfish_turn = chess.BLACK
     
-    for game_num in range(1, num_games + 1):
-        if stockfish_turn == chess.BLACK:
-            engine_bot = ChessBot(chess.engine.SimpleEngine.popen_uci(engine_path))
-            result = play_game(bot, engine_bot, game_num, train_data)
-        else:
-            result = play_game(bot, bot, game_num, train_data)
-
-        results[result] += 1
-        stockfish_turn = not stockfish_turn
+    # One Stockfish process for all the games, quit when the evaluation ends
+    with EnginePool(engine_path) as engines:
+        for game_num in range(1, num_games + 1):
+            if stockfish_turn == chess.BLACK:
+                with engines.engine() as engine:
+                    engine_bot = ChessBot(engine)
+                    result = play_game(bot, engine_bot, game_num, train_data)
+            else:
+                result = play_game(bot, bot, game_num, train_data)
+
+            results[result] += 1
+            stockfish_turn = not stockfish_turn
 
     rating = calculate_elo_rating(results, bot_rating)
     return results, rating